@@ -1,30 +1,244 @@
-from sqlalchemy import create_engine, text, bindparam
+# Só Core: o repo usa text(); ORM, dialeto postgresql e asyncio ficam para quando forem usados
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.engine import URL
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from sqlalchemy import Integer, String, Text, LargeBinary, JSON, DateTime
-from sqlalchemy import text
-from sqlalchemy.dialects.postgresql import JSONB
+from typing import Callable, Iterable, Iterator
+from collections import deque
+from contextlib import contextmanager, nullcontext
+import csv
 import getpass
+import hashlib
+import io
 import json
 import os
+import re
+import socket
 import stat
+import sys
+import threading
+import time
 
 from pathlib import Path
 
+import sessions
+from spans import SPANS, percentile
+from state_codec import StateCodec
+
 DEFAULT_KEY_PATH = Path.home() /".secrets" /"pg_key.txt"
 
-DATABASE_URL = URL.create(
-    drivername="postgresql+psycopg2",
-    username="postgres",
-    password="Polito9090@",  # sua senha aqui; considere usar variável de ambiente
-    host="localhost",
-    port=5432,
-    database="netflix_accounts",
-)
+# Ordem de escolha das contas com vaga:
+#   "fill"   -> mais cheias primeiro (libera contas inteiras mais cedo)
+#   "spread" -> mais vazias primeiro (espalha a carga)
+SELECTION_ORDER = {
+    "fill": "used_slots DESC, last_checked NULLS FIRST, id",
+    "spread": "used_slots, last_checked NULLS FIRST, id",
+}
+DEFAULT_SELECTION_POLICY = os.environ.get("ACCOUNT_SELECTION_POLICY", "fill")
+
+_engine = None
+
+
+def database_url() -> URL:
+    """
+    URL do banco: DATABASE_URL (URL completa) ou as variáveis padrão do libpq
+    (PGUSER, PGPASSWORD, PGHOST, PGPORT, PGDATABASE).
+    """
+    if os.environ.get("DATABASE_URL"):
+        from sqlalchemy.engine import make_url
+        return make_url(os.environ["DATABASE_URL"])
+    return URL.create(
+        drivername="postgresql+psycopg2",
+        username=os.environ.get("PGUSER", "postgres"),
+        password=os.environ.get("PGPASSWORD", "Polito9090@"),  # prefira PGPASSWORD a esta senha padrão
+        host=os.environ.get("PGHOST", "localhost"),
+        port=int(os.environ.get("PGPORT", 5432)),
+        database=os.environ.get("PGDATABASE", "netflix_accounts"),
+    )
+
+
+def pgbouncer_mode() -> bool:
+    """PG_PGBOUNCER=1: o banco está atrás de um PgBouncer em transaction pooling."""
+    return os.environ.get("PG_PGBOUNCER", "0") == "1"
+
+
+def prepared_statements_enabled() -> bool:
+    """
+    PG_PREPARED_STATEMENTS (0/1). Desligado por padrão no modo PgBouncer: um statement
+    preparado numa conexão do servidor não existe na próxima transação.
+    """
+    return os.environ.get("PG_PREPARED_STATEMENTS", "0" if pgbouncer_mode() else "1") == "1"
+
+
+def pool_options() -> dict:
+    """
+    Argumentos de pool do create_engine, das variáveis de ambiente:
+      PG_POOL_SIZE (0 = sem pool local: NullPool), PG_MAX_OVERFLOW, PG_POOL_TIMEOUT (s),
+      PG_POOL_RECYCLE (s), PG_POOL_PRE_PING (0/1; padrão 1 no modo PgBouncer).
+    """
+    size = int(os.environ.get("PG_POOL_SIZE", 5))
+    pre_ping = os.environ.get("PG_POOL_PRE_PING", "1" if pgbouncer_mode() else "0") == "1"
+    if size <= 0:
+        from sqlalchemy.pool import NullPool
+        return {"poolclass": NullPool, "pool_pre_ping": pre_ping}
+    return {
+        "pool_size": size,
+        "max_overflow": int(os.environ.get("PG_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.environ.get("PG_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.environ.get("PG_POOL_RECYCLE", -1)),
+        "pool_pre_ping": pre_ping,
+    }
+
+
+class PoolMetrics:
+    """
+    Uso do pool do engine padrão: espera no checkout (SessionLocal), conexões em uso
+    e pico, conexões novas abertas no Postgres e invalidadas (pre-ping/erro).
+    """
+
+    def __init__(self, max_samples: int = 10_000):
+        self._lock = threading.Lock()
+        self.wait_ms: deque[float] = deque(maxlen=max_samples)
+        self.checkouts = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.connects = 0
+        self.invalidated = 0
+        self._pool = None
+
+    def attach(self, engine) -> None:
+        self._pool = engine.pool
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, *_):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, *_):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def _on_checkin(self, *_):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def _on_invalidate(self, *_):
+        with self._lock:
+            self.invalidated += 1
+
+    def record_wait(self, elapsed_ms: float) -> None:
+        with self._lock:
+            self.wait_ms.append(elapsed_ms)
+
+    def summary(self) -> dict:
+        with self._lock:
+            waits = sorted(self.wait_ms)
+            out = {
+                "checkouts": self.checkouts,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "connects": self.connects,
+                "invalidated": self.invalidated,
+            }
+        if waits:
+            out["checkout_wait_ms"] = {
+                "p50": round(percentile(waits, 0.50), 2),
+                "p95": round(percentile(waits, 0.95), 2),
+                "p99": round(percentile(waits, 0.99), 2),
+                "max": round(waits[-1], 2),
+            }
+        if hasattr(self._pool, "size"):
+            out["pool_size"] = self._pool.size()
+            out["overflow"] = self._pool.overflow()
+        return out
 
-engine = create_engine(DATABASE_URL, echo=False, future=True)  # echo=False para não logar SQL com segredos
-SessionLocal = sessionmaker(bind=engine, expire_on_commit=False, future=True)
+
+# Métricas do pool do engine padrão (get_engine / SessionLocal)
+POOL = PoolMetrics()
+# e do engine async (get_async_session_factory / AsyncAccountsRepo)
+ASYNC_POOL = PoolMetrics()
+
+
+def get_engine():
+    """
+    Engine criado no primeiro uso (importar o módulo não conecta nem configura nada).
+    Pool configurado por pool_options(); uso e espera em POOL.
+    """
+    global _engine
+    if _engine is None:
+        _engine = create_engine(
+            database_url(),
+            echo=False,  # echo=False para não logar SQL com segredos
+            **pool_options(),
+        )
+        POOL.attach(_engine)
+    return _engine
+
+
+def SessionLocal():
+    """
+    Fábrica padrão do AccountsRepo: uma conexão do engine (lazy).
+    Connection tem o mesmo contrato usado pelo repo (with/begin/execute),
+    então o caminho sync não precisa importar o ORM.
+    O tempo até a conexão sair do pool vai para POOL.
+    """
+    engine = get_engine()
+    t0 = time.perf_counter()
+    conn = engine.connect()
+    POOL.record_wait((time.perf_counter() - t0) * 1000)
+    return conn
+
+
+def _jsonb():
+    # importado sob demanda; o dialeto postgresql já vem junto com o engine na primeira conexão
+    from sqlalchemy.dialects.postgresql import JSONB
+    return JSONB
+
+
+_async_session_factory = None
+
+
+def get_async_session_factory():
+    """
+    async_sessionmaker sobre o mesmo banco, com driver asyncpg.
+    Criado só na primeira chamada, para o caminho sync não importar nada de asyncio.
+    """
+    global _async_session_factory
+    if _async_session_factory is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        options = pool_options()
+        if pgbouncer_mode():
+            # asyncpg prepara tudo com nomes próprios: no PgBouncer isso colide entre clientes
+            from uuid import uuid4
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+            }
+        async_engine = create_async_engine(
+            database_url().set(drivername="postgresql+asyncpg"), echo=False, **options
+        )
+        ASYNC_POOL.attach(async_engine.sync_engine)
+        _async_session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    return _async_session_factory
+
+
+def normalize_email(email: str) -> str:
+    """
+    Normaliza o email do lado do cliente, igual à expressão lower(trim(email))
+    do índice accounts_email_norm_idx (migrations/002). Assim o WHERE compara a
+    expressão indexada com um parâmetro e o Postgres usa index scan.
+    """
+    return email.strip(" ").lower()
+
+
+def default_worker_id() -> str:
+    """Identificador do worker gravado em accounts.leased_by (host:pid)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
 
 
 """ class Base(DeclarativeBase):
@@ -44,12 +258,91 @@ class  accounts(Base):
     notes: Mapped[str | None] = mapped_column(Text) """
 
 
-class AccountsRepo:
+class KeyProvider:
+    """
+    Resolve a chave do pgcrypto uma única vez e guarda em memória.
 
-    def __init__(self, session_factory: sessionmaker = SessionLocal):
-        self._Session = session_factory
+    Ordem de busca:
+      1. variável de ambiente (env_var, padrão PG_KEY);
+      2. file descriptor (fd, ou o número em <env_var>_FD) — lido uma vez e fechado;
+      3. ficheiro (key_path ou DEFAULT_KEY_PATH) — recarregado só se o mtime mudar;
+      4. getpass, apenas se interactive (padrão: stdin é um TTY).
+    Sem chave e sem TTY levanta RuntimeError em vez de travar num prompt.
+    """
+
+    def __init__(
+        self,
+        key_path: str | Path | None = None,
+        env_var: str | None = "PG_KEY",
+        fd: int | None = None,
+        interactive: bool | None = None,
+    ):
+        self.key_path = Path(key_path).expanduser() if key_path else DEFAULT_KEY_PATH
+        self.env_var = env_var
+        if fd is None and env_var:
+            fd_env = os.environ.get(f"{env_var}_FD")
+            fd = int(fd_env) if fd_env else None
+        self.fd = fd
+        self.interactive = sys.stdin.isatty() if interactive is None else interactive
+        self._lock = threading.Lock()
+        self._key: str | None = None
+        self._source: str | None = None  # "fd" | "file" | "prompt"
+        self._mtime_ns: int | None = None
 
-    def _read_key_file(self, path: Path) -> str | None:
+    def get(self) -> str:
+        if self.env_var:
+            env_key = os.environ.get(self.env_var, "").strip()
+            if env_key:
+                return env_key
+
+        with self._lock:
+            if self._source in ("fd", "prompt"):
+                return self._key
+
+            if self.fd is not None:
+                with os.fdopen(self.fd, "r", encoding="utf-8") as f:
+                    key = f.read().strip()
+                self.fd = None
+                if key:
+                    return self._remember(key, "fd")
+
+            # Um stat por chamada; só relê o ficheiro quando o mtime muda
+            try:
+                mtime_ns = self.key_path.stat().st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if self._source == "file" and mtime_ns == self._mtime_ns:
+                return self._key
+            self.invalidate()
+
+            if mtime_ns is not None:
+                with SPANS.span("key.read_file"):
+                    key = self._read_key_file(self.key_path)
+                if key:
+                    self._mtime_ns = mtime_ns
+                    return self._remember(key, "file")
+
+            if not self.interactive:
+                raise RuntimeError(
+                    f"Chave de criptografia não encontrada (env, fd ou {self.key_path}) "
+                    "e não há terminal para pedir via getpass."
+                )
+            # NÃO imprima a chave em logs!
+            key = getpass.getpass("Chave de criptografia (pgcrypto): ")
+            return self._remember(key, "prompt")
+
+    def invalidate(self) -> None:
+        self._key = None
+        self._source = None
+        self._mtime_ns = None
+
+    def _remember(self, key: str, source: str) -> str:
+        self._key = key
+        self._source = source
+        return key
+
+    @staticmethod
+    def _read_key_file(path: Path) -> str | None:
         try:
             # Certifica que existe
             if not path.exists():
@@ -74,8 +367,144 @@ class AccountsRepo:
             # não vaza exceções sensíveis; logue em debug se precisar
             return None
 
+
+class AccountsRepo:
+
+    # SQL que muda com o armazenamento dos perfis (ver TableProfilesRepo)
+    _SQL_SECRETS_BULK = """
+        WITH req AS (
+            SELECT r.email, r.name
+            FROM unnest(CAST(:emails AS text[]), CAST(:names AS text[])) AS r(email, name)
+        ),
+        acc AS (
+            SELECT lower(trim(email)) AS email, encrypted_password, user_creds
+            FROM public.accounts
+            WHERE lower(trim(email)) IN (SELECT email FROM req)
+        )
+        SELECT acc.email, NULL::text AS name, pgp_sym_decrypt(acc.encrypted_password, :key) AS secret
+        FROM acc
+        WHERE CAST(:include_password AS boolean)
+        UNION ALL
+        SELECT acc.email, (e).name, pgp_sym_decrypt((e).secret, :key)
+        FROM acc
+        CROSS JOIN LATERAL unnest(COALESCE(acc.user_creds, '{}'::public.user_cred[])) AS e
+        WHERE EXISTS (
+            SELECT 1 FROM req
+            WHERE req.email = acc.email AND (req.name IS NULL OR req.name = (e).name)
+        )
+    """
+    # nomes dos perfis de uma linha de public.accounts (export, reconciliação)
+    _SQL_PROFILE_NAMES = "ARRAY(SELECT (e).name FROM unnest(COALESCE(user_creds, '{}'::public.user_cred[])) AS e)"
+    # aplica um lote de correções (apply_profile_corrections); `cur` = contas ainda iguais à foto
+    _SQL_RECONCILE = """
+        WITH req AS (
+            SELECT r.id,
+                   ARRAY(SELECT jsonb_array_elements_text(r.expected) ORDER BY 1) AS expected,
+                   ARRAY(SELECT jsonb_array_elements_text(r.live)) AS live
+            FROM jsonb_to_recordset(CAST(:plan AS jsonb)) AS r(id bigint, expected jsonb, live jsonb)
+        ),
+        cur AS (
+            SELECT a.id, req.live
+            FROM public.accounts a
+            JOIN req ON req.id = a.id
+            WHERE ARRAY(SELECT (e).name FROM unnest(COALESCE(a.user_creds, '{}'::public.user_cred[])) AS e
+                        ORDER BY 1) = req.expected
+            FOR UPDATE OF a
+        )
+        UPDATE public.accounts a
+        SET user_creds = ARRAY(
+                SELECT ROW(e.name, e.secret)::public.user_cred
+                FROM unnest(COALESCE(a.user_creds, '{}'::public.user_cred[])) WITH ORDINALITY AS e(name, secret, ord)
+                WHERE e.name = ANY(cur.live)
+                ORDER BY e.ord
+            ) || ARRAY(
+                SELECT ROW(l.name, NULL::bytea)::public.user_cred
+                FROM unnest(cur.live) WITH ORDINALITY AS l(name, ord)
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM unnest(COALESCE(a.user_creds, '{}'::public.user_cred[])) AS x
+                    WHERE (x).name = l.name
+                )
+                ORDER BY l.ord
+            ),
+            used_slots = cardinality(cur.live),
+            availability = CASE
+                WHEN cardinality(cur.live) >= a.max_profiles THEN FALSE
+                WHEN a.used_slots >= a.max_profiles THEN TRUE
+                ELSE a.availability
+            END
+        FROM cur
+        WHERE a.id = cur.id
+        RETURNING a.id
+    """
+    # CTEs extras no lote da rotação (rodam com o lote `batch` já travado)
+    _SQL_ROTATE_EXTRA = ""
+
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        key_provider: "KeyProvider | None" = None,
+        codec: StateCodec | None = None,
+        prepared: bool | None = None,
+    ):
+        self._Session = session_factory
+        self.keys = key_provider or KeyProvider()
+        self.codec = codec or StateCodec.from_env()
+        self.prepared = prepared_statements_enabled() if prepared is None else prepared
+        self._path_keys: dict[Path, KeyProvider] = {}
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator["AccountsRepo"]:
+        """
+        Várias chamadas do repo numa conexão e numa transação só:
+
+            with repo.unit_of_work() as uow:
+                acc = uow.claim_available()
+                uow.provision_usercred(acc["email"], name, pin)
+
+        Commit na saída; qualquer exceção desfaz tudo. O repo entregue é do mesmo backend
+        e compartilha chave e codec com este.
+        """
+        with self._Session() as s, s.begin():
+            yield type(self)(lambda: _UnitOfWorkSession(s), key_provider=self.keys,
+                             codec=self.codec, prepared=self.prepared)
+
+    def _execute(self, s, sql, params: dict):
+        """
+        Executa uma query quente como prepared statement do servidor: PREPARE uma vez por
+        conexão do pool, depois só EXECUTE (sem parse/planejamento a cada chamada).
+        Com prepared=False (PgBouncer, asyncpg, EXPLAIN) é um s.execute normal.
+        """
+        if not self.prepared:
+            return s.execute(sql, params)
+        columns = getattr(sql, "column_args", None)
+        name, body, order = _prepared_statement(sql.element.text if columns is not None else sql.text)
+        prepared = _connection_info(s).setdefault("prepared_statements", set())
+        if name not in prepared:
+            s.execute(text(f"PREPARE {name} AS {body}").execution_options(no_parameters=True))
+            prepared.add(name)
+        stmt = text(f"EXECUTE {name}({', '.join(':' + p for p in order)})" if order else f"EXECUTE {name}")
+        if columns is not None:
+            stmt = stmt.columns(**{c.name: c.type for c in columns})
+        return s.execute(stmt, {p: params[p] for p in order})
+
+    def _key(self, key_path: str | None = None) -> str:
+        """
+        Chave do pgcrypto, resolvida uma vez e reutilizada entre chamadas.
+        key_path explícito usa um provider só daquele ficheiro (também em cache).
+        """
+        if not key_path:
+            return self.keys.get()
+        path = Path(key_path).expanduser()
+        provider = self._path_keys.get(path)
+        if provider is None:
+            provider = self._path_keys.setdefault(
+                path, KeyProvider(key_path=path, env_var=None, interactive=self.keys.interactive)
+            )
+        return provider.get()
+
+    @SPANS.traced("db.insert_account")
     def insert_account_pgcrypto(self, email: str, plain_pw: str) -> None:
-        key = getpass.getpass("Chave de criptografia (pgcrypto): ")
+        key = self._key()
         sql = text("""
             INSERT INTO public.accounts (email, encrypted_password, status)
             VALUES (:email, pgp_sym_encrypt(:plain_pw, :key)::bytea, 'ok')
@@ -86,75 +515,338 @@ class AccountsRepo:
         with self._Session() as s, s.begin():
             s.execute(sql, {"email": email, "plain_pw": plain_pw, "key": key})
 
+    @SPANS.traced("db.decrypt_password")
     def get_plain_password(self, email: str, key_path: str | None = None) -> str | None:
         """
-        Lê a chave de um ficheiro (key_path ou DEFAULT_KEY_PATH).
-        Se não existir, pede via getpass (modo atual).
+        A chave vem do KeyProvider do repo (ou do ficheiro key_path, se informado).
         """
-        # Resolve path do ficheiro (opcional)
-        key = None
-        if key_path:
-            key_file = Path(key_path).expanduser()
-            key = self._read_key_file(key_file)
-        else:
-            key = self._read_key_file(DEFAULT_KEY_PATH)
-
-        # fallback para pedir via getpass (se ainda não encontrou a chave)
-        if not key:
-            # NÃO imprima a chave em logs!
-            key = getpass.getpass("Chave de criptografia (pgcrypto): ")
+        key = self._key(key_path)
 
         sql = text("""
             SELECT pgp_sym_decrypt(encrypted_password, :key) AS plain_pw
             FROM public.accounts
-            WHERE trim(lower(email)) = lower(:email)
+            WHERE lower(trim(email)) = :email
         """)
         with self._Session() as s:
-            row = s.execute(sql, {"email": email, "key": key}).mappings().first()
+            row = self._execute(s, sql, {"email": normalize_email(email), "key": key}).mappings().first()
             return row and row["plain_pw"]
 
     def update_availability(self, email: str, availability: bool) -> None:
         sql = text("""
             UPDATE public.accounts
             SET availability = :availability
-            WHERE trim(lower(email)) = lower(:email)
+            WHERE lower(trim(email)) = :email
         """)
         with self._Session() as s, s.begin():
-            s.execute(sql, {"email": email, "availability": availability})
+            s.execute(sql, {"email": normalize_email(email), "availability": availability})
 
+    @staticmethod
+    def _decode_state(row: dict) -> dict:
+        """storage_state_z (codec) tem precedência; sem ele vale o jsonb legado."""
+        blob = row.pop("storage_state_z", None)
+        if blob is not None:
+            row["storage_state"] = StateCodec.decode(blob)
+        return row
+
+    @SPANS.traced("db.get_storage_state")
     def get_storage_state(self, email: str) -> dict | None:
         # .columns(JSONB()) ajuda o SQLAlchemy a desserializar em dict
         sql = text("""
-            SELECT storage_state
+            SELECT storage_state, storage_state_z
             FROM public.accounts
-            WHERE trim(lower(email)) = lower(:email)
-        """).columns(storage_state=JSONB())
+            WHERE lower(trim(email)) = :email
+        """).columns(storage_state=_jsonb()())
         with self._Session() as s:
-            return s.execute(sql, {"email": email}).scalar_one_or_none()
+            row = self._execute(s, sql, {"email": normalize_email(email)}).mappings().first()
+            return row and self._decode_state(dict(row))["storage_state"]
 
-    def save_storage_state(self, email: str, state: dict) -> None:
-        
+    @SPANS.traced("db.save_storage_state")
+    def save_storage_state(self, email: str, state: dict) -> bool:
+        """
+        Grava o storage_state podado e comprimido (self.codec) e, junto,
+        cookie_valid_until = expiração dos cookies de auth (sessions.auth_cookie_expiry),
+        usado na pré-checagem da sessão.
+        Se o conteúdo podado tem o mesmo hash do que já está gravado, não reescreve a linha.
+        Retorna True se gravou.
+        """
+        pruned, blob, sha = self.codec.encode(state)
         sql = text("""
             UPDATE public.accounts
-            SET storage_state = :state
-            WHERE trim(lower(email)) = lower(:email)
-            """).bindparams(bindparam("state", type_=JSONB))
+            SET storage_state_z = :blob,
+                storage_state_sha = :sha,
+                storage_state = NULL,
+                cookie_valid_until = :valid_until
+            WHERE lower(trim(email)) = :email
+              AND storage_state_sha IS DISTINCT FROM :sha
+            """)
 
         with self._Session() as s, s.begin():
-            s.execute(sql, {"email": email, "state": state})
+            written = self._execute(s, sql, {
+                "email": normalize_email(email),
+                "blob": blob,
+                "sha": sha,
+                "valid_until": sessions.auth_cookie_expiry(pruned),
+            }).rowcount > 0
+        self.codec.count_write(written)
+        return written
 
-    def get_first_available(self) -> dict | None:
-        sql = text("""
-            SELECT id, email, storage_state, availability, last_checked
+    @staticmethod
+    def _pick_sql(order: str, lock: bool) -> str:
+        """
+        Expressão com o id da próxima conta, ou NULL. Primeiro uma conta cujo cooldown
+        (next_eligible_at) já passou, para a nova tentativa não esperar as contas saudáveis
+        acabarem (accounts_cooldown_idx); senão a primeira conta pronta na ordem da política
+        (accounts_ready_*_idx, que não contém contas em cooldown nem unhealthy).
+        O COALESCE só avalia a segunda subquery se a primeira não achar nada.
+        """
+        lock_sql = "FOR UPDATE SKIP LOCKED" if lock else ""
+        lease_sql = "AND (lease_until IS NULL OR lease_until < now())" if lock else ""
+        return f"""COALESCE(
+                (SELECT id
+                 FROM public.accounts
+                 WHERE next_eligible_at <= now()
+                   AND availability = TRUE
+                   AND used_slots < max_profiles
+                   AND status IS DISTINCT FROM 'unhealthy'
+                   {lease_sql}
+                 ORDER BY next_eligible_at
+                 LIMIT 1
+                 {lock_sql}),
+                (SELECT id
+                 FROM public.accounts
+                 WHERE availability = TRUE
+                   AND used_slots < max_profiles
+                   AND next_eligible_at IS NULL
+                   AND status IS DISTINCT FROM 'unhealthy'
+                   {lease_sql}
+                 ORDER BY {order}
+                 LIMIT 1
+                 {lock_sql})
+            )"""
+
+    @SPANS.traced("db.select_account")
+    def get_first_available(self, policy: str | None = None) -> dict | None:
+        pick = self._pick_sql(SELECTION_ORDER[policy or DEFAULT_SELECTION_POLICY], lock=False)
+        sql = text(f"""
+            SELECT id, email, storage_state, storage_state_z, availability, last_checked,
+                   used_slots, max_profiles, max_profiles - used_slots AS free_slots
             FROM public.accounts
-            WHERE availability = TRUE
-            ORDER BY last_checked NULLS FIRST, id
-            LIMIT 1
-        """)
+            WHERE id = {pick}
+        """).columns(storage_state=_jsonb()())
         with self._Session() as s:
             row = s.execute(sql).mappings().first()
+            return self._decode_state(dict(row)) if row else None
+
+    @SPANS.traced("db.claim_account")
+    def claim_available(
+        self,
+        lease_seconds: int = 300,
+        worker_id: str | None = None,
+        policy: str | None = None,
+    ) -> dict | None:
+        """
+        Versão concorrente do get_first_available: reserva (lease) a conta para este worker.
+        FOR UPDATE SKIP LOCKED faz com que N workers peguem contas distintas sem se bloquearem;
+        o lease e o last_checked são gravados no mesmo statement.
+        Contas com lease vencido (worker que morreu) voltam a ser elegíveis.
+        Só considera contas com vaga (used_slots < max_profiles), pelo índice parcial
+        da política ("fill" ou "spread"); o retorno já traz free_slots, sem query de contagem.
+        Contas em cooldown (record_attempt) ficam de fora até next_eligible_at; o claim de
+        uma conta cujo cooldown acabou limpa next_eligible_at (a conta volta ao índice de
+        prontas, com fail_count intacto, se o worker morrer no meio da tentativa).
+        Retorna None se não houver conta livre.
+        """
+        pick = self._pick_sql(SELECTION_ORDER[policy or DEFAULT_SELECTION_POLICY], lock=True)
+        sql = text(f"""
+            WITH cand AS (
+                SELECT {pick} AS id
+            )
+            UPDATE public.accounts a
+            SET lease_until = now() + make_interval(secs => :lease_seconds),
+                leased_by = :worker_id,
+                last_checked = now(),
+                next_eligible_at = NULL
+            FROM cand
+            WHERE a.id = cand.id
+            RETURNING a.id, a.email, a.storage_state, a.storage_state_z, a.cookie_valid_until,
+                      a.availability, a.last_checked, a.lease_until, a.fail_count,
+                      a.used_slots, a.max_profiles, a.max_profiles - a.used_slots AS free_slots
+        """).columns(storage_state=_jsonb()())
+        with self._Session() as s, s.begin():
+            row = self._execute(s, sql, {
+                "lease_seconds": lease_seconds,
+                "worker_id": worker_id or default_worker_id(),
+            }).mappings().first()
+            return self._decode_state(dict(row)) if row else None
+
+    @SPANS.traced("db.claim_for_refresh")
+    def claim_for_refresh(
+        self,
+        limit: int = 16,
+        horizon_seconds: float = 24 * 3600,
+        max_age_seconds: float = 6 * 3600,
+        lease_seconds: int = 300,
+        worker_id: str | None = None,
+    ) -> list[dict]:
+        """
+        Reserva até `limit` contas cuja sessão precisa ser revalidada: cookies de auth
+        vencendo dentro de horizon_seconds (ou desconhecidos) ou sem checagem há mais de
+        max_age_seconds. Quem expira primeiro vem antes (accounts_refresh_due_idx).
+        Pula contas unhealthy, com lease de outro worker, em backoff ou revalidadas há
+        pouco (refresh_after, ver record_refresh).
+        O lease é o mesmo do claim_available: devolva com release_claim.
+        """
+        sql = text("""
+            WITH cand AS (
+                SELECT id
+                FROM public.accounts
+                WHERE availability = TRUE
+                  AND status IS DISTINCT FROM 'unhealthy'
+                  AND (lease_until IS NULL OR lease_until < now())
+                  AND (refresh_after IS NULL OR refresh_after < now())
+                  AND (cookie_valid_until IS NULL
+                       OR cookie_valid_until < now() + make_interval(secs => :horizon)
+                       OR last_checked IS NULL
+                       OR last_checked < now() - make_interval(secs => :max_age))
+                ORDER BY cookie_valid_until NULLS FIRST, last_checked NULLS FIRST, id
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE public.accounts a
+            SET lease_until = now() + make_interval(secs => :lease_seconds),
+                leased_by = :worker_id
+            FROM cand
+            WHERE a.id = cand.id
+            RETURNING a.id, a.email, a.storage_state, a.storage_state_z, a.cookie_valid_until,
+                      a.last_checked, a.refresh_failures
+        """).columns(storage_state=_jsonb()())
+        with self._Session() as s, s.begin():
+            rows = s.execute(sql, {
+                "limit": limit,
+                "horizon": horizon_seconds,
+                "max_age": max_age_seconds,
+                "lease_seconds": lease_seconds,
+                "worker_id": worker_id or default_worker_id(),
+            }).mappings().all()
+            return [self._decode_state(dict(r)) for r in rows]
+
+    def record_refresh(
+        self,
+        account_id: int,
+        ok: bool,
+        max_failures: int = 3,
+        retry_seconds: float = 900,
+        recheck_seconds: float = 3600,
+    ) -> dict | None:
+        """
+        Resultado de uma revalidação.
+        ok: zera as falhas, last_checked = now() e status 'ok' (uma conta 'failing' do
+        provisionamento continua assim até o record_attempt dela). A conta só volta para a
+        fila do claim_for_refresh depois de recheck_seconds: sem isso uma sessão cujos cookies
+        continuam dentro do horizonte (ou sem expiração) seria pega de novo na passada seguinte.
+        falha: refresh_failures + 1, próxima tentativa em retry_seconds * 2^(falhas - 1);
+        ao chegar em max_failures a conta vira 'unhealthy' (sai do claim_available).
+        Retorna {"refresh_failures", "status"}.
+        """
+        if ok:
+            sql = text("""
+                UPDATE public.accounts
+                SET refresh_failures = 0,
+                    refresh_after = now() + make_interval(secs => :recheck_seconds),
+                    last_checked = now(),
+                    status = CASE WHEN status = 'failing' THEN status ELSE 'ok' END
+                WHERE id = :account_id
+                RETURNING refresh_failures, status
+            """)
+            params = {"account_id": account_id, "recheck_seconds": recheck_seconds}
+        else:
+            sql = text("""
+                UPDATE public.accounts
+                SET refresh_failures = refresh_failures + 1,
+                    refresh_after = now() + make_interval(secs => :retry_seconds * power(2, refresh_failures)),
+                    status = CASE WHEN refresh_failures + 1 >= :max_failures THEN 'unhealthy' ELSE status END
+                WHERE id = :account_id
+                RETURNING refresh_failures, status
+            """)
+            params = {"account_id": account_id, "retry_seconds": retry_seconds, "max_failures": max_failures}
+        with self._Session() as s, s.begin():
+            row = s.execute(sql, params).mappings().first()
+            return dict(row) if row else None
+
+    @SPANS.traced("db.record_attempt")
+    def record_attempt(
+        self,
+        account_id: int,
+        ok: bool,
+        error: str | None = None,
+        max_failures: int = 5,
+        retry_seconds: float = 300,
+        max_retry_seconds: float = 6 * 3600,
+    ) -> dict | None:
+        """
+        Resultado de um provisionamento (login + perfil) na conta.
+        ok: zera fail_count, next_eligible_at e last_error e volta o status para 'ok'
+        (não regrava a linha se ela já estava assim).
+        falha: fail_count + 1, status 'failing' e cooldown de
+        retry_seconds * 2^(falhas - 1), no máximo max_retry_seconds; ao chegar em
+        max_failures a conta vira 'unhealthy' e sai da seleção.
+        Retorna {"fail_count", "status", "next_eligible_at"}, ou None se nada mudou.
+        """
+        if ok:
+            sql = text("""
+                UPDATE public.accounts
+                SET fail_count = 0,
+                    next_eligible_at = NULL,
+                    last_error = NULL,
+                    status = 'ok'
+                WHERE id = :account_id
+                  AND (fail_count > 0 OR next_eligible_at IS NOT NULL OR status IS DISTINCT FROM 'ok')
+                RETURNING fail_count, status, next_eligible_at
+            """)
+            params = {"account_id": account_id}
+        else:
+            sql = text("""
+                UPDATE public.accounts
+                SET fail_count = fail_count + 1,
+                    last_error = left(:error, 500),
+                    status = CASE WHEN fail_count + 1 >= :max_failures THEN 'unhealthy' ELSE 'failing' END,
+                    next_eligible_at = CASE
+                        WHEN fail_count + 1 >= :max_failures THEN NULL
+                        ELSE now() + make_interval(secs => least(:retry_seconds * power(2, fail_count),
+                                                                 :max_retry_seconds))
+                    END
+                WHERE id = :account_id
+                RETURNING fail_count, status, next_eligible_at
+            """)
+            params = {
+                "account_id": account_id,
+                "error": error,
+                "max_failures": max_failures,
+                "retry_seconds": retry_seconds,
+                "max_retry_seconds": max_retry_seconds,
+            }
+        with self._Session() as s, s.begin():
+            row = self._execute(s, sql, params).mappings().first()
             return dict(row) if row else None
 
+    @SPANS.traced("db.release_claim")
+    def release_claim(self, account_id: int, worker_id: str | None = None) -> bool:
+        """
+        Devolve a conta reservada por claim_available.
+        Só libera se o lease ainda for deste worker (evita soltar o lease de outro
+        worker que pegou a conta depois que o nosso expirou).
+        """
+        sql = text("""
+            UPDATE public.accounts
+            SET lease_until = NULL,
+                leased_by = NULL
+            WHERE id = :account_id
+              AND leased_by = :worker_id
+        """)
+        with self._Session() as s, s.begin():
+            r = self._execute(s, sql, {"account_id": account_id, "worker_id": worker_id or default_worker_id()})
+            return r.rowcount > 0
+
     def push_back_user(self, email: str, value: str, unique: bool = False) -> bool:
         """
         Adiciona 'value' ao final do array 'users'.
@@ -165,17 +857,17 @@ class AccountsRepo:
             sql = text("""
                 UPDATE public.accounts
                 SET users = array_append(COALESCE(users, '{}'::text[]), :value)
-                WHERE trim(lower(email)) = lower(:email)
+                WHERE lower(trim(email)) = :email
                   AND NOT (:value = ANY(COALESCE(users, '{}'::text[])))
             """)
         else:
             sql = text("""
                 UPDATE public.accounts
                 SET users = array_append(COALESCE(users, '{}'::text[]), :value)
-                WHERE trim(lower(email)) = lower(:email)
+                WHERE lower(trim(email)) = :email
             """)
         with self._Session() as s, s.begin():
-            result = s.execute(sql, {"email": email, "value": value})
+            result = s.execute(sql, {"email": normalize_email(email), "value": value})
             return result.rowcount > 0
 
     def remove_user(self, email: str, value: str) -> bool:
@@ -186,11 +878,11 @@ class AccountsRepo:
         sql = text("""
             UPDATE public.accounts
             SET users = array_remove(COALESCE(users, '{}'::text[]), :value)
-            WHERE trim(lower(email)) = lower(:email)
+            WHERE lower(trim(email)) = :email
               AND (:value = ANY(COALESCE(users, '{}'::text[])))
         """)
         with self._Session() as s, s.begin():
-            result = s.execute(sql, {"email": email, "value": value})
+            result = s.execute(sql, {"email": normalize_email(email), "value": value})
             return result.rowcount > 0
 
     def count_users(self, email: str) -> int:
@@ -200,29 +892,20 @@ class AccountsRepo:
         sql = text("""
             SELECT COALESCE(cardinality(users), 0) AS n
             FROM public.accounts
-            WHERE trim(lower(email)) = lower(:email)
+            WHERE lower(trim(email)) = :email
         """)
         with self._Session() as s:
-            row = s.execute(sql, {"email": email}).mappings().first()
+            row = s.execute(sql, {"email": normalize_email(email)}).mappings().first()
             return int(row["n"]) if row else 0
 
+    @SPANS.traced("db.upsert_usercred")
     def upsert_usercred_encrypted(self, email: str, name: str, plain_secret: str, key_path: str | None = None) -> bool:
         """
         Se existir um par com (name), atualiza somente o secret (recriptografa).
         Senão, adiciona (name, pgp_sym_encrypt(plain_secret, key)).
         Retorna True se houve alteração.
         """
-        key = None
-        if key_path:
-            key_file = Path(key_path).expanduser()
-            key = self._read_key_file(key_file)
-        else:
-            key = self._read_key_file(DEFAULT_KEY_PATH)
-
-        # fallback para pedir via getpass (se ainda não encontrou a chave)
-        if not key:
-            # NÃO imprima a chave em logs!
-            key = getpass.getpass("Chave de criptografia (pgcrypto): ")
+        key = self._key(key_path)
 
         # 1) tenta UPDATE-in-place (substitui apenas o secret de quem tiver name = :name)
         sql_update = text("""
@@ -235,7 +918,7 @@ class AccountsRepo:
                   )::public.user_cred
               FROM unnest(COALESCE(user_creds, '{}'::public.user_cred[])) AS e
             )
-            WHERE trim(lower(email)) = lower(:email)
+            WHERE lower(trim(email)) = :email
               AND EXISTS (
                 SELECT 1
                 FROM unnest(COALESCE(user_creds, '{}'::public.user_cred[])) AS ee
@@ -244,7 +927,7 @@ class AccountsRepo:
         """)
         with self._Session() as s, s.begin():
             r1 = s.execute(sql_update, {
-                "email": email,
+                "email": normalize_email(email),
                 "name": name,
                 "plain_secret": plain_secret,
                 "key": key
@@ -258,51 +941,88 @@ class AccountsRepo:
             SET user_creds = array_append(
                   COALESCE(user_creds, '{}'::public.user_cred[]),
                   ROW(:name, pgp_sym_encrypt(:plain_secret, :key)::bytea)::public.user_cred
-                )
-            WHERE trim(lower(email)) = lower(:email)
+                ),
+                used_slots = used_slots + 1,
+                availability = CASE WHEN used_slots + 1 >= max_profiles THEN FALSE ELSE availability END
+            WHERE lower(trim(email)) = :email
         """)
         with self._Session() as s, s.begin():
             r2 = s.execute(sql_append, {
-                "email": email,
+                "email": normalize_email(email),
                 "name": name,
                 "plain_secret": plain_secret,
                 "key": key
             })
             return r2.rowcount > 0
 
+    @SPANS.traced("db.decrypt_usercred")
     def get_usercred_plain(self, email: str, name: str, key_path: str | None = None) -> str | None:
         """
         Retorna o secret (decriptografado) para o par com 'name'.
         """
-        key = None
-        if key_path:
-            key_file = Path(key_path).expanduser()
-            key = self._read_key_file(key_file)
-        else:
-            key = self._read_key_file(DEFAULT_KEY_PATH)
-
-        # fallback para pedir via getpass (se ainda não encontrou a chave)
-        if not key:
-            # NÃO imprima a chave em logs!
-            key = getpass.getpass("Chave de criptografia (pgcrypto): ")
+        key = self._key(key_path)
 
 
         sql = text("""
             SELECT pgp_sym_decrypt((e).secret, :key) AS plain_secret
             FROM public.accounts
             CROSS JOIN LATERAL unnest(COALESCE(user_creds, '{}'::public.user_cred[])) AS e
-            WHERE trim(lower(email)) = lower(:email)
+            WHERE lower(trim(email)) = :email
               AND (e).name = :name
             LIMIT 1
         """)
         with self._Session() as s:
-            row = s.execute(sql, {"email": email, "name": name, "key": key}).mappings().first()
+            row = self._execute(s, sql, {"email": normalize_email(email), "name": name, "key": key}).mappings().first()
             return row and row["plain_secret"]
 
+    @SPANS.traced("db.decrypt_bulk")
+    def get_secrets_bulk(
+        self,
+        pairs: Iterable[tuple[str, str]] = (),
+        emails: Iterable[str] = (),
+        include_password: bool = True,
+        key_path: str | None = None,
+    ) -> dict[str, dict]:
+        """
+        Decifra vários segredos numa query só (unnest dos arrays de entrada):
+          pairs  -> (email, nome do perfil): só esses user_creds;
+          emails -> todas as user_creds dessas contas.
+        Retorna {email normalizado: {"password": str | None, "creds": {nome: secret}}};
+        contas inexistentes não aparecem, perfis inexistentes ficam de fora de "creds".
+        """
+        key = self._key(key_path)
+        req_emails, req_names = [], []
+        for email, name in pairs:
+            req_emails.append(normalize_email(email))
+            req_names.append(name)
+        for email in emails:
+            req_emails.append(normalize_email(email))
+            req_names.append(None)  # None = todos os perfis da conta
+        if not req_emails:
+            return {}
+
+        out: dict[str, dict] = {}
+        with self._Session() as s:
+            rows = s.execute(text(self._SQL_SECRETS_BULK), {
+                "emails": req_emails,
+                "names": req_names,
+                "include_password": include_password,
+                "key": key,
+            })
+            for email, name, secret in rows:
+                entry = out.setdefault(email, {"password": None, "creds": {}})
+                if name is None:
+                    entry["password"] = secret
+                else:
+                    entry["creds"][name] = secret
+        return out
+
+    @SPANS.traced("db.remove_usercred")
     def remove_usercred(self, email: str, name: str, ignore_case: bool = False) -> bool:
         """
         Remove do array user_creds todos os pares cujo (name) corresponda.
         Se ignore_case=True, compara case-insensitive.
+        Desconta used_slots e, se a conta estava lotada, volta a deixá-la disponível.
         Retorna True se removeu (houve UPDATE), False se não havia o name ou email não existe.
         """
         if ignore_case:
@@ -312,8 +1032,14 @@ class AccountsRepo:
                   SELECT e
                   FROM unnest(COALESCE(user_creds, '{}'::public.user_cred[])) AS e
                   WHERE lower((e).name) <> lower(:name)
-                )
-                WHERE trim(lower(email)) = lower(:email)
+                ),
+                used_slots = GREATEST(used_slots - (
+                  SELECT count(*)
+                  FROM unnest(COALESCE(user_creds, '{}'::public.user_cred[])) AS ec
+                  WHERE lower((ec).name) = lower(:name)
+                ), 0),
+                availability = availability OR used_slots >= max_profiles
+                WHERE lower(trim(email)) = :email
                   AND EXISTS (
                     SELECT 1
                     FROM unnest(COALESCE(user_creds, '{}'::public.user_cred[])) AS ee
@@ -327,8 +1053,14 @@ class AccountsRepo:
                   SELECT e
                   FROM unnest(COALESCE(user_creds, '{}'::public.user_cred[])) AS e
                   WHERE (e).name <> :name
-                )
-                WHERE trim(lower(email)) = lower(:email)
+                ),
+                used_slots = GREATEST(used_slots - (
+                  SELECT count(*)
+                  FROM unnest(COALESCE(user_creds, '{}'::public.user_cred[])) AS ec
+                  WHERE (ec).name = :name
+                ), 0),
+                availability = availability OR used_slots >= max_profiles
+                WHERE lower(trim(email)) = :email
                   AND EXISTS (
                     SELECT 1
                     FROM unnest(COALESCE(user_creds, '{}'::public.user_cred[])) AS ee
@@ -337,16 +1069,795 @@ class AccountsRepo:
             """)
 
         with self._Session() as s, s.begin():
-            r = s.execute(sql, {"email": email, "name": name})
+            r = s.execute(sql, {"email": normalize_email(email), "name": name})
             return r.rowcount > 0
 
     def count_usercreds(self, email: str) -> int:
         sql = text("""
             SELECT COALESCE(cardinality(user_creds), 0) AS n
             FROM public.accounts
-            WHERE trim(lower(email)) = lower(:email)
+            WHERE lower(trim(email)) = :email
+        """)
+        with self._Session() as s:
+            row = s.execute(sql, {"email": normalize_email(email)}).mappings().first()
+            return int(row["n"]) if row else 0
+
+
+    @SPANS.traced("db.provision_usercred")
+    def provision_usercred(
+        self,
+        email: str,
+        name: str,
+        plain_secret: str,
+        max_creds: int | None = None,
+        key_path: str | None = None,
+    ) -> dict | None:
+        """
+        Provisionamento num único statement (uma ida ao banco, uma transação):
+          - upsert do par (name, secret criptografado) em user_creds;
+          - used_slots += 1 quando o name é novo;
+          - availability = FALSE quando a conta atinge max_creds (padrão: accounts.max_profiles);
+          - RETURNING com o secret decriptografado e a nova contagem.
+        Substitui a sequência upsert_usercred_encrypted -> get_usercred_plain ->
+        count_usercreds -> update_availability. Como o SET é reavaliado sobre a
+        versão mais recente da linha, dois workers na mesma conta não perdem escrita.
+        Retorna {"plain_secret", "n_creds", "used_slots", "free_slots", "availability"}
+        ou None se o email não existe.
+        """
+        key = self._key(key_path)
+
+        sql = text("""
+            UPDATE public.accounts a
+            SET user_creds = CASE
+                    WHEN EXISTS (
+                        SELECT 1
+                        FROM unnest(COALESCE(a.user_creds, '{}'::public.user_cred[])) AS ee
+                        WHERE (ee).name = :name
+                    )
+                    THEN ARRAY(
+                        SELECT ROW((e).name,
+                                   CASE WHEN (e).name = :name
+                                        THEN pgp_sym_encrypt(:plain_secret, :key)::bytea
+                                        ELSE (e).secret END
+                            )::public.user_cred
+                        FROM unnest(COALESCE(a.user_creds, '{}'::public.user_cred[])) AS e
+                    )
+                    ELSE array_append(
+                        COALESCE(a.user_creds, '{}'::public.user_cred[]),
+                        ROW(:name, pgp_sym_encrypt(:plain_secret, :key)::bytea)::public.user_cred
+                    )
+                END,
+                used_slots = a.used_slots
+                    + CASE WHEN EXISTS (
+                          SELECT 1
+                          FROM unnest(COALESCE(a.user_creds, '{}'::public.user_cred[])) AS ee
+                          WHERE (ee).name = :name
+                      ) THEN 0 ELSE 1 END,
+                availability = CASE
+                    WHEN a.used_slots
+                         + CASE WHEN EXISTS (
+                               SELECT 1
+                               FROM unnest(COALESCE(a.user_creds, '{}'::public.user_cred[])) AS ee
+                               WHERE (ee).name = :name
+                           ) THEN 0 ELSE 1 END >= COALESCE(CAST(:max_creds AS int), a.max_profiles)
+                    THEN FALSE
+                    ELSE a.availability
+                END
+            WHERE lower(trim(a.email)) = :email
+            RETURNING
+                (SELECT pgp_sym_decrypt((e).secret, :key)
+                 FROM unnest(a.user_creds) AS e
+                 WHERE (e).name = :name
+                 LIMIT 1) AS plain_secret,
+                COALESCE(cardinality(a.user_creds), 0) AS n_creds,
+                a.used_slots,
+                a.max_profiles - a.used_slots AS free_slots,
+                a.availability
+        """)
+        with self._Session() as s, s.begin():
+            row = self._execute(s, sql, {
+                "email": normalize_email(email),
+                "name": name,
+                "plain_secret": plain_secret,
+                "key": key,
+                "max_creds": max_creds,
+            }).mappings().first()
+            return dict(row) if row else None
+
+
+    def rotate_key_batch(self, rotation_id: str, old_key: str, new_key: str, batch_size: int = 500) -> tuple[int, int]:
+        """
+        Um lote da rotação: as próximas `batch_size` contas depois do checkpoint (keyset por id)
+        têm encrypted_password e cada user_creds[].secret decifrados com old_key e cifrados
+        com new_key, tudo dentro do Postgres. O checkpoint avança na mesma transação.
+        Retorna (linhas do lote, novo last_id); (0, last_id) quando acabou.
+        """
+        sql_batch = text("""
+            WITH ck AS (
+                SELECT last_id FROM public.key_rotations WHERE rotation_id = :rotation_id FOR UPDATE
+            ),
+            batch AS (
+                SELECT id
+                FROM public.accounts
+                WHERE id > (SELECT last_id FROM ck)
+                ORDER BY id
+                LIMIT :batch_size
+                FOR UPDATE
+            ),
+            done AS (
+                UPDATE public.accounts a
+                SET encrypted_password = pgp_sym_encrypt(pgp_sym_decrypt(a.encrypted_password, :old_key), :new_key)::bytea,
+                    user_creds = ARRAY(
+                        SELECT ROW(e.name,
+                                   CASE WHEN e.secret IS NULL THEN NULL
+                                        ELSE pgp_sym_encrypt(pgp_sym_decrypt(e.secret, :old_key), :new_key)::bytea END
+                               )::public.user_cred
+                        FROM unnest(COALESCE(a.user_creds, '{}'::public.user_cred[])) WITH ORDINALITY AS e(name, secret, ord)
+                        ORDER BY e.ord
+                    )
+                FROM batch
+                WHERE a.id = batch.id
+                RETURNING a.id
+            )""" + self._SQL_ROTATE_EXTRA + """
+            UPDATE public.key_rotations k
+            SET last_id = COALESCE((SELECT max(id) FROM done), k.last_id),
+                rows_done = k.rows_done + (SELECT count(*) FROM done),
+                updated_at = now(),
+                finished_at = CASE WHEN (SELECT count(*) FROM done) = 0 THEN now() ELSE NULL END
+            WHERE k.rotation_id = :rotation_id
+            RETURNING (SELECT count(*) FROM done) AS n, k.last_id AS last_id
+        """)
+        with self._Session() as s, s.begin():
+            # lote curto: não espera muito por linha travada (a próxima execução retoma do checkpoint)
+            s.execute(text("SET LOCAL lock_timeout = '5s'"))
+            s.execute(text("""
+                INSERT INTO public.key_rotations (rotation_id) VALUES (:rotation_id)
+                ON CONFLICT (rotation_id) DO NOTHING
+            """), {"rotation_id": rotation_id})
+            row = s.execute(sql_batch, {
+                "rotation_id": rotation_id,
+                "old_key": old_key,
+                "new_key": new_key,
+                "batch_size": batch_size,
+            }).mappings().one()
+            return row["n"], row["last_id"]
+
+    def rotate_key(
+        self,
+        rotation_id: str,
+        old_key: str,
+        new_key: str,
+        batch_size: int = 500,
+        progress: Callable[[dict], None] | None = None,
+    ) -> dict:
+        """
+        Recriptografa todas as contas de old_key para new_key em lotes de batch_size,
+        cada um na sua transação (locks só nas linhas do lote). Retomável: chamar de novo
+        com o mesmo rotation_id continua do checkpoint em public.key_rotations.
+        Pause o provisionamento durante a rotação: escritas concorrentes ainda usam a chave antiga.
+        `progress` recebe {"rows", "last_id", "seconds", "rows_per_s"} a cada lote.
+        """
+        t0 = time.perf_counter()
+        rows = batches = 0
+        while True:
+            n, last_id = self.rotate_key_batch(rotation_id, old_key, new_key, batch_size)
+            elapsed = time.perf_counter() - t0
+            stats = {
+                "rows": rows + n,
+                "batches": batches + (1 if n else 0),
+                "last_id": last_id,
+                "seconds": round(elapsed, 3),
+                "rows_per_s": round((rows + n) / elapsed, 1) if elapsed > 0 else 0.0,
+            }
+            rows, batches = stats["rows"], stats["batches"]
+            if progress:
+                progress(stats)
+            if n == 0:
+                return stats
+
+
+    def bulk_import(self, rows: Iterable[dict]) -> dict:
+        """
+        Importa contas em lote: os pares {"email", "password"} entram por COPY numa tabela
+        temporária e um único statement cifra (pgp_sym_encrypt) e faz o upsert por email
+        normalizado. Tudo numa transação; a chave é resolvida uma vez.
+        Linhas sem email/senha, com email inválido ou repetidas no arquivo (vale a última)
+        contam como rejeitadas; contas cuja senha não mudou não são regravadas.
+        Retorna {"read", "rejected", "inserted", "updated", "unchanged"}.
+        """
+        key = self._key()
+        read = 0
+
+        def csv_lines():
+            nonlocal read
+            buf = io.StringIO()
+            w = csv.writer(buf)
+            for row in rows:
+                read += 1
+                w.writerow((read, row.get("email"), row.get("password")))
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+
+        sql_merge = text("""
+            WITH src AS (
+                SELECT DISTINCT ON (lower(trim(email))) lower(trim(email)) AS email, password
+                FROM import_accounts
+                WHERE trim(email) ~ '^[^@\\s]+@[^@\\s]+$' AND password <> ''
+                ORDER BY lower(trim(email)), line DESC
+            ),
+            cur AS (
+                SELECT a.id, src.email, src.password,
+                       pgp_sym_decrypt(a.encrypted_password, :key) = src.password AS same
+                FROM src
+                JOIN public.accounts a ON lower(trim(a.email)) = src.email
+            ),
+            upd AS (
+                UPDATE public.accounts a
+                SET encrypted_password = pgp_sym_encrypt(cur.password, :key)::bytea,
+                    status = 'ok'
+                FROM cur
+                WHERE a.id = cur.id AND NOT cur.same
+                RETURNING a.id
+            ),
+            ins AS (
+                INSERT INTO public.accounts (email, encrypted_password, status)
+                SELECT src.email, pgp_sym_encrypt(src.password, :key)::bytea, 'ok'
+                FROM src
+                WHERE NOT EXISTS (SELECT 1 FROM cur WHERE cur.email = src.email)
+                ON CONFLICT (email) DO NOTHING
+                RETURNING id
+            )
+            SELECT (SELECT count(*) FROM src) AS valid,
+                   (SELECT count(*) FROM ins) AS inserted,
+                   (SELECT count(*) FROM upd) AS updated,
+                   (SELECT count(*) FROM cur WHERE same) AS unchanged
+        """)
+        with self._Session() as s, s.begin():
+            s.execute(text("""
+                CREATE TEMP TABLE import_accounts (line int, email text, password text) ON COMMIT DROP
+            """))
+            with _dbapi_cursor(s) as cur:
+                cur.copy_expert(
+                    "COPY import_accounts (line, email, password) FROM STDIN WITH (FORMAT csv)",
+                    _LineStream(csv_lines()),
+                )
+            counts = dict(s.execute(sql_merge, {"key": key}).mappings().one())
+        return {
+            "read": read,
+            "rejected": read - counts["valid"],
+            "inserted": counts["inserted"],
+            "updated": counts["updated"],
+            "unchanged": counts["unchanged"],
+        }
+
+    def export_accounts(self, batch_size: int = 1000) -> Iterator[dict]:
+        """
+        Percorre todas as contas por um cursor do lado do servidor (memória constante),
+        sem senha, PINs nem storage_state: só o que serve para reconciliação.
+        """
+        sql = text(f"""
+            SELECT id, email, status, availability, used_slots, max_profiles,
+                   last_checked, cookie_valid_until,
+                   {self._SQL_PROFILE_NAMES} AS profiles
+            FROM public.accounts
+            ORDER BY id
         """)
         with self._Session() as s:
-            row = s.execute(sql, {"email": email}).mappings().first()
+            result = s.execution_options(stream_results=True, yield_per=batch_size).execute(sql)
+            for row in result.mappings():
+                yield dict(row)
+
+    def profile_snapshot(self, after_id: int = 0, limit: int = 200) -> list[dict]:
+        """
+        Uma página (keyset por id) das contas a reconciliar: id, email, sessão salva e os
+        perfis que o banco conhece. Pula contas com lease ativo (provisionamento em curso).
+        """
+        sql = text(f"""
+            SELECT id, email, status, cookie_valid_until, storage_state, storage_state_z,
+                   {self._SQL_PROFILE_NAMES} AS profiles
+            FROM public.accounts
+            WHERE id > :after_id
+              AND (lease_until IS NULL OR lease_until < now())
+            ORDER BY id
+            LIMIT :limit
+        """).columns(storage_state=_jsonb()())
+        with self._Session() as s:
+            rows = s.execute(sql, {"after_id": after_id, "limit": limit}).mappings().all()
+            return [self._decode_state(dict(r)) for r in rows]
+
+    @SPANS.traced("db.apply_profile_corrections")
+    def apply_profile_corrections(self, plan: list[dict], batch_size: int = 200) -> dict:
+        """
+        Reescreve os perfis das contas para o que existe no site, em lotes de batch_size
+        contas por transação (um statement por lote).
+        Cada item: {"id", "expected": perfis do banco na foto, "live": perfis no site}.
+        Perfis que sumiram do site saem do banco; os que só existem no site entram sem
+        secret (ocupam vaga). used_slots vira len(live) e availability acompanha.
+        Contas cujos perfis mudaram no banco desde a foto ficam de fora ("stale").
+        Retorna {"applied", "stale"}.
+        """
+        applied = 0
+        for i in range(0, len(plan), batch_size):
+            chunk = [
+                {"id": p["id"], "expected": list(p["expected"]), "live": list(dict.fromkeys(p["live"]))}
+                for p in plan[i:i + batch_size]
+            ]
+            with self._Session() as s, s.begin():
+                applied += len(s.execute(text(self._SQL_RECONCILE), {"plan": json.dumps(chunk)}).all())
+        return {"applied": applied, "stale": len(plan) - applied}
+
+
+
+class TableProfilesRepo(AccountsRepo):
+    """
+    AccountsRepo com os perfis em tabelas filhas (migrations/007) em vez dos arrays
+    users / user_creds da linha de accounts. Mesma interface e mesmos retornos.
+    Trocar o PIN de um perfil existente só toca a linha (account_id, name) de
+    account_creds; a linha de accounts (storage_state, arrays) só é regravada quando
+    used_slots/availability mudam. Os arrays antigos não são mais escritos.
+    """
+
+    _SQL_SECRETS_BULK = """
+        WITH req AS (
+            SELECT r.email, r.name
+            FROM unnest(CAST(:emails AS text[]), CAST(:names AS text[])) AS r(email, name)
+        ),
+        acc AS (
+            SELECT id, lower(trim(email)) AS email, encrypted_password
+            FROM public.accounts
+            WHERE lower(trim(email)) IN (SELECT email FROM req)
+        )
+        SELECT acc.email, NULL::text AS name, pgp_sym_decrypt(acc.encrypted_password, :key) AS secret
+        FROM acc
+        WHERE CAST(:include_password AS boolean)
+        UNION ALL
+        SELECT acc.email, c.name, pgp_sym_decrypt(c.secret, :key)
+        FROM acc
+        JOIN public.account_creds c ON c.account_id = acc.id
+        WHERE EXISTS (
+            SELECT 1 FROM req
+            WHERE req.email = acc.email AND (req.name IS NULL OR req.name = c.name)
+        )
+    """
+    _SQL_PROFILE_NAMES = """ARRAY(SELECT c.name FROM public.account_creds c
+                                  WHERE c.account_id = accounts.id
+                                  ORDER BY c.created_at, c.name)"""
+    _SQL_RECONCILE = """
+        WITH req AS (
+            SELECT r.id,
+                   ARRAY(SELECT jsonb_array_elements_text(r.expected) ORDER BY 1) AS expected,
+                   ARRAY(SELECT jsonb_array_elements_text(r.live)) AS live
+            FROM jsonb_to_recordset(CAST(:plan AS jsonb)) AS r(id bigint, expected jsonb, live jsonb)
+        ),
+        cur AS (
+            SELECT a.id, req.live
+            FROM public.accounts a
+            JOIN req ON req.id = a.id
+            WHERE ARRAY(SELECT c.name FROM public.account_creds c WHERE c.account_id = a.id
+                        ORDER BY 1) = req.expected
+            FOR UPDATE OF a
+        ),
+        del AS (
+            DELETE FROM public.account_creds c
+            USING cur
+            WHERE c.account_id = cur.id AND NOT c.name = ANY(cur.live)
+            RETURNING c.account_id
+        ),
+        ins AS (
+            INSERT INTO public.account_creds (account_id, name, secret)
+            SELECT cur.id, l.name, NULL
+            FROM cur
+            CROSS JOIN LATERAL unnest(cur.live) AS l(name)
+            ON CONFLICT (account_id, name) DO NOTHING
+            RETURNING account_id
+        )
+        UPDATE public.accounts a
+        SET used_slots = cardinality(cur.live),
+            availability = CASE
+                WHEN cardinality(cur.live) >= a.max_profiles THEN FALSE
+                WHEN a.used_slots >= a.max_profiles THEN TRUE
+                ELSE a.availability
+            END
+        FROM cur
+        WHERE a.id = cur.id
+        RETURNING a.id
+    """
+    _SQL_ROTATE_EXTRA = """,
+            creds AS (
+                UPDATE public.account_creds c
+                SET secret = pgp_sym_encrypt(pgp_sym_decrypt(c.secret, :old_key), :new_key)::bytea
+                FROM batch
+                WHERE c.account_id = batch.id AND c.secret IS NOT NULL
+                RETURNING c.account_id
+            )"""
+
+    def push_back_user(self, email: str, value: str, unique: bool = False) -> bool:
+        """
+        Adiciona 'value' aos users da conta (nova linha em account_users).
+        Se unique=True, só adiciona se ainda não existir.
+        Retorna True se inseriu, False caso contrário.
+        """
+        sql = text("""
+            INSERT INTO public.account_users (account_id, name)
+            SELECT id, :value
+            FROM public.accounts
+            WHERE lower(trim(email)) = :email
+              AND NOT (CAST(:unique AS boolean) AND EXISTS (
+                SELECT 1 FROM public.account_users u
+                WHERE u.account_id = accounts.id AND u.name = :value
+              ))
+        """)
+        with self._Session() as s, s.begin():
+            result = s.execute(sql, {"email": normalize_email(email), "value": value, "unique": unique})
+            return result.rowcount > 0
+
+    def remove_user(self, email: str, value: str) -> bool:
+        """
+        Remove todas as ocorrências de 'value' dos users da conta.
+        Retorna True se removeu, False se não havia o valor ou email não existe.
+        """
+        sql = text("""
+            DELETE FROM public.account_users
+            WHERE account_id = (SELECT id FROM public.accounts WHERE lower(trim(email)) = :email)
+              AND name = :value
+        """)
+        with self._Session() as s, s.begin():
+            result = s.execute(sql, {"email": normalize_email(email), "value": value})
+            return result.rowcount > 0
+
+    def count_users(self, email: str) -> int:
+        sql = text("""
+            SELECT count(*) AS n
+            FROM public.account_users
+            WHERE account_id = (SELECT id FROM public.accounts WHERE lower(trim(email)) = :email)
+        """)
+        with self._Session() as s:
+            row = s.execute(sql, {"email": normalize_email(email)}).mappings().first()
             return int(row["n"]) if row else 0
 
+    @SPANS.traced("db.upsert_usercred")
+    def upsert_usercred_encrypted(self, email: str, name: str, plain_secret: str, key_path: str | None = None) -> bool:
+        """
+        Upsert de (account_id, name) em account_creds; used_slots += 1 só quando o name é novo.
+        Retorna True se houve alteração.
+        """
+        sql = text("""
+            WITH ins AS (
+                INSERT INTO public.account_creds (account_id, name, secret)
+                SELECT id, :name, pgp_sym_encrypt(:plain_secret, :key)::bytea
+                FROM public.accounts
+                WHERE lower(trim(email)) = :email
+                ON CONFLICT (account_id, name) DO UPDATE SET secret = EXCLUDED.secret
+                RETURNING account_id, (xmax = 0) AS inserted
+            ),
+            bump AS (
+                UPDATE public.accounts a
+                SET used_slots = a.used_slots + 1,
+                    availability = CASE WHEN a.used_slots + 1 >= a.max_profiles THEN FALSE ELSE a.availability END
+                FROM ins
+                WHERE a.id = ins.account_id AND ins.inserted
+                RETURNING a.id
+            )
+            SELECT count(*) AS n FROM ins
+        """)
+        with self._Session() as s, s.begin():
+            n = s.execute(sql, {
+                "email": normalize_email(email),
+                "name": name,
+                "plain_secret": plain_secret,
+                "key": self._key(key_path),
+            }).scalar_one()
+            return n > 0
+
+    @SPANS.traced("db.decrypt_usercred")
+    def get_usercred_plain(self, email: str, name: str, key_path: str | None = None) -> str | None:
+        sql = text("""
+            SELECT pgp_sym_decrypt(secret, :key) AS plain_secret
+            FROM public.account_creds
+            WHERE account_id = (SELECT id FROM public.accounts WHERE lower(trim(email)) = :email)
+              AND name = :name
+        """)
+        with self._Session() as s:
+            row = self._execute(s, sql, {
+                "email": normalize_email(email), "name": name, "key": self._key(key_path),
+            }).mappings().first()
+            return row and row["plain_secret"]
+
+    @SPANS.traced("db.remove_usercred")
+    def remove_usercred(self, email: str, name: str, ignore_case: bool = False) -> bool:
+        """
+        Apaga os perfis com esse name (case-insensitive se ignore_case=True), desconta
+        used_slots e, se a conta estava lotada, volta a deixá-la disponível.
+        Retorna True se removeu, False se não havia o name ou email não existe.
+        """
+        match = "lower(name) = lower(:name)" if ignore_case else "name = :name"
+        sql = text(f"""
+            WITH del AS (
+                DELETE FROM public.account_creds
+                WHERE account_id = (SELECT id FROM public.accounts WHERE lower(trim(email)) = :email)
+                  AND {match}
+                RETURNING account_id
+            )
+            UPDATE public.accounts a
+            SET used_slots = GREATEST(a.used_slots - (SELECT count(*) FROM del), 0),
+                availability = a.availability OR a.used_slots >= a.max_profiles
+            WHERE a.id = (SELECT account_id FROM del LIMIT 1)
+        """)
+        with self._Session() as s, s.begin():
+            r = s.execute(sql, {"email": normalize_email(email), "name": name})
+            return r.rowcount > 0
+
+    def count_usercreds(self, email: str) -> int:
+        sql = text("""
+            SELECT count(*) AS n
+            FROM public.account_creds
+            WHERE account_id = (SELECT id FROM public.accounts WHERE lower(trim(email)) = :email)
+        """)
+        with self._Session() as s:
+            row = s.execute(sql, {"email": normalize_email(email)}).mappings().first()
+            return int(row["n"]) if row else 0
+
+    @SPANS.traced("db.provision_usercred")
+    def provision_usercred(
+        self,
+        email: str,
+        name: str,
+        plain_secret: str,
+        max_creds: int | None = None,
+        key_path: str | None = None,
+    ) -> dict | None:
+        """
+        Mesmo contrato do AccountsRepo.provision_usercred, num único statement:
+        upsert em account_creds e, só quando o name é novo (ou a conta acabou de lotar),
+        UPDATE de used_slots/availability em accounts. Trocar o PIN de um perfil
+        existente não regrava a linha da conta.
+        """
+        sql = text("""
+            WITH ins AS (
+                INSERT INTO public.account_creds (account_id, name, secret)
+                SELECT id, :name, pgp_sym_encrypt(:plain_secret, :key)::bytea
+                FROM public.accounts
+                WHERE lower(trim(email)) = :email
+                ON CONFLICT (account_id, name) DO UPDATE SET secret = EXCLUDED.secret
+                RETURNING account_id, secret, (xmax = 0) AS inserted
+            ),
+            upd AS (
+                UPDATE public.accounts a
+                SET used_slots = a.used_slots + CASE WHEN ins.inserted THEN 1 ELSE 0 END,
+                    availability = CASE
+                        WHEN a.used_slots + CASE WHEN ins.inserted THEN 1 ELSE 0 END
+                             >= COALESCE(CAST(:max_creds AS int), a.max_profiles)
+                        THEN FALSE
+                        ELSE a.availability
+                    END
+                FROM ins
+                WHERE a.id = ins.account_id
+                  AND (ins.inserted OR (a.availability AND a.used_slots >= COALESCE(CAST(:max_creds AS int), a.max_profiles)))
+                RETURNING a.id, a.used_slots, a.max_profiles, a.availability
+            )
+            SELECT pgp_sym_decrypt(ins.secret, :key) AS plain_secret,
+                   (SELECT count(*) FROM public.account_creds c WHERE c.account_id = ins.account_id)
+                       + CASE WHEN ins.inserted THEN 1 ELSE 0 END AS n_creds,
+                   COALESCE(upd.used_slots, a.used_slots) AS used_slots,
+                   COALESCE(upd.max_profiles, a.max_profiles) - COALESCE(upd.used_slots, a.used_slots) AS free_slots,
+                   COALESCE(upd.availability, a.availability) AS availability
+            FROM ins
+            JOIN public.accounts a ON a.id = ins.account_id
+            LEFT JOIN upd ON upd.id = ins.account_id
+        """)
+        with self._Session() as s, s.begin():
+            row = self._execute(s, sql, {
+                "email": normalize_email(email),
+                "name": name,
+                "plain_secret": plain_secret,
+                "key": self._key(key_path),
+                "max_creds": max_creds,
+            }).mappings().first()
+            return dict(row) if row else None
+
+
+# Onde ficam os perfis (PROFILE_STORAGE):
+#   "array" -> arrays users / user_creds na linha de accounts (AccountsRepo)
+#   "table" -> tabelas account_users / account_creds (TableProfilesRepo, migrations/007)
+PROFILE_BACKENDS = {"array": AccountsRepo, "table": TableProfilesRepo}
+
+
+def repo_class(storage: str | None = None) -> type[AccountsRepo]:
+    storage = storage or os.environ.get("PROFILE_STORAGE", "array")
+    try:
+        return PROFILE_BACKENDS[storage]
+    except KeyError:
+        raise ValueError(f"PROFILE_STORAGE inválido: {storage!r} (use {', '.join(PROFILE_BACKENDS)})") from None
+
+
+def make_accounts_repo(*args, storage: str | None = None, **kwargs) -> AccountsRepo:
+    """AccountsRepo do backend escolhido por PROFILE_STORAGE (padrão: "array")."""
+    return repo_class(storage)(*args, **kwargs)
+
+
+_PARAM = re.compile(r"(?<![:\w]):(\w+)")
+_prepared_cache: dict[str, tuple[str, str, list[str]]] = {}
+
+
+def _prepared_statement(sql: str) -> tuple[str, str, list[str]]:
+    """(nome, SQL com $1..$n, ordem dos parâmetros) para PREPARE; o nome vem do hash do SQL."""
+    cached = _prepared_cache.get(sql)
+    if cached is None:
+        order: list[str] = []
+
+        def positional(m):
+            if m.group(1) not in order:
+                order.append(m.group(1))
+            return f"${order.index(m.group(1)) + 1}"
+
+        body = _PARAM.sub(positional, sql)
+        name = "repo_" + hashlib.sha1(sql.encode("utf-8")).hexdigest()[:16]
+        cached = _prepared_cache.setdefault(sql, (name, body, order))
+    return cached
+
+
+def _connection_info(s) -> dict:
+    """info da conexão do pool (sobrevive entre checkouts; conexão nova = dict novo)."""
+    raw = s.connection
+    if callable(raw):
+        raw = raw()              # Session.connection() -> Connection
+    if hasattr(raw, "exec_driver_sql"):
+        raw = raw.connection     # Connection -> conexão do pool
+    return raw.info
+
+
+def _dbapi_cursor(s):
+    """Cursor do driver (psycopg2) sob uma Connection do SQLAlchemy ou uma Session do ORM, para COPY."""
+    raw = s.connection
+    if callable(raw):
+        raw = raw()              # Session.connection() -> Connection
+    if hasattr(raw, "exec_driver_sql"):
+        raw = raw.connection     # Connection -> conexão DBAPI do pool
+    return raw.cursor()
+
+
+class _LineStream:
+    """Arquivo só-leitura sobre um iterador de linhas, para o copy_expert ler aos pedaços."""
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._buf = ""
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buf) < size:
+            try:
+                self._buf += next(self._lines)
+            except StopIteration:
+                break
+        if size < 0:
+            out, self._buf = self._buf, ""
+        else:
+            out, self._buf = self._buf[:size], self._buf[size:]
+        return out
+
+
+class _UnitOfWorkSession:
+    """
+    A conexão do unit_of_work vista pelos métodos do repo: `with` não fecha e begin()
+    não abre outra transação; tudo entra na transação de AccountsRepo.unit_of_work.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def begin(self):
+        return nullcontext()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _BorrowedSession:
+    """
+    Entrega uma Session já aberta aos métodos do AccountsRepo (que fazem
+    `with self._Session() as s`) sem fechá-la; encerra a transação ao sair.
+    Se a transação já começou (o checkout medido em AsyncAccountsRepo._run), o
+    s.begin() do método não abre outra: o commit é o deste __exit__.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    def __enter__(self):
+        if self.session.in_transaction():
+            return _UnitOfWorkSession(self.session)
+        return self.session
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.session.in_transaction():
+            if exc_type is None:
+                self.session.commit()
+            else:
+                self.session.rollback()
+        return False
+
+
+class AsyncAccountsRepo:
+    """
+    Versão asyncio do AccountsRepo sobre o engine async (asyncpg).
+    Reaproveita o SQL do AccountsRepo: cada chamada roda o método sync dentro de
+    AsyncSession.run_sync, então o event loop nunca bloqueia em I/O do banco.
+    A chave é resolvida pelo mesmo KeyProvider; resolva-a antes de entrar no loop
+    (await asyncio.to_thread(repo.keys.get)) se ela puder vir do getpass.
+    """
+
+    def __init__(
+        self,
+        session_factory=None,
+        key_provider: KeyProvider | None = None,
+        codec: StateCodec | None = None,
+        storage: str | None = None,
+    ):
+        self._Session = session_factory or get_async_session_factory()
+        self.keys = key_provider or KeyProvider()
+        self.codec = codec or StateCodec.from_env()
+        self._repo_class = repo_class(storage)
+
+    async def _run(self, method: str, *args, **kwargs):
+        async with self._Session() as s:
+            t0 = time.perf_counter()
+            await s.connection()  # checkout agora, para medir a espera no pool
+            ASYNC_POOL.record_wait((time.perf_counter() - t0) * 1000)
+            def call(sync_session):
+                # asyncpg já prepara e guarda os statements por conexão
+                repo = self._repo_class(lambda: _BorrowedSession(sync_session), key_provider=self.keys,
+                                        codec=self.codec, prepared=False)
+                return getattr(repo, method)(*args, **kwargs)
+            return await s.run_sync(call)
+
+    async def claim_available(
+        self, lease_seconds: int = 300, worker_id: str | None = None, policy: str | None = None
+    ) -> dict | None:
+        return await self._run("claim_available", lease_seconds=lease_seconds, worker_id=worker_id, policy=policy)
+
+    async def record_attempt(self, account_id: int, ok: bool, error: str | None = None, **kwargs) -> dict | None:
+        return await self._run("record_attempt", account_id, ok, error, **kwargs)
+
+    async def release_claim(self, account_id: int, worker_id: str | None = None) -> bool:
+        return await self._run("release_claim", account_id, worker_id=worker_id)
+
+    async def claim_for_refresh(self, limit: int = 16, **kwargs) -> list[dict]:
+        return await self._run("claim_for_refresh", limit, **kwargs)
+
+    async def record_refresh(self, account_id: int, ok: bool, **kwargs) -> dict | None:
+        return await self._run("record_refresh", account_id, ok, **kwargs)
+
+    async def get_plain_password(self, email: str, key_path: str | None = None) -> str | None:
+        return await self._run("get_plain_password", email, key_path=key_path)
+
+    async def get_secrets_bulk(self, pairs=(), emails=(), include_password: bool = True) -> dict[str, dict]:
+        return await self._run("get_secrets_bulk", list(pairs), list(emails), include_password=include_password)
+
+    async def get_storage_state(self, email: str) -> dict | None:
+        return await self._run("get_storage_state", email)
+
+    async def profile_snapshot(self, after_id: int = 0, limit: int = 200) -> list[dict]:
+        return await self._run("profile_snapshot", after_id, limit)
+
+    async def apply_profile_corrections(self, plan: list[dict], batch_size: int = 200) -> dict:
+        return await self._run("apply_profile_corrections", plan, batch_size)
+
+    async def save_storage_state(self, email: str, state: dict) -> bool:
+        return await self._run("save_storage_state", email, state)
+
+    async def provision_usercred(
+        self,
+        email: str,
+        name: str,
+        plain_secret: str,
+        max_creds: int | None = None,
+        key_path: str | None = None,
+    ) -> dict | None:
+        return await self._run("provision_usercred", email, name, plain_secret, max_creds=max_creds, key_path=key_path)
@@ -0,0 +1,95 @@
+# Benchmark de contenção do AccountsRepo.claim_available contra um Postgres local.
+#
+# Cria contas descartáveis (bench-claim-N@example.invalid), dispara N workers em threads
+# fazendo claim -> release em loop e mede claims/s para cada quantidade de workers.
+# Também confere que dois workers nunca seguram a mesma conta ao mesmo tempo.
+#
+# uso: python benchmarks/bench_claims.py --url postgresql+psycopg2://postgres@localhost/netflix_accounts
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import Postgres
+
+EMAIL_PREFIX = "bench-claim-"
+
+
+def seed(engine, n_accounts: int) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM public.accounts WHERE email LIKE :p"), {"p": EMAIL_PREFIX + "%"})
+        conn.execute(text("""
+            INSERT INTO public.accounts (email, encrypted_password, status, availability)
+            SELECT :p || g || '@example.invalid', '\\x00'::bytea, 'bench', TRUE
+            FROM generate_series(1, :n) AS g
+        """), {"p": EMAIL_PREFIX, "n": n_accounts})
+
+
+def cleanup(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM public.accounts WHERE email LIKE :p"), {"p": EMAIL_PREFIX + "%"})
+
+
+def run(url: str, workers: int, seconds: float) -> tuple[int, int]:
+    engine = create_engine(url, pool_size=workers, max_overflow=0, future=True)
+    repo = Postgres.AccountsRepo(sessionmaker(bind=engine, expire_on_commit=False, future=True))
+
+    held: set[int] = set()
+    held_lock = threading.Lock()
+    counts = [0] * workers
+    conflicts = [0]
+    deadline = time.perf_counter() + seconds
+
+    def worker(i: int) -> None:
+        wid = f"bench-{i}"
+        while time.perf_counter() < deadline:
+            acc = repo.claim_available(lease_seconds=60, worker_id=wid)
+            if acc is None:
+                continue
+            with held_lock:
+                if acc["id"] in held:
+                    conflicts[0] += 1
+                held.add(acc["id"])
+            counts[i] += 1
+            with held_lock:
+                held.discard(acc["id"])
+            repo.release_claim(acc["id"], worker_id=wid)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    return sum(counts), conflicts[0]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de claims concorrentes (FOR UPDATE SKIP LOCKED).")
+    ap.add_argument("--url", default=os.environ.get("DATABASE_URL", "postgresql+psycopg2://postgres@localhost/netflix_accounts"))
+    ap.add_argument("--accounts", type=int, default=200)
+    ap.add_argument("--workers", default="1,2,4,8,16")
+    ap.add_argument("--seconds", type=float, default=5.0)
+    args = ap.parse_args()
+
+    engine = create_engine(args.url, future=True)
+    seed(engine, args.accounts)
+    try:
+        print(f"{'workers':>8} {'claims':>8} {'claims/s':>10} {'conflitos':>10}")
+        for n in (int(w) for w in args.workers.split(",")):
+            total, conflicts = run(args.url, n, args.seconds)
+            print(f"{n:>8} {total:>8} {total / args.seconds:>10.1f} {conflicts:>10}")
+    finally:
+        cleanup(engine)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
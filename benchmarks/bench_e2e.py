@@ -0,0 +1,186 @@
+# Benchmark ponta a ponta offline: o netflix_login_sc de verdade (processo, Chromium, Postgres)
+# contra o site local do fake_site.py e um banco descartável.
+#
+# 1. sobe o FakeSite com a latência pedida;
+# 2. cria o banco bench_e2e_<pid> (no mesmo servidor de --url), aplica migrations/*.sql
+#    com psql e semeia --accounts contas com senha cifrada pelo pgcrypto;
+# 3. para cada nível de --concurrency, dispara --runs processos
+#    `netflix_login_sc.py --username ... --headless --base-url <fake>` com no máximo N ao mesmo tempo;
+# 4. reporta runs/s, falhas e latência p50/p95/p99 por nível, mais o relatório de fases (spans);
+# 5. apaga o banco (a não ser com --keep-db).
+#
+# Requer psql no PATH (ou --psql) e `playwright install chromium`.
+#
+# uso: python benchmarks/bench_e2e.py --url postgresql+psycopg2://postgres@localhost/postgres \
+#          --concurrency 1,2,4,8 --runs 16 --latency-ms 80
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+import spans
+from fake_site import FakeSite
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH_KEY = "bench-e2e-key"
+
+
+def create_database(admin_url: str, psql: str) -> str:
+    """Cria o banco descartável, aplica as migrations e devolve a URL dele."""
+    name = f"bench_e2e_{os.getpid()}"
+    admin = create_engine(admin_url, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{name}"'))
+        conn.execute(text(f'CREATE DATABASE "{name}"'))
+    admin.dispose()
+
+    url = make_url(admin_url).set(database=name).render_as_string(hide_password=False)
+    libpq = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+    for migration in sorted((ROOT / "migrations").glob("*.sql")):
+        proc = subprocess.run([psql, "-q", "-v", "ON_ERROR_STOP=1", "-d", libpq, "-f", str(migration)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            drop_database(admin_url, url)
+            sys.exit(f"{migration.name} falhou: {proc.stderr.strip()}")
+    return url
+
+
+def drop_database(admin_url: str, url: str) -> None:
+    name = make_url(url).database
+    admin = create_engine(admin_url, isolation_level="AUTOCOMMIT")
+    with admin.connect() as conn:
+        conn.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+    admin.dispose()
+
+
+def seed(url: str, n_accounts: int, slots: int) -> None:
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO public.accounts (email, encrypted_password, status, availability, max_profiles)
+            SELECT 'bench-e2e-' || g || '@example.invalid', pgp_sym_encrypt('senha-' || g, :key)::bytea,
+                   'ok', TRUE, :slots
+            FROM generate_series(1, :n) AS g
+        """), {"key": BENCH_KEY, "n": n_accounts, "slots": slots})
+    engine.dispose()
+
+
+def last_error(output: str) -> str:
+    """Linha da exceção no traceback (ou a última linha), curta."""
+    lines = [l.strip() for l in output.strip().splitlines() if l.strip()]
+    for line in reversed(lines):
+        if "Error" in line.split(":", 1)[0] or "Exception" in line.split(":", 1)[0]:
+            return line[:200]
+    return lines[-1][:200] if lines else ""
+
+
+def parse_output(stdout: str) -> tuple[str, str] | None:
+    """(pin, plain_secret) de uma execução que provisionou; None para qualquer outra saída."""
+    lines = [l.strip() for l in stdout.splitlines() if l.strip()]
+    if len(lines) != 2 or any(" " in l for l in lines):
+        return None  # p.ex. "Nenhuma conta está disponível para uso"
+    return lines[0], lines[1]
+
+
+def one_run(username: str, env: dict, spans_path: str, timeout: float) -> tuple[bool, float, str]:
+    t0 = time.perf_counter()
+    try:
+        proc = subprocess.run(
+            [sys.executable, "netflix_login_sc.py", "--username", username, "--headless", "--spans", spans_path],
+            cwd=ROOT, env=env, capture_output=True, text=True, timeout=timeout,
+        )
+        ok = proc.returncode == 0 and parse_output(proc.stdout) is not None
+        err = "" if ok else last_error(proc.stdout if proc.returncode == 0 else proc.stderr or proc.stdout)
+    except subprocess.TimeoutExpired:
+        ok, err = False, "timeout"
+    return ok, (time.perf_counter() - t0) * 1000, err
+
+
+def run_level(concurrency: int, runs: int, env: dict, spans_path: str, timeout: float) -> dict:
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(
+            lambda i: one_run(f"bench-c{concurrency}-{i}", env, spans_path, timeout), range(runs)
+        ))
+    wall = time.perf_counter() - t0
+    latencies = sorted(ms for ok, ms, _ in results if ok)
+    errors = [err for ok, _, err in results if not ok]
+    out = {
+        "concurrency": concurrency,
+        "runs": runs,
+        "ok": len(latencies),
+        "failed": len(errors),
+        "runs_per_s": round(len(latencies) / wall, 2),
+    }
+    if latencies:
+        out.update({f"p{int(q * 100)}_ms": round(spans.percentile(latencies, q)) for q in (0.50, 0.95, 0.99)})
+    if errors:
+        out["first_error"] = errors[0]
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default=os.environ.get("DATABASE_URL"), required=not os.environ.get("DATABASE_URL"),
+                    help="banco administrativo do servidor onde o banco descartável é criado")
+    ap.add_argument("--psql", default="psql")
+    ap.add_argument("--concurrency", default="1,2,4,8")
+    ap.add_argument("--runs", type=int, default=16, help="execuções por nível de concorrência")
+    ap.add_argument("--accounts", type=int, default=32)
+    ap.add_argument("--slots", type=int, default=100, help="max_profiles das contas semeadas")
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    ap.add_argument("--jitter-ms", type=float, default=20.0)
+    ap.add_argument("--timeout", type=float, default=120.0, help="limite por execução (s)")
+    ap.add_argument("--keep-db", action="store_true")
+    args = ap.parse_args()
+
+    site = FakeSite(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms).start()
+    db_url = create_database(args.url, args.psql)
+    spans_path = tempfile.mkstemp(prefix="bench-e2e-", suffix=".jsonl")[1]
+    # seletores aprendidos no fake site ficam só neste benchmark, não no cache do usuário
+    selector_cache = tempfile.mkstemp(prefix="bench-e2e-selectors-", suffix=".json")[1]
+    try:
+        seed(db_url, args.accounts, args.slots)
+        host = site.url.split("//", 1)[1].split(":", 1)[0]
+        env = dict(
+            os.environ,
+            DATABASE_URL=db_url,
+            PG_KEY=BENCH_KEY,
+            NETFLIX_BASE_URL=site.url,
+            STATE_COOKIE_DOMAINS=host,  # cookies do fake site passam pela allowlist do StateCodec
+            STATE_ORIGINS=host,
+            NETFLIX_SELECTOR_CACHE=selector_cache,
+        )
+        print(f"fake site {site.url} | banco {make_url(db_url).database}", file=sys.stderr)
+
+        levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+        for c in levels:
+            print(json.dumps(run_level(c, args.runs, env, spans_path, args.timeout)), flush=True)
+
+        print(json.dumps({"site": {"logins": site.logins, "profiles_added": site.profiles_added}}), flush=True)
+        with open(spans_path, encoding="utf-8") as f:
+            phases = spans.report(json.loads(line) for line in f if line.strip())
+        print(json.dumps({"phases": phases}, indent=2))
+    finally:
+        site.stop()
+        os.unlink(spans_path)
+        os.unlink(selector_cache)
+        if args.keep_db:
+            print(f"banco mantido: {db_url}", file=sys.stderr)
+        else:
+            drop_database(args.url, db_url)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Pool, prepared statements e unit_of_work do AccountsRepo.
+#
+# Cria contas descartáveis (bench-pool-N@example.invalid) e roda, com --workers threads
+# sobre o engine padrão (Postgres.get_engine, configurado por PG_POOL_* / PG_PGBOUNCER),
+# a sequência de um provisionamento sem browser:
+#   claim_available -> get_plain_password -> get_storage_state -> release_claim
+# em três modos:
+#   text      -> uma conexão do pool por chamada, SQL re-analisado a cada vez
+#   prepared  -> uma conexão por chamada, PREPARE uma vez por conexão e depois EXECUTE
+#   uow       -> prepared + as quatro chamadas num repo.unit_of_work() (uma conexão)
+# Reporta sequências/s, latência da sequência e as métricas do pool (Postgres.POOL).
+#
+# uso: PG_KEY=... DATABASE_URL=postgresql+psycopg2://postgres@localhost/netflix_accounts \
+#      PG_POOL_SIZE=4 python benchmarks/bench_pool.py --workers 8
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+import Postgres
+import spans
+
+EMAIL_PREFIX = "bench-pool-"
+
+
+def seed(repo: Postgres.AccountsRepo, n_accounts: int) -> None:
+    cleanup()
+    with Postgres.get_engine().begin() as conn:
+        conn.execute(text("""
+            INSERT INTO public.accounts (email, encrypted_password, status, availability)
+            SELECT :p || g || '@example.invalid', pgp_sym_encrypt('senha-' || g, :key)::bytea, 'bench', TRUE
+            FROM generate_series(1, :n) AS g
+        """), {"p": EMAIL_PREFIX, "n": n_accounts, "key": repo.keys.get()})
+
+
+def cleanup() -> None:
+    with Postgres.get_engine().begin() as conn:
+        conn.execute(text("DELETE FROM public.accounts WHERE email LIKE :p"), {"p": EMAIL_PREFIX + "%"})
+
+
+def sequence(repo: Postgres.AccountsRepo, worker_id: str) -> None:
+    account = repo.claim_available(worker_id=worker_id)
+    if account is None:
+        return
+    repo.get_plain_password(account["email"])
+    repo.get_storage_state(account["email"])
+    repo.release_claim(account["id"], worker_id=worker_id)
+
+
+def run_mode(mode: str, workers: int, seconds: float) -> dict:
+    repo = Postgres.AccountsRepo(prepared=mode != "text")
+    times: list[float] = []
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def worker(n: int) -> None:
+        worker_id = f"bench-pool:{n}"
+        local = []
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            if mode == "uow":
+                with repo.unit_of_work() as uow:
+                    sequence(uow, worker_id)
+            else:
+                sequence(repo, worker_id)
+            local.append((time.perf_counter() - t0) * 1000)
+        with lock:
+            times.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    times.sort()
+    return {
+        "seq_per_s": round(len(times) / seconds, 1),
+        "p50_ms": round(spans.percentile(times, 0.50), 2),
+        "p95_ms": round(spans.percentile(times, 0.95), 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pool, prepared statements e unit_of_work do AccountsRepo.")
+    ap.add_argument("--accounts", type=int, default=2000)
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--modes", nargs="+", choices=("text", "prepared", "uow"), default=["text", "prepared", "uow"])
+    args = ap.parse_args()
+
+    repo = Postgres.AccountsRepo()
+    seed(repo, args.accounts)
+    print(f"pool: {json.dumps({k: str(v) for k, v in Postgres.pool_options().items()})}")
+    print(f"{'modo':>9} {'seq/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    try:
+        for mode in args.modes:
+            r = run_mode(mode, args.workers, args.seconds)
+            print(f"{mode:>9} {r['seq_per_s']:8.1f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f}")
+        print("POOL:", json.dumps(Postgres.POOL.summary()))
+    finally:
+        cleanup()
+        Postgres.get_engine().dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# Perfis em arrays (AccountsRepo) x tabelas filhas (TableProfilesRepo, migrations/007).
+#
+# Para cada backend cria --accounts contas descartáveis (bench-pstore-<backend>-N@example.invalid)
+# com um storage_state_z de --state-kb KB e --profiles perfis, e mede três operações:
+#   pin    -> provision_usercred num perfil que já existe (troca de PIN)
+#   add    -> provision_usercred de um perfil novo
+#   remove -> remove_usercred desse perfil novo
+# Reporta, por operação, latência (média/p95) e a amplificação de escrita:
+#   rows/op  -> linhas de accounts regravadas (xmin mudou)
+#   B/op     -> bytes dessas novas versões da linha (pg_column_size, sem o storage_state do TOAST)
+#   WAL B/op -> pg_current_wal_lsn antes/depois (o Postgres só loga o trecho alterado quando
+#               a nova versão fica na mesma página, então o WAL subestima a regravação)
+# Rode com o banco sem outra carga, senão o WAL de terceiros entra na conta.
+#
+# uso: PG_KEY=... python benchmarks/bench_profile_storage.py --url postgresql+psycopg2://postgres@localhost/netflix_accounts
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+import Postgres
+import spans
+
+EMAIL_PREFIX = "bench-pstore-"
+
+
+def seed(engine, repo: Postgres.AccountsRepo, storage: str, n_accounts: int, n_profiles: int, state_kb: int) -> list[str]:
+    cleanup(engine, storage)
+    prefix = f"{EMAIL_PREFIX}{storage}-"
+    with engine.begin() as conn:
+        # bytes aleatórios: não comprimem, ficam no TOAST como um storage_state real depois do codec
+        conn.execute(text("""
+            INSERT INTO public.accounts (email, encrypted_password, status, availability, max_profiles,
+                                         storage_state_z)
+            SELECT :p || g || '@example.invalid', pgp_sym_encrypt('senha-' || g, :key)::bytea, 'bench', FALSE,
+                   :n_profiles + 1,
+                   (SELECT string_agg(md5(random()::text), '') FROM generate_series(1, :chunks))::bytea
+            FROM generate_series(1, :n) AS g
+        """), {"p": prefix, "n": n_accounts, "key": repo.keys.get(), "n_profiles": n_profiles,
+               "chunks": max(1, state_kb * 1024 // 32)})
+    emails = [f"{prefix}{i}@example.invalid" for i in range(1, n_accounts + 1)]
+    for email in emails:
+        for j in range(n_profiles):
+            repo.provision_usercred(email, f"perfil{j}", f"{j:04d}")
+    return emails
+
+
+def cleanup(engine, storage: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM public.accounts WHERE email LIKE :p"),
+                     {"p": f"{EMAIL_PREFIX}{storage}-%"})
+
+
+def wal_lsn(engine) -> str:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT pg_current_wal_lsn()::text")).scalar_one()
+
+
+def wal_bytes(engine, since: str) -> int:
+    with engine.connect() as conn:
+        return int(conn.execute(text("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), CAST(:lsn AS pg_lsn))"),
+                                {"lsn": since}).scalar_one())
+
+
+def row_versions(engine, storage: str) -> dict[int, tuple[str, int]]:
+    """
+    {id: (xmin, bytes da linha)} das contas do benchmark. O storage_state fica no TOAST e o
+    UPDATE reaproveita o ponteiro, então ele não entra na conta.
+    """
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT id, xmin::text,
+                   pg_column_size(a.*) - COALESCE(pg_column_size(storage_state_z), 0)
+                                       - COALESCE(pg_column_size(storage_state), 0)
+            FROM public.accounts a
+            WHERE email LIKE :p
+        """), {"p": f"{EMAIL_PREFIX}{storage}-%"})
+        return {id_: (xmin, size) for id_, xmin, size in rows}
+
+
+def measure(engine, storage: str, emails: list[str], call) -> dict:
+    times = []
+    before = row_versions(engine, storage)
+    lsn = wal_lsn(engine)
+    for i, email in enumerate(emails):
+        t0 = time.perf_counter()
+        call(i, email)
+        times.append((time.perf_counter() - t0) * 1000)
+    wal = wal_bytes(engine, lsn)
+    after = row_versions(engine, storage)
+    rewritten = [size for id_, (xmin, size) in after.items() if before.get(id_, (None,))[0] != xmin]
+    return {
+        "ms": statistics.mean(times),
+        "p95": spans.percentile(sorted(times), 0.95),
+        "rows": len(rewritten) / len(emails),
+        "bytes": sum(rewritten) / len(emails),
+        "wal": wal / len(emails),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default=os.environ.get("DATABASE_URL"), required=not os.environ.get("DATABASE_URL"))
+    ap.add_argument("--accounts", type=int, default=500)
+    ap.add_argument("--profiles", type=int, default=4)
+    ap.add_argument("--state-kb", type=int, default=10, help="tamanho do storage_state_z por conta")
+    ap.add_argument("--storage", nargs="+", choices=sorted(Postgres.PROFILE_BACKENDS),
+                    default=["array", "table"])
+    args = ap.parse_args()
+
+    engine = create_engine(args.url)
+    print(f"{args.accounts} contas, {args.profiles} perfis, storage_state {args.state_kb} KB")
+    print(f"{'backend':>7} {'op':>6} {'ms/op':>8} {'p95':>8} {'rows/op':>8} {'B/op':>8} {'WAL B/op':>10}")
+    try:
+        for storage in args.storage:
+            repo = Postgres.repo_class(storage)(engine.connect)
+            emails = seed(engine, repo, storage, args.accounts, args.profiles, args.state_kb)
+            ops = (
+                ("pin", lambda i, e: repo.provision_usercred(e, "perfil0", f"{i % 10000:04d}")),
+                ("add", lambda i, e: repo.provision_usercred(e, "novo", "0000")),
+                ("remove", lambda i, e: repo.remove_usercred(e, "novo")),
+            )
+            for op, call in ops:
+                r = measure(engine, storage, emails, call)
+                print(f"{storage:>7} {op:>6} {r['ms']:8.2f} {r['p95']:8.2f} "
+                      f"{r['rows']:8.2f} {r['bytes']:8.0f} {r['wal']:10.0f}")
+    finally:
+        for storage in args.storage:
+            cleanup(engine, storage)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
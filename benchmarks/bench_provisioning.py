@@ -0,0 +1,97 @@
+# Compara o custo do provisionamento no banco:
+#   legado  -> upsert_usercred_encrypted + get_usercred_plain + count_usercreds + update_availability
+#   atual   -> provision_usercred (um statement)
+#
+# Cada iteração usa uma conta descartável nova e enche as vagas dela (accounts.max_profiles).
+# Reporta statements por provisionamento e latência média/p95.
+#
+# uso: PG_KEY=... python benchmarks/bench_provisioning.py --url postgresql+psycopg2://postgres@localhost/netflix_accounts
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+import Postgres
+
+EMAIL_PREFIX = "bench-prov-"
+
+
+def seed(engine, n_accounts: int) -> dict[str, int]:
+    """Contas descartáveis -> max_profiles de cada uma (o padrão da coluna)."""
+    cleanup(engine)
+    with engine.begin() as conn:
+        rows = conn.execute(text("""
+            INSERT INTO public.accounts (email, encrypted_password, status, availability)
+            SELECT :p || g || '@example.invalid', '\\x00'::bytea, 'bench', TRUE
+            FROM generate_series(1, :n) AS g
+            RETURNING email, max_profiles
+        """), {"p": EMAIL_PREFIX, "n": n_accounts})
+        return {email: max_profiles for email, max_profiles in rows}
+
+
+def cleanup(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM public.accounts WHERE email LIKE :p"), {"p": EMAIL_PREFIX + "%"})
+
+
+def legacy(repo: Postgres.AccountsRepo, email: str, name: str, pin: str, max_profiles: int) -> None:
+    if repo.upsert_usercred_encrypted(email, name, pin):
+        repo.get_usercred_plain(email, name)
+        if repo.count_usercreds(email) == max_profiles:
+            repo.update_availability(email, False)
+
+
+def single(repo: Postgres.AccountsRepo, email: str, name: str, pin: str, max_profiles: int) -> None:
+    repo.provision_usercred(email, name, pin)
+
+
+def measure(engine, repo, fn, accounts: dict[str, int]) -> tuple[list[float], float]:
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    timings = []
+    try:
+        for email, max_profiles in accounts.items():
+            for slot in range(max_profiles):
+                t0 = time.perf_counter()
+                fn(repo, email, f"user{slot}", "1234", max_profiles)
+                timings.append((time.perf_counter() - t0) * 1000)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return timings, statements[0] / len(timings)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark do provisionamento legado vs provision_usercred.")
+    ap.add_argument("--url", default=os.environ.get("DATABASE_URL", "postgresql+psycopg2://postgres@localhost/netflix_accounts"))
+    ap.add_argument("--accounts", type=int, default=200)
+    args = ap.parse_args()
+
+    engine = create_engine(args.url, future=True)
+    repo = Postgres.AccountsRepo(sessionmaker(bind=engine, expire_on_commit=False, future=True))
+    repo.keys.get()  # resolve a chave fora da medição
+
+    print(f"{'modo':>8} {'stmts/op':>9} {'média ms':>9} {'p95 ms':>8}")
+    try:
+        for label, fn in (("legado", legacy), ("single", single)):
+            accounts = seed(engine, args.accounts)
+            timings, stmts = measure(engine, repo, fn, accounts)
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            print(f"{label:>8} {stmts:>9.1f} {statistics.mean(timings):>9.2f} {p95:>8.2f}")
+    finally:
+        cleanup(engine)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
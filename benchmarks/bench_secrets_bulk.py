@@ -0,0 +1,100 @@
+# get_secrets_bulk x laço de get_plain_password + get_usercred_plain.
+#
+# Cria contas descartáveis (bench-secrets-N@example.invalid) com --profiles perfis cada,
+# e para lotes de --accounts contas mede:
+#   loop -> 1 get_plain_password + 1 get_usercred_plain por perfil (uma ida ao banco por segredo)
+#   bulk -> 1 get_secrets_bulk(emails=...) (uma ida ao banco no total)
+# Confere que os dois devolvem os mesmos segredos e reporta tempo médio e statements.
+#
+# uso: PG_KEY=... python benchmarks/bench_secrets_bulk.py --url postgresql+psycopg2://postgres@localhost/netflix_accounts
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+
+import Postgres
+import spans
+
+EMAIL_PREFIX = "bench-secrets-"
+
+
+def seed(engine, repo: Postgres.AccountsRepo, n_accounts: int, n_profiles: int) -> list[str]:
+    cleanup(engine)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO public.accounts (email, encrypted_password, status, max_profiles)
+            SELECT :p || g || '@example.invalid', pgp_sym_encrypt('senha-' || g, :key)::bytea, 'bench', :n_profiles
+            FROM generate_series(1, :n) AS g
+        """), {"p": EMAIL_PREFIX, "n": n_accounts, "key": repo.keys.get(), "n_profiles": n_profiles})
+    emails = [f"{EMAIL_PREFIX}{i}@example.invalid" for i in range(1, n_accounts + 1)]
+    for email in emails:
+        for j in range(n_profiles):
+            repo.provision_usercred(email, f"perfil{j}", f"{j:04d}")
+    return emails
+
+
+def cleanup(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM public.accounts WHERE email LIKE :p"), {"p": EMAIL_PREFIX + "%"})
+
+
+def loop(repo: Postgres.AccountsRepo, emails: list[str], n_profiles: int) -> dict:
+    out = {}
+    for email in emails:
+        out[email] = {
+            "password": repo.get_plain_password(email),
+            "creds": {f"perfil{j}": repo.get_usercred_plain(email, f"perfil{j}") for j in range(n_profiles)},
+        }
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default=os.environ.get("DATABASE_URL"), required=not os.environ.get("DATABASE_URL"))
+    ap.add_argument("--accounts", type=int, default=50)
+    ap.add_argument("--profiles", type=int, default=4)
+    ap.add_argument("--repeat", type=int, default=10)
+    args = ap.parse_args()
+
+    engine = create_engine(args.url)
+    statements = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*_):
+        statements[0] += 1
+
+    repo = Postgres.AccountsRepo(engine.connect)
+    emails = seed(engine, repo, args.accounts, args.profiles)
+    try:
+        results = {}
+        for label, call in (
+            ("loop", lambda: loop(repo, emails, args.profiles)),
+            ("bulk", lambda: repo.get_secrets_bulk(emails=emails)),
+        ):
+            times = []
+            statements[0] = 0
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                got = call()
+                times.append((time.perf_counter() - t0) * 1000)
+            results[label] = got
+            times.sort()
+            print(f"{label:>5}: {statistics.mean(times):8.1f} ms/lote  "
+                  f"p95 {spans.percentile(times, 0.95):8.1f} ms  "
+                  f"{statements[0] / args.repeat:6.0f} statements/lote")
+        assert results["loop"] == results["bulk"], "loop e bulk divergiram"
+        print(f"{args.accounts} contas x ({args.profiles} perfis + senha) = "
+              f"{args.accounts * (args.profiles + 1)} segredos por lote")
+    finally:
+        cleanup(engine)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Orçamento de startup do netflix_login_sc.
+#
+# 1. `python -X importtime -c "import netflix_login_sc"`: tempo de import acumulado
+#    (mediana de N execuções) e os módulos mais caros;
+# 2. com --url, o caminho rápido completo "nenhuma conta disponível"
+#    (processo inteiro, DATABASE_URL apontando para um banco sem contas livres).
+#
+# Sai com código 1 se algum valor passar de --budget-ms.
+#
+# uso: python benchmarks/bench_startup.py --budget-ms 400 [--url postgresql+psycopg2://...]
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def import_profile(module: str) -> tuple[int, list[tuple[int, str]]]:
+    """(cumulativo do módulo em us, [(self us, módulo), ...])"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    total, selfs = 0, []
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, _, name = int(m[1]), int(m[2]), m[3], m[4]
+        selfs.append((self_us, name))
+        if name == module:
+            total = cumulative_us
+    return total, selfs
+
+
+def fast_path_ms(url: str) -> float:
+    env = dict(os.environ, DATABASE_URL=url)
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "netflix_login_sc.py", "--username", "bench-startup"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    elapsed = (time.perf_counter() - t0) * 1000
+    if "Nenhuma conta" not in proc.stdout:
+        raise SystemExit(f"o banco tem conta disponível (ou falhou): {proc.stdout}{proc.stderr}")
+    return elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Mede o tempo de startup do netflix_login_sc.")
+    ap.add_argument("--module", default="netflix_login_sc")
+    ap.add_argument("--runs", type=int, default=7)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--budget-ms", type=float, default=None)
+    ap.add_argument("--url", help="banco sem contas livres para medir o caminho rápido completo")
+    args = ap.parse_args()
+
+    import_profile(args.module)  # aquece o cache de bytecode
+    totals, selfs = [], []
+    for _ in range(args.runs):
+        total, selfs = import_profile(args.module)
+        totals.append(total / 1000)
+    import_ms = statistics.median(totals)
+    print(f"import {args.module}: mediana {import_ms:.1f} ms ({args.runs} execuções)")
+    print("módulos mais caros (self):")
+    for self_us, name in sorted(selfs, reverse=True)[: args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+
+    heavy = [name for _, name in selfs if name.split(".")[0] in ("playwright", "greenlet")]
+    if heavy:
+        print(f"AVISO: Playwright importado no startup ({len(heavy)} módulos)")
+
+    over = args.budget_ms is not None and import_ms > args.budget_ms
+    if args.url:
+        runs = [fast_path_ms(args.url) for _ in range(max(1, args.runs // 2))]
+        fast_ms = statistics.median(runs)
+        print(f"caminho 'nenhuma conta disponível': mediana {fast_ms:.1f} ms")
+        over = over or (args.budget_ms is not None and fast_ms > args.budget_ms)
+
+    if over:
+        print(f"ACIMA do orçamento de {args.budget_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
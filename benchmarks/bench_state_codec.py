@@ -0,0 +1,121 @@
+# Tamanho do storage_state gravado e UPDATEs evitados pelo StateCodec.
+#
+# Cria uma conta descartável (bench-state@example.invalid) e grava um storage_state sintético
+# parecido com o real (cookies de auth + dezenas de cookies de terceiros + localStorage grande):
+#   - compara pg_column_size do jsonb legado com o blob podado/comprimido;
+#   - regrava o state N vezes (ordem dos cookies embaralhada, de vez em quando um cookie muda)
+#     e conta writes x skipped;
+#   - mede a latência média do save_storage_state nos dois casos.
+# Com --migrate, converte para storage_state_z todas as linhas que ainda só têm o jsonb legado.
+#
+# uso: python benchmarks/bench_state_codec.py --url postgresql+psycopg2://postgres@localhost/netflix_accounts
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.dialects.postgresql import JSONB
+
+import Postgres
+from state_codec import StateCodec
+
+EMAIL = "bench-state@example.invalid"
+
+
+def sample_state(n_third_party: int = 40, ls_kb: int = 64) -> dict:
+    expires = time.time() + 30 * 86400
+    cookies = [
+        {"name": name, "value": "v" * 300, "domain": ".netflix.com", "path": "/",
+         "expires": expires, "httpOnly": True, "secure": True, "sameSite": "Lax"}
+        for name in ("NetflixId", "SecureNetflixId", "nfvdid", "flwssn")
+    ]
+    for i in range(n_third_party):
+        cookies.append({"name": f"_tp{i}", "value": "x" * 120, "domain": f".tracker{i % 7}.example",
+                        "path": "/", "expires": expires, "httpOnly": False, "secure": True, "sameSite": "None"})
+    blob = "".join(random.choice("abcdef0123456789") for _ in range(ls_kb * 1024))
+    origins = [
+        {"origin": "https://www.netflix.com", "localStorage": [{"name": "nf:cache", "value": blob[: len(blob) // 4]}]},
+        {"origin": "https://assets.example-cdn.net", "localStorage": [{"name": "bundle", "value": blob}]},
+    ]
+    return {"cookies": cookies, "origins": origins}
+
+
+def migrate(engine, repo: Postgres.AccountsRepo) -> int:
+    """Regrava pelo codec as linhas que só têm o jsonb legado."""
+    with engine.connect() as conn:
+        emails = conn.execute(text("""
+            SELECT email FROM public.accounts
+            WHERE storage_state IS NOT NULL AND storage_state_z IS NULL
+        """)).scalars().all()
+    for email in emails:
+        repo.save_storage_state(email, repo.get_storage_state(email))
+    return len(emails)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default=os.environ.get("DATABASE_URL"), required=not os.environ.get("DATABASE_URL"))
+    ap.add_argument("--repeats", type=int, default=200)
+    ap.add_argument("--migrate", action="store_true")
+    args = ap.parse_args()
+
+    engine = create_engine(args.url)
+    codec = StateCodec()
+    repo = Postgres.AccountsRepo(engine.connect, codec=codec)
+
+    if args.migrate:
+        print(f"linhas convertidas: {migrate(engine, repo)}")
+        return
+
+    state = sample_state()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM public.accounts WHERE email = :e"), {"e": EMAIL})
+        conn.execute(text("""
+            INSERT INTO public.accounts (email, encrypted_password, status, storage_state)
+            VALUES (:e, '\\x00'::bytea, 'bench', :s)
+        """).bindparams(bindparam("s", type_=JSONB)), {"e": EMAIL, "s": state})
+        legacy = conn.execute(text("SELECT pg_column_size(storage_state) FROM public.accounts WHERE email = :e"),
+                              {"e": EMAIL}).scalar()
+
+    try:
+        # gravações equivalentes (ordem dos cookies embaralhada) devem ser evitadas
+        timings = {True: [], False: []}
+        for i in range(args.repeats):
+            random.shuffle(state["cookies"])
+            if i % 10 == 0:
+                # 1 em 10 muda de verdade (cookie de auth) e outra muda só num cookie de terceiro
+                next(c for c in state["cookies"] if c["name"] == "NetflixId")["value"] += "!"
+            elif i % 10 == 5:
+                next(c for c in state["cookies"] if c["name"].startswith("_tp"))["value"] += "!"
+            t0 = time.perf_counter()
+            written = repo.save_storage_state(EMAIL, state)
+            timings[written].append((time.perf_counter() - t0) * 1000)
+
+        with engine.connect() as conn:
+            stored = conn.execute(text("SELECT pg_column_size(storage_state_z) FROM public.accounts WHERE email = :e"),
+                                  {"e": EMAIL}).scalar()
+        loaded = repo.get_storage_state(EMAIL)
+        assert loaded == codec.prune(state), "round-trip do codec divergiu"
+
+        summary = codec.summary()
+        print(json.dumps({
+            "raw_json_bytes": len(json.dumps(state, separators=(",", ":"))),
+            "legacy_jsonb_column_bytes": legacy,
+            "codec_column_bytes": stored,
+            "codec": summary,
+            "write_ms_mean": round(sum(timings[True]) / max(len(timings[True]), 1), 2),
+            "skip_ms_mean": round(sum(timings[False]) / max(len(timings[False]), 1), 2),
+        }, indent=2))
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM public.accounts WHERE email = :e"), {"e": EMAIL})
+
+
+if __name__ == "__main__":
+    main()
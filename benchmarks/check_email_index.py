@@ -0,0 +1,128 @@
+# Verificação via EXPLAIN de que todas as buscas por email do AccountsRepo usam o
+# índice accounts_email_norm_idx (migrations/002) em vez de seq scan.
+#
+# Popula contas descartáveis, chama cada método do repo e, para cada statement que
+# toca public.accounts, roda EXPLAIN com os mesmos parâmetros no mesmo cursor.
+# Sai com código 1 se algum plano não tiver Index Scan / Bitmap Index Scan no índice.
+#
+# uso: python benchmarks/check_email_index.py --url postgresql+psycopg2://postgres@localhost/netflix_accounts [--storage table]
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+import Postgres
+
+EMAIL_PREFIX = "bench-explain-"
+INDEX_NAME = "accounts_email_norm_idx"
+BENCH_KEY = "bench-key"
+
+
+def seed(engine, n_accounts: int) -> str:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM public.accounts WHERE email LIKE :p"), {"p": EMAIL_PREFIX + "%"})
+        conn.execute(text("""
+            INSERT INTO public.accounts (email, encrypted_password, status, availability)
+            SELECT :p || g || '@example.invalid', pgp_sym_encrypt('pw' || g, :key)::bytea, 'bench', FALSE
+            FROM generate_series(1, :n) AS g
+        """), {"p": EMAIL_PREFIX, "n": n_accounts, "key": BENCH_KEY})
+        conn.execute(text("ANALYZE public.accounts"))
+    # email "sujo" de propósito: o cliente é que normaliza
+    return f"  {EMAIL_PREFIX.upper()}{n_accounts // 2}@EXAMPLE.INVALID "
+
+
+def cleanup(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM public.accounts WHERE email LIKE :p"), {"p": EMAIL_PREFIX + "%"})
+
+
+def _scans(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _scans(child)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Confere via EXPLAIN que as buscas por email usam índice.")
+    ap.add_argument("--url", default=os.environ.get("DATABASE_URL", "postgresql+psycopg2://postgres@localhost/netflix_accounts"))
+    ap.add_argument("--accounts", type=int, default=20_000)
+    ap.add_argument("--storage", choices=sorted(Postgres.PROFILE_BACKENDS), default="array",
+                    help="backend dos perfis (PROFILE_STORAGE)")
+    args = ap.parse_args()
+
+    engine = create_engine(args.url, future=True)
+    email = seed(engine, args.accounts)
+
+    plans: list[tuple[str, str, dict]] = []
+    current = {"method": None}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if current["method"] is None or "public.accounts" not in statement or "lower(trim(email))" not in statement:
+            return
+        cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        plans.append((current["method"], statement, plan[0]["Plan"]))
+
+    with tempfile.NamedTemporaryFile("w", delete=False) as f:
+        f.write(BENCH_KEY)
+    os.chmod(f.name, 0o600)
+
+    # prepared=False: o EXPLAIN precisa ver o SQL, não o EXECUTE do statement preparado
+    repo = Postgres.repo_class(args.storage)(sessionmaker(bind=engine, expire_on_commit=False, future=True),
+                                             prepared=False)
+    calls = [
+        ("get_plain_password", lambda: repo.get_plain_password(email, key_path=f.name)),
+        ("update_availability", lambda: repo.update_availability(email, False)),
+        ("get_storage_state", lambda: repo.get_storage_state(email)),
+        ("save_storage_state", lambda: repo.save_storage_state(email, {"cookies": [], "origins": []})),
+        ("push_back_user", lambda: repo.push_back_user(email, "bench", unique=True)),
+        ("count_users", lambda: repo.count_users(email)),
+        ("remove_user", lambda: repo.remove_user(email, "bench")),
+        ("upsert_usercred_encrypted", lambda: repo.upsert_usercred_encrypted(email, "bench", "1234", key_path=f.name)),
+        ("get_usercred_plain", lambda: repo.get_usercred_plain(email, "bench", key_path=f.name)),
+        ("count_usercreds", lambda: repo.count_usercreds(email)),
+        ("get_secrets_bulk", lambda: repo.get_secrets_bulk(pairs=[(email, "bench")], key_path=f.name)),
+        ("remove_usercred", lambda: repo.remove_usercred(email, "bench")),
+    ]
+
+    failed = 0
+    try:
+        for name, call in calls:
+            current["method"] = name
+            call()
+        current["method"] = None
+    finally:
+        cleanup(engine)
+        engine.dispose()
+        os.unlink(f.name)
+
+    seen = set()
+    for name, statement, plan in plans:
+        seen.add(name)
+        nodes = list(_scans(plan))
+        ok = any(n.get("Index Name") == INDEX_NAME for n in nodes)
+        seq = any(n.get("Node Type") == "Seq Scan" and n.get("Relation Name") == "accounts" for n in nodes)
+        status = "ok" if ok and not seq else "FALHOU"
+        failed += status != "ok"
+        print(f"{status:>6}  {name}")
+
+    for name, _ in calls:
+        if name not in seen:
+            failed += 1
+            print(f"{'FALHOU':>6}  {name} (nenhum statement capturado)")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
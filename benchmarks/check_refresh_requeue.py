@@ -0,0 +1,95 @@
+# Verificação de que o session_refresher não pega de novo, na passada seguinte, uma conta
+# que acabou de revalidar (AccountsRepo.claim_for_refresh + record_refresh).
+#
+# Popula contas descartáveis com cookies vencendo dentro do horizonte e sem expiração
+# conhecida (cookie_valid_until NULL), que são as que continuam na fila depois de uma
+# revalidação, e confere:
+#   1. a primeira passada reserva todas;
+#   2. depois de record_refresh(ok=True) a passada seguinte não reserva nenhuma;
+#   3. passado recheck_seconds elas voltam para a fila.
+# Contas de fora do teste que entrarem no claim são devolvidas na hora.
+# Sai com código 1 se alguma verificação falhar.
+#
+# uso: python benchmarks/check_refresh_requeue.py --url postgresql+psycopg2://postgres@localhost/netflix_accounts
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import Postgres
+
+EMAIL_PREFIX = "bench-refresh-"
+WORKER_ID = "check-refresh-requeue"
+
+
+def seed(engine, n_accounts: int) -> None:
+    cleanup(engine)
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO public.accounts (email, encrypted_password, status, availability, cookie_valid_until)
+            SELECT :p || g || '@example.invalid', '\\x00'::bytea, 'bench', TRUE,
+                   CASE WHEN g % 2 = 0 THEN now() + interval '2 hours' END
+            FROM generate_series(1, :n) AS g
+        """), {"p": EMAIL_PREFIX, "n": n_accounts})
+
+
+def cleanup(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM public.accounts WHERE email LIKE :p"), {"p": EMAIL_PREFIX + "%"})
+
+
+def claim(repo: Postgres.AccountsRepo) -> set[int]:
+    """Uma passada do refresher: ids das contas do teste reservadas (as outras voltam na hora)."""
+    ours = set()
+    for account in repo.claim_for_refresh(limit=100_000, worker_id=WORKER_ID):
+        if account["email"].startswith(EMAIL_PREFIX):
+            ours.add(account["id"])
+        repo.release_claim(account["id"], worker_id=WORKER_ID)
+    return ours
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Confere que uma conta revalidada sai da fila do refresher.")
+    ap.add_argument("--url", default=os.environ.get("DATABASE_URL", "postgresql+psycopg2://postgres@localhost/netflix_accounts"))
+    ap.add_argument("--accounts", type=int, default=20)
+    args = ap.parse_args()
+
+    engine = create_engine(args.url, future=True)
+    repo = Postgres.AccountsRepo(sessionmaker(bind=engine, expire_on_commit=False, future=True))
+    seed(engine, args.accounts)
+
+    checks = []
+    try:
+        first = claim(repo)
+        checks.append(("primeira passada reserva todas", len(first) == args.accounts))
+
+        for account_id in first:
+            repo.record_refresh(account_id, ok=True, recheck_seconds=3600)
+        second = claim(repo)
+        checks.append(("revalidadas não voltam na passada seguinte", not second))
+
+        with engine.begin() as conn:
+            conn.execute(text("""
+                UPDATE public.accounts SET refresh_after = now() - interval '1 second'
+                WHERE email LIKE :p
+            """), {"p": EMAIL_PREFIX + "%"})
+        third = claim(repo)
+        checks.append(("voltam depois de recheck_seconds", third == first))
+    finally:
+        cleanup(engine)
+        engine.dispose()
+
+    failed = 0
+    for name, ok in checks:
+        failed += not ok
+        print(f"{'ok' if ok else 'FALHOU':>6}  {name}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+# Site local que reproduz os contratos de DOM que pages.py usa (data-uia, paths e redirects),
+# para rodar o fluxo real do netflix_login_sc sem tocar no site de verdade.
+#
+#   /login              formulário (userLoginId, password, login-submit-button); POST grava
+#                       os cookies NetflixId/SecureNetflixId e redireciona para /browse
+#   /browse             home logada (profile-avatar)
+#   /account/           conteúdo da conta; sem cookie -> /login
+#   /account/profiles   lista de perfis (titular + os criados com esse NetflixId), botão
+#                       addProfile + modal; salvar -> ?profileAdded=success
+#
+# Latência por resposta configurável (--latency-ms / --jitter-ms).
+#
+# uso: python benchmarks/fake_site.py --port 8900 --latency-ms 150
+
+import argparse
+import random
+import threading
+import time
+from html import escape
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+COOKIE_MAX_AGE = 30 * 86400
+OWNER_PROFILE = "Titular"
+
+LOGIN_HTML = """<!doctype html><html><body>
+<form method="post" action="/login">
+  <input name="userLoginId" id="id_userLoginId" data-uia="login-field" type="email">
+  <input name="password" id="id_password" data-uia="password-field" type="password">
+  <button type="submit" data-uia="login-submit-button">Entrar</button>
+</form>
+</body></html>"""
+
+BROWSE_HTML = """<!doctype html><html><body>
+<a class="menu-trigger" data-uia="main-header-menu-trigger" href="/browse">Menu</a>
+<div data-uia="profile-avatar">perfil</div>
+</body></html>"""
+
+ACCOUNT_HTML = """<!doctype html><html><body>
+<div data-uia="account-overview">Conta</div>
+<a href="/account/profiles">Perfis</a>
+</body></html>"""
+
+PROFILES_HTML = """<!doctype html><html><body>
+<!--PROFILES-->
+<button data-uia="menu-card+button" data-cl-view="addProfile">Adicionar perfil</button>
+<div data-uia="account-profiles-page+add-profile+background" style="display:none">
+  <input data-uia="account-profiles-page+add-profile+name-input">
+  <button data-uia="account-profiles-page+add-profile+primary-button">Salvar</button>
+</div>
+<script>
+  const modal = document.querySelector('[data-uia="account-profiles-page+add-profile+background"]');
+  document.querySelector('[data-cl-view="addProfile"]').onclick = () => { modal.style.display = "block"; };
+  modal.querySelector("button").onclick = () => {
+    const name = modal.querySelector("input").value;
+    fetch("/account/profiles/add", {method: "POST", body: name}).then(() => {
+      location.href = "/account/profiles?profileAdded=success";
+    });
+  };
+</script>
+</body></html>"""
+
+
+class FakeSite:
+    """ThreadingHTTPServer em background; `url` é a base_url para o PageConfig."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.logins = 0
+        self.profiles_added = 0
+        self.profiles: dict[str, list[str]] = {}  # NetflixId -> perfis criados (sem o titular)
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-site", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeSite":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _delay(self) -> None:
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _logged(self) -> bool:
+                return "NetflixId=" in (self.headers.get("Cookie") or "")
+
+            def _session(self) -> str:
+                morsel = SimpleCookie(self.headers.get("Cookie") or "").get("NetflixId")
+                return morsel.value if morsel else ""
+
+            def _profiles_html(self) -> str:
+                with site._lock:
+                    names = [OWNER_PROFILE, *site.profiles.get(self._session(), [])]
+                return "\n".join(
+                    f'<button data-uia="menu-card+button" data-cl-view="profileSettings">'
+                    f'<p data-uia="menu-card+title">{escape(n)}</p></button>'
+                    for n in names
+                )
+
+            def _html(self, body: str, headers: tuple[tuple[str, str], ...] = ()) -> None:
+                payload = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in headers:
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _redirect(self, location: str, headers: tuple[tuple[str, str], ...] = ()) -> None:
+                self.send_response(302)
+                self.send_header("Location", location)
+                self.send_header("Content-Length", "0")
+                for k, v in headers:
+                    self.send_header(k, v)
+                self.end_headers()
+
+            def do_GET(self):
+                site._delay()
+                path = urlsplit(self.path).path
+                if path == "/login":
+                    return self._html(LOGIN_HTML)
+                if path in ("/browse", "/account", "/account/", "/account/profiles"):
+                    if not self._logged():
+                        return self._redirect("/login")
+                    if path == "/browse":
+                        return self._html(BROWSE_HTML)
+                    if path == "/account/profiles":
+                        return self._html(PROFILES_HTML.replace("<!--PROFILES-->", self._profiles_html()))
+                    return self._html(ACCOUNT_HTML)
+                self.send_error(404)
+
+            def do_POST(self):
+                site._delay()
+                path = urlsplit(self.path).path
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8", "replace")
+                if path == "/login":
+                    form = parse_qs(body)
+                    if not form.get("userLoginId") or not form.get("password"):
+                        return self._redirect("/login")
+                    with site._lock:
+                        site.logins += 1
+                        n = site.logins
+                    cookies = tuple(
+                        ("Set-Cookie", f"{name}=fake-{n}; Path=/; Max-Age={COOKIE_MAX_AGE}; HttpOnly")
+                        for name in ("NetflixId", "SecureNetflixId")
+                    )
+                    return self._redirect("/browse", cookies)
+                if path == "/account/profiles/add":
+                    if not self._logged():
+                        return self.send_error(403)
+                    with site._lock:
+                        site.profiles_added += 1
+                        site.profiles.setdefault(self._session(), []).append(body)
+                    self.send_response(204)
+                    self.end_headers()
+                    return
+                self.send_error(404)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Site local com os contratos de DOM do pages.py.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8900)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--jitter-ms", type=float, default=0.0)
+    args = ap.parse_args()
+
+    site = FakeSite(args.host, args.port, args.latency_ms, args.jitter_ms).start()
+    print(f"fake site em {site.url}  (NETFLIX_BASE_URL={site.url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Circuit breaker do provisionamento.
+
+O backoff por conta (AccountsRepo.record_attempt) cuida de uma conta quebrada. Quando
+quase todas as tentativas falham ao mesmo tempo o problema é do site (fora do ar, layout
+novo, bloqueio), não das contas: continuar só queima browser e joga contas boas em cooldown.
+O breaker olha a taxa de falhas das últimas tentativas de todas as contas e, passando do
+limite, abre: o lote para de pegar contas até o fim (cooldown_s = 0) ou por cooldown_s
+segundos (provision_server, que fica no ar).
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+
+class CircuitBreaker:
+
+    def __init__(
+        self,
+        window: int = 20,
+        min_samples: int = 8,
+        max_failure_rate: float = 0.6,
+        cooldown_s: float = 0.0,
+    ):
+        # window = 0 desliga o breaker
+        self.window = window
+        self.min_samples = min_samples
+        self.max_failure_rate = max_failure_rate
+        self.cooldown_s = cooldown_s
+        self._results: deque[bool] = deque(maxlen=max(window, 1))
+        self._opened_at: float | None = None
+        self._reason: str | None = None
+        self._trips = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, cooldown_s: float = 0.0) -> "CircuitBreaker":
+        return cls(
+            window=int(os.environ.get("NETFLIX_BREAKER_WINDOW", 20)),
+            min_samples=int(os.environ.get("NETFLIX_BREAKER_MIN_SAMPLES", 8)),
+            max_failure_rate=float(os.environ.get("NETFLIX_BREAKER_FAILURE_RATE", 0.6)),
+            cooldown_s=float(os.environ.get("NETFLIX_BREAKER_COOLDOWN_S", cooldown_s)),
+        )
+
+    def _expire(self) -> None:
+        if (self._opened_at is not None and self.cooldown_s > 0
+                and time.monotonic() - self._opened_at >= self.cooldown_s):
+            self._opened_at = None
+            self._results.clear()  # recomeça a contar do zero
+
+    def allow(self) -> bool:
+        """False enquanto o breaker estiver aberto: não pegue outra conta."""
+        with self._lock:
+            self._expire()
+            return self._opened_at is None
+
+    def record(self, ok: bool) -> bool:
+        """Registra uma tentativa; True se foi esta que abriu o breaker."""
+        if self.window <= 0:
+            return False
+        with self._lock:
+            self._expire()
+            if self._opened_at is not None:
+                return False  # tentativas que já estavam em andamento não contam
+            self._results.append(ok)
+            failures = self._results.count(False)
+            if len(self._results) < self.min_samples or failures < self.max_failure_rate * len(self._results):
+                return False
+            self._opened_at = time.monotonic()
+            self._trips += 1
+            self._reason = (f"circuit breaker aberto: {failures} falhas nas últimas "
+                            f"{len(self._results)} tentativas")
+            return True
+
+    @property
+    def reason(self) -> str | None:
+        return self._reason
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "open": self._opened_at is not None,
+                "trips": self._trips,
+                "recent": len(self._results),
+                "recent_failures": self._results.count(False),
+            }
@@ -0,0 +1,91 @@
+# bulk_accounts.py
+# Importação/exportação de contas em lote.
+#
+#   python bulk_accounts.py import fornecedor.csv            # CSV com cabeçalho email,password
+#   python bulk_accounts.py import fornecedor.jsonl          # {"email": ..., "password": ...} por linha
+#   python bulk_accounts.py export -o contas.jsonl           # sem senhas/PINs, para reconciliação
+#
+# O import passa por COPY + um upsert com pgp_sym_encrypt no banco (AccountsRepo.bulk_import):
+# uma transação e uma leitura da chave, não importa quantas contas.
+
+import argparse
+import csv
+import json
+import sys
+import time
+from datetime import datetime
+
+import Postgres
+
+
+def read_rows(path: str, fmt: str | None):
+    """Gera {"email", "password"} do arquivo (ou stdin com "-"), sem carregá-lo inteiro."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8", newline="")
+    try:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                yield {"email": row.get("email"), "password": row.get("password")}
+        else:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = {}
+                yield {"email": row.get("email"), "password": row.get("password")}
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _jsonable(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Importação/exportação de contas em lote.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import")
+    imp.add_argument("file", help='CSV (email,password) ou JSONL; "-" = stdin')
+    imp.add_argument("--format", choices=("csv", "jsonl"))
+    exp = sub.add_parser("export")
+    exp.add_argument("-o", "--output", default="-")
+    exp.add_argument("--format", choices=("csv", "jsonl"), default="jsonl")
+    args = ap.parse_args()
+
+    repo = Postgres.make_accounts_repo()
+
+    if args.cmd == "import":
+        t0 = time.perf_counter()
+        counts = repo.bulk_import(read_rows(args.file, args.format))
+        elapsed = time.perf_counter() - t0
+        counts["seconds"] = round(elapsed, 3)
+        counts["rows_per_s"] = round(counts["read"] / elapsed, 1) if elapsed > 0 else 0.0
+        print(json.dumps(counts))
+        return
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        writer = None
+        n = 0
+        for row in repo.export_accounts():
+            row = {k: _jsonable(v) for k, v in row.items()}
+            if args.format == "jsonl":
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+            else:
+                if writer is None:
+                    writer = csv.DictWriter(out, fieldnames=list(row))
+                    writer.writeheader()
+                row["profiles"] = "|".join(row["profiles"] or [])
+                writer.writerow(row)
+            n += 1
+        print(f"{n} contas exportadas", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+-- Esquema base usado pelo AccountsRepo (Postgres.py).
+-- Idempotente: pode ser aplicado num banco já existente sem alterar nada.
+-- Requer a extensão pgcrypto (pgp_sym_encrypt / pgp_sym_decrypt).
+
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'user_cred' AND typnamespace = 'public'::regnamespace) THEN
+        CREATE TYPE public.user_cred AS (name text, secret bytea);
+    END IF;
+END
+$$;
+
+CREATE TABLE IF NOT EXISTS public.accounts (
+    id                 bigserial PRIMARY KEY,
+    email              text NOT NULL UNIQUE,
+    encrypted_password bytea NOT NULL,
+    encrypted_pin      text,
+    storage_state      jsonb,
+    last_checked       timestamptz,
+    cookie_valid_until timestamptz,
+    status             text DEFAULT 'unknown',
+    notes              text,
+    availability       boolean NOT NULL DEFAULT TRUE,
+    users              text[] DEFAULT '{}'::text[],
+    user_creds         public.user_cred[] DEFAULT '{}'::public.user_cred[]
+);
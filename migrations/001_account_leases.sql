@@ -0,0 +1,11 @@
+-- Lease de contas para vários workers em paralelo (AccountsRepo.claim_available).
+-- Um worker "aluga" a conta até lease_until; enquanto o lease vale, os outros a ignoram.
+
+ALTER TABLE public.accounts
+    ADD COLUMN IF NOT EXISTS lease_until timestamptz,
+    ADD COLUMN IF NOT EXISTS leased_by   text;
+
+-- Serve o ORDER BY do claim sem varrer as contas indisponíveis.
+CREATE INDEX IF NOT EXISTS accounts_claim_idx
+    ON public.accounts (last_checked NULLS FIRST, id)
+    WHERE availability;
@@ -0,0 +1,8 @@
+-- Índice de expressão para as buscas por email do AccountsRepo.
+-- As queries filtram por lower(trim(email)) = :email (email já normalizado no cliente
+-- por Postgres.normalize_email); o UNIQUE simples em email não serve esse filtro.
+--
+-- CONCURRENTLY não roda dentro de transação: aplique com psql sem --single-transaction.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS accounts_email_norm_idx
+    ON public.accounts ((lower(trim(email))));
@@ -0,0 +1,25 @@
+-- Modelo de capacidade: cada conta comporta max_profiles perfis e used_slots conta os ocupados.
+-- used_slots é mantido pelos mutators de user_creds do AccountsRepo
+-- (upsert_usercred_encrypted, provision_usercred, remove_usercred).
+
+ALTER TABLE public.accounts
+    ADD COLUMN IF NOT EXISTS max_profiles int NOT NULL DEFAULT 2,
+    ADD COLUMN IF NOT EXISTS used_slots   int NOT NULL DEFAULT 0;
+
+UPDATE public.accounts
+SET used_slots = COALESCE(cardinality(user_creds), 0)
+WHERE used_slots IS DISTINCT FROM COALESCE(cardinality(user_creds), 0);
+
+-- Só contas com vaga entram nos índices; a seleção vira um index scan com LIMIT 1.
+-- fill-first: preenche primeiro as contas mais cheias
+CREATE INDEX IF NOT EXISTS accounts_free_fill_idx
+    ON public.accounts (used_slots DESC, last_checked NULLS FIRST, id)
+    WHERE availability AND used_slots < max_profiles;
+
+-- spread: distribui pelas contas mais vazias
+CREATE INDEX IF NOT EXISTS accounts_free_spread_idx
+    ON public.accounts (used_slots, last_checked NULLS FIRST, id)
+    WHERE availability AND used_slots < max_profiles;
+
+-- substituído pelos dois acima
+DROP INDEX IF EXISTS public.accounts_claim_idx;
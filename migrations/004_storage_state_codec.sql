@@ -0,0 +1,11 @@
+-- storage_state podado + comprimido (state_codec.StateCodec) e o sha256 do conteúdo.
+-- O AccountsRepo passa a gravar só storage_state_z e zera o storage_state (jsonb) legado;
+-- linhas antigas continuam legíveis pelo jsonb até o próximo save_storage_state
+-- (ou benchmarks/bench_state_codec.py --migrate para converter todas de uma vez).
+
+ALTER TABLE public.accounts
+    ADD COLUMN IF NOT EXISTS storage_state_z   bytea,
+    ADD COLUMN IF NOT EXISTS storage_state_sha bytea;
+
+-- o blob já vem comprimido: não tenta comprimir de novo no TOAST
+ALTER TABLE public.accounts ALTER COLUMN storage_state_z SET STORAGE EXTERNAL;
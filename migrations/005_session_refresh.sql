@@ -0,0 +1,12 @@
+-- Revalidação de sessões em segundo plano (session_refresher.py).
+-- refresh_failures conta falhas seguidas; refresh_after adia a próxima tentativa
+-- (backoff). Depois de N falhas a conta vai para status = 'unhealthy' e sai da seleção.
+
+ALTER TABLE public.accounts
+    ADD COLUMN IF NOT EXISTS refresh_failures int NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS refresh_after    timestamptz;
+
+-- Fila do refresher: quem expira primeiro (ou nunca foi checado) vem antes.
+CREATE INDEX IF NOT EXISTS accounts_refresh_due_idx
+    ON public.accounts (cookie_valid_until NULLS FIRST, last_checked NULLS FIRST, id)
+    WHERE availability AND status IS DISTINCT FROM 'unhealthy';
@@ -0,0 +1,13 @@
+-- Checkpoints da rotação de chave (AccountsRepo.rotate_key).
+-- Cada lote recriptografa um intervalo de ids e avança last_id na MESMA transação:
+-- se o processo cair, a próxima execução com o mesmo rotation_id continua do último
+-- lote confirmado, sem tentar decifrar com a chave antiga o que já está na nova.
+
+CREATE TABLE IF NOT EXISTS public.key_rotations (
+    rotation_id  text PRIMARY KEY,
+    last_id      bigint NOT NULL DEFAULT 0,
+    rows_done    bigint NOT NULL DEFAULT 0,
+    started_at   timestamptz NOT NULL DEFAULT now(),
+    updated_at   timestamptz NOT NULL DEFAULT now(),
+    finished_at  timestamptz
+);
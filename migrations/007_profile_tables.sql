@@ -0,0 +1,50 @@
+-- Perfis em tabelas filhas (PROFILE_STORAGE=table, Postgres.TableProfilesRepo).
+-- Trocar um PIN vira um UPDATE numa linha pequena de account_creds, em vez de reescrever
+-- a linha inteira de accounts (arrays + storage_state) como no backend de arrays.
+--
+-- Copia o conteúdo atual de users/user_creds. Os arrays ficam como estavam (rollback
+-- para PROFILE_STORAGE=array), mas deixam de ser escritos com o backend de tabelas.
+-- Reaplicar é seguro: só copia o que ainda não existe.
+
+CREATE TABLE IF NOT EXISTS public.account_creds (
+    account_id  bigint NOT NULL REFERENCES public.accounts (id) ON DELETE CASCADE,
+    name        text   NOT NULL,
+    secret      bytea,
+    created_at  timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (account_id, name)
+);
+
+-- remove_usercred(ignore_case=True)
+CREATE INDEX IF NOT EXISTS account_creds_name_ci_idx
+    ON public.account_creds (account_id, lower(name));
+
+CREATE TABLE IF NOT EXISTS public.account_users (
+    id          bigserial PRIMARY KEY,
+    account_id  bigint NOT NULL REFERENCES public.accounts (id) ON DELETE CASCADE,
+    name        text   NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS account_users_account_name_idx
+    ON public.account_users (account_id, name);
+
+INSERT INTO public.account_creds (account_id, name, secret)
+SELECT DISTINCT ON (a.id, e.name) a.id, e.name, e.secret
+FROM public.accounts a
+CROSS JOIN LATERAL unnest(a.user_creds) WITH ORDINALITY AS e(name, secret, ord)
+WHERE e.name IS NOT NULL
+ORDER BY a.id, e.name, e.ord DESC
+ON CONFLICT (account_id, name) DO NOTHING;
+
+INSERT INTO public.account_users (account_id, name)
+SELECT a.id, u.name
+FROM public.accounts a
+CROSS JOIN LATERAL unnest(a.users) WITH ORDINALITY AS u(name, ord)
+WHERE u.name IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM public.account_users x WHERE x.account_id = a.id)
+ORDER BY a.id, u.ord;
+
+-- used_slots passa a contar as linhas de account_creds
+UPDATE public.accounts a
+SET used_slots = c.n
+FROM (SELECT account_id, count(*) AS n FROM public.account_creds GROUP BY account_id) c
+WHERE a.id = c.account_id AND a.used_slots <> c.n;
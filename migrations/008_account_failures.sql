@@ -0,0 +1,30 @@
+-- Falhas de provisionamento por conta (AccountsRepo.record_attempt).
+-- fail_count conta falhas seguidas; next_eligible_at tira a conta da seleção até lá
+-- (backoff exponencial). status: 'ok' -> 'failing' (em cooldown) -> 'unhealthy' depois de N falhas.
+-- Um sucesso zera tudo e volta para 'ok'.
+
+ALTER TABLE public.accounts
+    ADD COLUMN IF NOT EXISTS fail_count       int NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS next_eligible_at timestamptz,
+    ADD COLUMN IF NOT EXISTS last_error       text;
+
+-- Mesmos índices da 003, mas sem as contas em cooldown ou unhealthy: uma conta quebrada
+-- não fica mais no topo da ordem, e a seleção continua um index scan com LIMIT 1.
+CREATE INDEX IF NOT EXISTS accounts_ready_fill_idx
+    ON public.accounts (used_slots DESC, last_checked NULLS FIRST, id)
+    WHERE availability AND used_slots < max_profiles
+      AND next_eligible_at IS NULL AND status IS DISTINCT FROM 'unhealthy';
+
+CREATE INDEX IF NOT EXISTS accounts_ready_spread_idx
+    ON public.accounts (used_slots, last_checked NULLS FIRST, id)
+    WHERE availability AND used_slots < max_profiles
+      AND next_eligible_at IS NULL AND status IS DISTINCT FROM 'unhealthy';
+
+-- Contas em cooldown, pela hora em que voltam; costuma ter poucas linhas.
+CREATE INDEX IF NOT EXISTS accounts_cooldown_idx
+    ON public.accounts (next_eligible_at)
+    WHERE next_eligible_at IS NOT NULL;
+
+-- substituídos pelos dois primeiros acima
+DROP INDEX IF EXISTS public.accounts_free_fill_idx;
+DROP INDEX IF EXISTS public.accounts_free_spread_idx;
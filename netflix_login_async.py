@@ -0,0 +1,231 @@
+# netflix_login_async.py
+# Orquestrador asyncio: provisiona vários usernames ao mesmo tempo num único browser,
+# cada conta no seu próprio contexto isolado.
+#
+#   python netflix_login_async.py --usernames ana bia caio --concurrency 4 --headless
+#   python netflix_login_async.py --file usernames.txt --concurrency 8
+#
+# Resultados saem como JSONL no stdout (um por username).
+
+import argparse
+import asyncio
+import json
+import sys
+
+import pages_async
+import Postgres
+import Password_generator
+import sessions
+from breaker import CircuitBreaker
+from pages import SELECTORS, PageConfig
+
+
+class AsyncAccountSession:
+    """Equivalente async do netflix_login_sc.AccountSession."""
+
+    def __init__(self, ctx, page, cfg: PageConfig):
+        self.ctx = ctx
+        self.cfg = cfg
+        self.page = page
+        self.account_page = pages_async.AccountPage(page, cfg)
+        self.login_page = pages_async.LoginPage(page, cfg)
+        self.profile_page = pages_async.ProfilesPage(page, cfg)
+
+    @classmethod
+    async def create(cls, browser, storage_state: dict | None, cfg: PageConfig) -> "AsyncAccountSession":
+        ctx = await (browser.new_context(storage_state=storage_state)
+                     if storage_state else browser.new_context())
+        return cls(ctx, await ctx.new_page(), cfg)
+
+    async def ensure_session(self, netflix_db: Postgres.AsyncAccountsRepo, email: str, account: dict | None = None) -> None:
+        status = sessions.UNKNOWN
+        if account is not None:
+            status = sessions.precheck(account.get("storage_state"), account.get("cookie_valid_until"))
+
+        if status == sessions.FRESH:
+            return
+
+        if status == sessions.UNKNOWN:
+            await self.account_page.open()
+
+            # Testa se ainda temos uma sessão valida
+            if self.account_page.is_at():
+                return
+
+        await self.login(netflix_db, email)
+
+    async def login(self, netflix_db: Postgres.AsyncAccountsRepo, email: str) -> None:
+        password = await netflix_db.get_plain_password(email)
+        await self.login_page.open()
+        await self.login_page.login(email, password)
+        await self.login_page.wait_logged()
+
+        # Sempre tentar salvar algo
+        try:
+            await netflix_db.save_storage_state(email, await self.ctx.storage_state())
+        except Exception as e:
+            print("Aviso: insertion do json da sessão falhou...", e, file=sys.stderr)
+
+    async def goto_profiles(self) -> bool:
+        """Vai para /account/profiles com a sessão atual; False se o site mandou para o login."""
+        await self.profile_page.install_routes()
+        await self.page.goto(self.profile_page.url, wait_until="domcontentloaded")
+        return self.profile_page.is_at()
+
+    async def open_profiles(self, netflix_db: Postgres.AsyncAccountsRepo, email: str) -> None:
+        if not await self.goto_profiles():
+            await self.login(netflix_db, email)
+            await self.page.goto(self.profile_page.url, wait_until="domcontentloaded")
+        await self.profile_page.wait_ready()
+
+    async def list_profiles(self) -> list[str] | None:
+        """Perfis da conta no site só com a sessão salva (sem login); None se ela caiu."""
+        if not await self.goto_profiles():
+            return None
+        return await self.profile_page.list_profiles()
+
+    async def add_profile(self, netflix_db: Postgres.AsyncAccountsRepo, email: str, username: str) -> dict | None:
+        await self.open_profiles(netflix_db, email)
+        modal = await self.profile_page.click_add()
+        await modal.create(username)
+        if not await self.profile_page.wait_profile_added():
+            return None
+
+        pwd = Password_generator.generate_password(length=4)
+        result = await netflix_db.provision_usercred(email, username, pwd)
+        return {"pin": pwd, **result} if result else None
+
+
+class Orchestrator:
+    """
+    Distribui usernames entre contas com no máximo `concurrency` provisionamentos em paralelo.
+    Cada conta é serializada: um lock por email garante um único provisionamento por vez,
+    além do lease do claim_available entre processos.
+    Cada tentativa vai para a conta (record_attempt: backoff/status) e para o breaker;
+    com o breaker aberto os usernames que ainda não pegaram conta falham sem abrir o browser.
+    """
+
+    def __init__(self, browser, netflix_db: Postgres.AsyncAccountsRepo, concurrency: int, cfg: PageConfig = PageConfig(),
+                 breaker: CircuitBreaker | None = None):
+        self.browser = browser
+        self.db = netflix_db
+        self.cfg = cfg
+        self.breaker = breaker or CircuitBreaker.from_env()
+        self.sem = asyncio.Semaphore(concurrency)
+        self.account_locks: dict[str, asyncio.Lock] = {}
+        self.released = asyncio.Condition()
+        self.in_flight = 0
+        self.releases = 0
+        self.worker_id = f"{Postgres.default_worker_id()}:async"
+
+    async def _claim(self) -> dict | None:
+        """
+        Pega uma conta livre; se todas estão em uso por tarefas nossas, espera alguma liberar.
+        in_flight conta claims em andamento além dos provisionamentos: um claim irmão ainda
+        rodando pode terminar com uma conta, então só desiste quando não há nenhum dos dois.
+        A conta devolvida continua contada em in_flight até o release no provision.
+        """
+        while True:
+            seen = self.releases
+            self.in_flight += 1
+            account = None
+            try:
+                account = await self.db.claim_available(worker_id=self.worker_id)
+            finally:
+                if account is None:
+                    async with self.released:
+                        self.in_flight -= 1
+                        if self.in_flight == 0:
+                            self.released.notify_all()  # quem espera pode desistir
+            if account is not None:
+                return account
+            async with self.released:
+                if self.releases != seen:
+                    continue  # alguma conta voltou enquanto o claim rodava
+                if self.in_flight == 0:
+                    return None
+                await self.released.wait()
+
+    async def provision(self, username: str) -> dict:
+        async with self.sem:
+            if not self.breaker.allow():
+                return {"username": username, "ok": False, "error": self.breaker.reason}
+            account = await self._claim()
+            if account is None:
+                return {"username": username, "ok": False, "error": "Nenhuma conta está disponível para uso"}
+
+            email = account["email"]
+            result, error = None, None
+            try:
+                lock = self.account_locks.setdefault(email, asyncio.Lock())
+                async with lock:
+                    session = await AsyncAccountSession.create(self.browser, account["storage_state"], self.cfg)
+                    try:
+                        await session.ensure_session(self.db, email, account)
+                        result = await session.add_profile(self.db, email, username)
+                    finally:
+                        await session.ctx.close()
+                if not result:
+                    error = "perfil não foi adicionado"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            finally:
+                # toda conta reservada recebe um resultado (o breaker ignora os que chegam já aberto)
+                if result or error:
+                    self.breaker.record(bool(result))
+                    try:
+                        await self.db.record_attempt(account["id"], bool(result), error)
+                    except Exception as e:
+                        print("Aviso: não foi possível registrar o resultado da conta...", e, file=sys.stderr)
+                await self.db.release_claim(account["id"], worker_id=self.worker_id)
+                async with self.released:
+                    self.in_flight -= 1
+                    self.releases += 1
+                    self.released.notify_all()
+
+            if not result:
+                return {"username": username, "account": email, "ok": False, "error": error}
+            return {"username": username, "account": email, "ok": True, "pin": result["plain_secret"]}
+
+
+async def run(usernames: list[str], concurrency: int, headless: bool) -> None:
+    from playwright.async_api import async_playwright
+
+    netflix_db = Postgres.AsyncAccountsRepo()
+    await asyncio.to_thread(netflix_db.keys.get)  # eventual getpass fora do event loop
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        try:
+            orch = Orchestrator(browser, netflix_db, concurrency)
+            for fut in asyncio.as_completed([orch.provision(u) for u in usernames]):
+                print(json.dumps(await fut, ensure_ascii=False), flush=True)
+            if orch.breaker.reason:
+                print(orch.breaker.reason, json.dumps(orch.breaker.summary()), file=sys.stderr)
+        finally:
+            await browser.close()
+            print("Storage state:", json.dumps(netflix_db.codec.summary()), file=sys.stderr)
+            print("Pool:", json.dumps(Postgres.ASYNC_POOL.summary()), file=sys.stderr)
+            SELECTORS.save()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Provisionamento concorrente (asyncio) de vários usernames.")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--usernames", nargs="+")
+    src.add_argument("--file", help="um username por linha")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--headless", action="store_true")
+    args = ap.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            usernames = [line.strip() for line in f if line.strip()]
+    else:
+        usernames = args.usernames
+
+    asyncio.run(run(usernames, args.concurrency, args.headless))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,15 @@
 # pip install playwright
 # playwright install
 
-import os, sys, time, argparse, json
-from playwright.sync_api import sync_playwright, TimeoutError as PWTimeout
-import pages
+import os, sys, time, argparse, json, itertools, collections
 import Postgres
 import Password_generator
+import sessions
+from breaker import CircuitBreaker
+from spans import SPANS
+
+# Playwright e pages (que importa Playwright) só são carregados depois que há conta
+# para trabalhar: o caminho "nenhuma conta disponível" fica só com o custo do banco.
 
 STATE_PATH_DEFAULT = "netflix_state.json"
 
@@ -21,78 +25,391 @@ def load_context_with_state(browser, state: dict):
 def main():
 
     ap = argparse.ArgumentParser(description="Login Netflix automatizado e salvar sessão (cookies).")
-    ap.add_argument("--username")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--username")
+    src.add_argument("--batch", metavar="FILE", help='JSONL com {"username": ...} por linha ("-" = stdin)')
     ap.add_argument("--headless", action="store_true")
+    ap.add_argument("--no-block", action="store_true", help="não intercepta imagens/vídeo/analytics (baseline)")
+    ap.add_argument("--base-url", default=os.environ.get("NETFLIX_BASE_URL"),
+                    help="origem do site (padrão: PageConfig.base_url; benchmarks/fake_site.py para testes locais)")
+    ap.add_argument("--wait-profile", metavar="FILE", help="acrescenta em FILE (JSONL) o tempo de cada wait")
+    ap.add_argument("--profile-dir", default=os.environ.get("NETFLIX_PROFILE_DIR"),
+                    help="perfis persistentes do Chromium por conta (cache quente entre execuções)")
+    ap.add_argument("--profile-max", type=int, default=20, help="máximo de perfis guardados (LRU)")
+    ap.add_argument("--profile-max-mb", type=int, default=2048, help="teto em disco de todos os perfis")
+    ap.add_argument("--spans", metavar="FILE", default=os.environ.get("NETFLIX_SPANS"),
+                    help="acrescenta em FILE (JSONL) o tempo de cada fase; relatório: python spans.py FILE")
     args = ap.parse_args()
 
+    with SPANS.run() as run_id:
+        try:
+            with SPANS.span("run.total"):
+                run(args)
+        finally:
+            print("Fases:", json.dumps(SPANS.summary(run_id)), file=sys.stderr)
+            if args.spans:
+                SPANS.dump_jsonl(args.spans, run_id)
+
+
+def run(args):
 
     # Try to retrieve an available account 
-    netflix_db = Postgres.AccountsRepo()
-    account = netflix_db.get_first_available()
+    netflix_db = Postgres.make_accounts_repo()
+
+    if args.batch:
+        run_batch(netflix_db, args)
+        return
+
+    account = netflix_db.claim_available()
 
     if account is None:
         print('Nenhuma conta está disponível para uso')
         return
-    
+
+    # A conta fica reservada para este processo até o fim do provisionamento
+    outcome = None
+    try:
+        result = provision(netflix_db, account, args)
+        outcome = (True, None) if result else (False, "perfil não foi adicionado")
+    except Exception as e:
+        outcome = (False, f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        if outcome is not None:
+            record_attempt(netflix_db, account, *outcome)
+        netflix_db.release_claim(account["id"])
+
+
+class AccountSession:
+    """
+    Contexto do browser de uma conta + page objects reaproveitáveis.
+    O script cria um por execução; o provision_server mantém vários "quentes".
+    """
+
+    def __init__(self, ctx, cfg: "pages.PageConfig"):
+        import pages
+
+        self.ctx = ctx
+        self.cfg = cfg
+        self.page = ctx.new_page()
+        self.account_page = pages.AccountPage(self.page, cfg)
+        self.login_page = pages.LoginPage(self.page, cfg)
+        self.profile_page = pages.ProfilesPage(self.page, cfg)
+        self.profiles_ready_at: float | None = None  # perf_counter do último ProfilesPage pronto
+
+    @SPANS.traced("session.ensure")
+    def ensure_session(self, netflix_db, email: str, account: dict | None = None) -> None:
+        """
+        Garante uma sessão logada. Com `account` (linha do claim) faz antes a
+        pré-checagem barata dos cookies: sessão morta vai direto ao login e
+        sessão claramente válida nem abre o AccountPage.
+        """
+        status = sessions.UNKNOWN
+        if account is not None:
+            status = sessions.precheck(account.get("storage_state"), account.get("cookie_valid_until"))
+
+        if status == sessions.FRESH:
+            print('Sessão ainda é valida! (cookies)', file=sys.stderr)
+            return
+
+        if status == sessions.UNKNOWN:
+            self.account_page.open()
+
+            # Testa se ainda temos uma sessão valida
+            if self.account_page.is_at() == True:
+                print('Sessão ainda é valida!', file=sys.stderr)
+                return
+
+        # Se não tivermos, será necessário efetuar o login
+        self.login(netflix_db, email)
+
+    @SPANS.traced("session.login")
+    def login(self, netflix_db, email: str) -> None:
+        password = netflix_db.get_plain_password(email)
+        self.login_page.open()
+        self.login_page.login(email, password)
+        self.login_page.wait_logged()
+
+         # Sempre tentar salvar algo
+        try:
+            state_dict = self.ctx.storage_state()
+            netflix_db.save_storage_state(email, state_dict)
+        except Exception as e:
+            print("Aviso: insertion do json da sessão falhou...", e, file=sys.stderr)
+
+    @SPANS.traced("session.open_profiles")
+    def open_profiles(self, netflix_db, email: str) -> None:
+        """Abre o ProfilesPage; se o site mandar para o login (sessão caiu no servidor), loga e volta."""
+        self.profile_page.install_routes()
+        self.page.goto(self.profile_page.url, wait_until="domcontentloaded")
+        if not self.profile_page.is_at():
+            self.login(netflix_db, email)
+            self.page.goto(self.profile_page.url, wait_until="domcontentloaded")
+        self.profile_page.wait_ready()
+        self.profiles_ready_at = time.perf_counter()
+
+    @SPANS.traced("session.add_profile")
+    def add_profile(self, netflix_db, email: str, username: str) -> dict | None:
+        """
+        Cria o perfil e grava o PIN. Retorna {"pin", "plain_secret", "n_creds", "free_slots", ...}
+        ou None se o perfil não foi adicionado.
+        """
+        self.open_profiles(netflix_db, email)
+        modal = self.profile_page.click_add()  # clica no botão e instancia o modal
+        modal.create(username)     # interage dentro do modal (sem trocar de URL)
+        ok = self.profile_page.wait_profile_added()
+
+        # Caso o user tenha sido adicionado com sucesso, adionamos o novo user na tabela e tratamos da availability.
+        if not ok:
+            return None
+
+        # Cria um pin para o user
+        pwd = Password_generator.generate_password(length=4)
+
+        # Cria o usuário no banco, devolve o PIN e trata da availability numa única transação
+        result = netflix_db.provision_usercred(email, username, pwd)
+        return {"pin": pwd, **result} if result else None
+
+
+def page_config(args) -> "pages.PageConfig":
+    import pages
+
+    if args.base_url:
+        return pages.PageConfig(base_url=args.base_url.rstrip("/"), block_resources=not args.no_block)
+    return pages.PageConfig(block_resources=not args.no_block)
+
+
+def profile_store(args):
+    """ProfileStore de --profile-dir, ou None (contexto novo a partir do storage_state do banco)."""
+    if not args.profile_dir:
+        return None
+    from profile_store import ProfileStore
+    return ProfileStore(args.profile_dir, max_profiles=args.profile_max, max_bytes=args.profile_max_mb << 20)
+
+
+def open_account_context(p, browser, account: dict, args, store=None):
+    """Retorna (contexto, warm). warm é None sem perfil persistente."""
+    if store is not None:
+        return store.open(p.chromium, account["id"], account["storage_state"], headless=args.headless)
+    ctx = (browser.new_context(storage_state=account["storage_state"])
+           if account["storage_state"] else browser.new_context())
+    return ctx, None
+
+
+def precheck_account(ctx, account: dict, warm) -> dict:
+    """
+    Conta para a pré-checagem do ensure_session. Com perfil persistente quente os cookies
+    que valem são os do contexto, não os do banco (a sessão pode ter sido renovada ou
+    perdida desde o último save).
+    """
+    if not warm:
+        return account
+    return {**account, "storage_state": ctx.storage_state(), "cookie_valid_until": None}
+
+
+def close_account_context(ctx, account: dict, store=None) -> None:
+    if store is not None:
+        store.close(ctx, account["id"])
+    else:
+        ctx.close()
+
+
+def provision(netflix_db, account: dict, args):
+    from playwright.sync_api import sync_playwright
+    import pages
+
     email = account["email"]
-    password = netflix_db.get_plain_password(email)
-    session_context = netflix_db.get_storage_state(email)
+    store = profile_store(args)
 
     with sync_playwright() as p:
 
-        browser = p.chromium.launch(headless=args.headless)
-        ctx = (browser.new_context(storage_state=session_context)
-         if session_context else browser.new_context())
-        page = ctx.new_page()
-        cfg = pages.PageConfig()
+        # Com perfil persistente cada contexto é o seu próprio browser
+        with SPANS.span("browser.launch"):
+            browser = None if store else p.chromium.launch(headless=args.headless)
+        t0 = time.perf_counter()
+        with SPANS.span("browser.context"):
+            ctx, warm = open_account_context(p, browser, account, args, store)
+        try:
+            session = AccountSession(ctx, page_config(args))
 
-        account_page = pages.AccountPage(page, cfg)
-        account_page.open("networkidle")
+            session.ensure_session(netflix_db, email, precheck_account(ctx, account, warm))
+            result = session.add_profile(netflix_db, email, args.username)
 
-        # Testa se ainda temos uma sessão valida
-        if account_page.is_at() == True:
-            print('Sessão ainda é valida!')
+            if store is not None and session.profiles_ready_at is not None:
+                ready_ms = (session.profiles_ready_at - t0) * 1000
+                store.record(account["id"], warm, ready_ms)
+                print(f"Perfil {'warm' if warm else 'cold'}: ProfilesPage pronto em {ready_ms:.0f} ms",
+                      json.dumps(store.summary()), file=sys.stderr)
+        finally:
+            close_account_context(ctx, account, store)
 
-        # Se não tivermos, será necessário efetuar o login
+        route_stats = pages.ResourceBlocker.stats_for(session.page)
+        if route_stats:
+            print("Requests interceptados:", json.dumps(route_stats), file=sys.stderr)
+
+        report(netflix_db, args)
+
+        if result:
+            print(result["pin"])
+
+            # Retorna para o usuário o Pin dele
+            print(result["plain_secret"])
         else:
+            print("Perfil não foi adicionado", file=sys.stderr)
+        return result
+
+
+def report(netflix_db, args) -> None:
+    """Resumos do processo no stderr: waits, seletores, storage_state gravado, pool do banco."""
+    import pages
+
+    print("Waits:", json.dumps(pages.WAITS.summary()), file=sys.stderr)
+    print("Seletores:", json.dumps(pages.SELECTORS.summary()), file=sys.stderr)
+    print("Storage state:", json.dumps(netflix_db.codec.summary()), file=sys.stderr)
+    print("Pool:", json.dumps(Postgres.POOL.summary()), file=sys.stderr)
+    pages.SELECTORS.save()
+    if args.wait_profile:
+        pages.WAITS.dump_jsonl(args.wait_profile)
+
+
+def record_attempt(netflix_db, account: dict, ok: bool, error: str | None = None) -> None:
+    """Grava o resultado na conta (backoff/status) e avisa quando ela entra em cooldown."""
+    try:
+        state = netflix_db.record_attempt(account["id"], ok, error)
+    except Exception as e:
+        print("Aviso: não foi possível registrar o resultado da conta...", e, file=sys.stderr)
+        return
+    if state and not ok:
+        until = state["next_eligible_at"]
+        print(f"Conta {account['email']}: {state['fail_count']} falha(s) seguida(s), status {state['status']}"
+              + (f", fora da seleção até {until:%Y-%m-%d %H:%M:%S %Z}" if until else ""), file=sys.stderr)
 
-            login_page = pages.LoginPage(page, cfg)
-            login_page.open()
-            login_page.login(email, password)
-            login_page.wait_logged()
 
-             # Sempre tentar salvar algo
+def read_usernames(path: str):
+    """Gera os usernames do JSONL (ou stdin) uma linha por vez, sem carregar o arquivo."""
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
             try:
-                state_dict = ctx.storage_state()
-                netflix_db.save_storage_state(email, state_dict)
-            except Exception as e:
-                print("Aviso: insertion do json da sessão falhou...", e)
-                
-
-        profile_page = pages.ProfilesPage(page, cfg)
-        profile_page.open()
-        modal = profile_page.click_add()  # clica no botão e instancia o modal
-        modal.create(args.username)     # interage dentro do modal (sem trocar de URL)
-        ok = profile_page.wait_profile_added()
+                username = json.loads(line)["username"]
+            except (ValueError, KeyError, TypeError):
+                emit({"username": None, "ok": False, "error": f"linha inválida: {line[:80]}"})
+                continue
+            yield username
+    finally:
+        if f is not sys.stdin:
+            f.close()
 
-        # Caso o user tenha sido adicionado com sucesso, adionamos o novo user na tabela e tratamos da availability.
-        if ok:
 
-            # Cria um pin para o user
-            pwd = Password_generator.generate_password(length=4)
-            print(pwd)
+def emit(result: dict) -> None:
+    print(json.dumps(result, ensure_ascii=False), flush=True)
+
+
+def run_batch(netflix_db, args) -> None:
+    """
+    Modo lote: um browser para o lote todo. Para cada conta reservada, faz o login
+    uma vez e adiciona tantos perfis quantas vagas ela tiver, antes de passar para a próxima.
+    Resultados saem em JSONL no stdout (account, username, ok, pin).
+    Cada conta recebe o resultado (record_attempt); se o breaker abrir (taxa de falhas
+    alta em todas as contas), os usernames restantes falham sem pegar outra conta.
+    Se a sessão/login da conta falhar, os usernames do chunk que não foram tentados
+    voltam para a fila e seguem para a próxima conta.
+    """
+    from playwright.sync_api import sync_playwright
+    import pages
+
+    usernames = read_usernames(args.batch)
+    requeued: collections.deque[str] = collections.deque()
+
+    def next_username() -> str | None:
+        return requeued.popleft() if requeued else next(usernames, None)
+
+    cfg = page_config(args)
+    store = profile_store(args)
+    breaker = CircuitBreaker.from_env()
+    netflix_db.keys.get()  # uma leitura da chave para o lote inteiro
+
+    with sync_playwright() as p:
+        with SPANS.span("browser.launch"):
+            browser = None if store else p.chromium.launch(headless=args.headless)
+
+        pending = next_username()
+        while pending is not None:
+            account = netflix_db.claim_available()
+            if account is None:
+                for username in itertools.chain([pending], requeued, usernames):
+                    emit({"username": username, "ok": False, "error": "Nenhuma conta está disponível para uso"})
+                break
+
+            email = account["email"]
+            added, attempted, error = 0, 0, None
+            try:
+                free = account["free_slots"]
+                if free <= 0:
+                    # used_slots desatualizado: a conta entra em cooldown e o username vai para a próxima
+                    error = "conta sem vaga livre"
+                    continue
+
+                chunk = [pending, *itertools.islice(iter(next_username, None), free - 1)]
+                pending = None
+
+                with SPANS.span("browser.context"):
+                    ctx, warm = open_account_context(p, browser, account, args, store)
+                try:
+                    session = AccountSession(ctx, cfg)
+                    session.ensure_session(netflix_db, email, precheck_account(ctx, account, warm))
+                    for i, username in enumerate(chunk):
+                        if not breaker.allow():
+                            error = error or breaker.reason
+                            for skipped in chunk[i:]:
+                                emit({"account": email, "username": skipped, "ok": False, "error": breaker.reason})
+                            attempted = len(chunk)
+                            break
+                        attempted += 1
+                        try:
+                            result = session.add_profile(netflix_db, email, username)
+                            error = None if result else "perfil não foi adicionado"
+                        except Exception as e:
+                            result, error = None, f"{type(e).__name__}: {e}"
+                        breaker.record(bool(result))
+                        if result:
+                            added += 1
+                            emit({"account": email, "username": username, "ok": True,
+                                  "pin": result["plain_secret"], "pin_status": "stored"})
+                        else:
+                            emit({"account": email, "username": username, "ok": False, "error": error})
+                except Exception as e:
+                    # falha de sessão/login: a conta falha e os usernames ainda não tentados
+                    # (já emitidos os que foram) voltam para a fila da próxima conta
+                    error = f"{type(e).__name__}: {e}"
+                    breaker.record(False)
+                    requeued.extend(chunk[attempted:])
+                    print(f"Conta {email}: {error}; {len(chunk) - attempted} username(s) voltam para a fila",
+                          file=sys.stderr)
+                finally:
+                    close_account_context(ctx, account, store)
+            finally:
+                # toda conta reservada recebe um resultado: com algum perfil adicionado está sã
+                # (mesmo que outro tenha falhado); sem nenhum, não é sucesso
+                record_attempt(netflix_db, account, added > 0, error or "nenhum perfil adicionado")
+                netflix_db.release_claim(account["id"])
+
+            if not breaker.allow():
+                print(breaker.reason, json.dumps(breaker.summary()), file=sys.stderr)
+                for username in itertools.chain(requeued, usernames):
+                    emit({"username": username, "ok": False, "error": breaker.reason})
+                break
 
-            # Cria o usário no banco de dados
-            user_added = netflix_db.upsert_usercred_encrypted(email, args.username, pwd)
-            if user_added:
-                
-                # Retorna para o usuário o Pin dele e também a senha atual da conta
-                returned_pwd = netflix_db.get_usercred_plain(email, args.username)
-                print(returned_pwd)
+            if pending is None:
+                pending = next_username()
 
-                if netflix_db.count_usercreds(email) == 2:
-                    netflix_db.update_availability(email, False)
+        if browser is not None:
+            browser.close()
 
+    report(netflix_db, args)
 
 
 if __name__ == "__main__":
@@ -1,22 +1,377 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Optional
-from playwright.sync_api import Page, Locator
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from playwright.sync_api import Page, Locator, TimeoutError as PWTimeout
+import json
+import os
 import re
+import threading
+import time
+import weakref
+from pathlib import Path
+
+from spans import SPANS
+
+
+class WaitProfiler:
+    """
+    Registra quanto tempo cada wait_* realmente levou e qual condição disparou.
+    Serve para calibrar UiTimeouts/PageConfig com dados reais em vez de chute.
+    """
+
+    def __init__(self, max_records: int = 10_000):
+        self._lock = threading.Lock()
+        self.records: deque[dict] = deque(maxlen=max_records)  # limitado: processos longos (provision_server)
+
+    def record(self, page: str, wait: str, condition: str, elapsed_ms: float, timeout_ms: int) -> None:
+        with self._lock:
+            self.records.append({
+                "page": page,
+                "wait": wait,
+                "condition": condition,
+                "elapsed_ms": round(elapsed_ms, 1),
+                "timeout_ms": timeout_ms,
+            })
+
+    @contextmanager
+    def track(self, page: str, wait: str, condition: str, timeout_ms: int):
+        """Para waits de uma condição só: registra o tempo, ou "timeout" se estourar."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        except PWTimeout:
+            self.record(page, wait, "timeout", (time.perf_counter() - t0) * 1000, timeout_ms)
+            raise
+        self.record(page, wait, condition, (time.perf_counter() - t0) * 1000, timeout_ms)
+
+    def summary(self) -> dict:
+        """(page.wait, condição) -> n, média, p95 e máximo em ms."""
+        groups = defaultdict(list)
+        with self._lock:
+            for r in self.records:
+                groups[(f"{r['page']}.{r['wait']}", r["condition"])].append(r["elapsed_ms"])
+        out = {}
+        for (wait, cond), values in sorted(groups.items()):
+            values.sort()
+            out[f"{wait}[{cond}]"] = {
+                "n": len(values),
+                "mean_ms": round(sum(values) / len(values), 1),
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max_ms": values[-1],
+            }
+        return out
+
+    def dump_jsonl(self, path: str) -> None:
+        with self._lock, open(path, "a", encoding="utf-8") as f:
+            for r in self.records:
+                f.write(json.dumps(r) + "\n")
+
+
+# Profiler padrão do processo (PageConfig.profiler=None usa este)
+WAITS = WaitProfiler()
+
+
+def split_selector(selector: str) -> list[str]:
+    """Alternativas de um seletor CSS "a, b, c" (vírgulas dentro de [], () ou aspas não contam)."""
+    parts, depth, quote, start = [], 0, None, 0
+    for i, ch in enumerate(selector):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "\"'":
+            quote = ch
+        elif ch in "[(":
+            depth += 1
+        elif ch in "])":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(selector[start:i].strip())
+            start = i + 1
+    parts.append(selector[start:].strip())
+    return [p for p in parts if p]
+
+
+class SelectorResolver:
+    """
+    Aprende qual alternativa de cada seletor (ou condição de wait_any) costuma vencer.
+    A próxima busca tenta só a vencedora com timeout curto (fast_ms) e, se ela não
+    aparecer, volta para a lista inteira com o tempo que sobrou. Se a própria vencedora
+    casar no fallback, a página só estava lenta: não conta como falha dela.
+    Contadores por (chave, alternativa): hits, misses e latência; persistidos num JSON
+    local (NETFLIX_SELECTOR_CACHE, padrão ~/.cache/netflix_selectors.json; "" desliga).
+    """
+
+    def __init__(self, path: str | Path | None = None, fast_ms: int = 1_500, save_interval_s: float = 30.0):
+        self.path = Path(path).expanduser() if path else None
+        self.fast_ms = fast_ms
+        self.save_interval_s = save_interval_s
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, dict]] | None = None  # carregado no primeiro uso
+        self._saved_at = time.monotonic()
+        self._dirty = False
+
+    @classmethod
+    def from_env(cls) -> "SelectorResolver":
+        path = os.environ.get("NETFLIX_SELECTOR_CACHE", str(Path.home() / ".cache" / "netflix_selectors.json"))
+        return cls(path or None, fast_ms=int(os.environ.get("NETFLIX_SELECTOR_FAST_MS", 1_500)))
+
+    def _load(self) -> dict[str, dict[str, dict]]:
+        if self._stats is None:
+            self._stats = {}
+            if self.path and self.path.exists():
+                try:
+                    self._stats = json.loads(self.path.read_text(encoding="utf-8"))
+                except (OSError, ValueError):
+                    pass  # cache corrompido: recomeça do zero
+        return self._stats
+
+    def winner(self, key: str, alternatives: list[str] | None = None) -> str | None:
+        """Alternativa com mais acertos (descontadas as falhas na tentativa rápida)."""
+        with self._lock:
+            stats = self._load().get(key, {})
+            best = max(
+                (alt for alt in stats if alternatives is None or alt in alternatives),
+                key=lambda alt: stats[alt]["hits"] - stats[alt]["misses"],
+                default=None,
+            )
+            if best is None or stats[best]["hits"] <= stats[best]["misses"]:
+                return None
+            return best
+
+    def record(self, key: str, alternative: str, hit: bool, elapsed_ms: float) -> None:
+        with self._lock:
+            s = self._load().setdefault(key, {}).setdefault(alternative, {"hits": 0, "misses": 0, "total_ms": 0.0})
+            s["hits" if hit else "misses"] += 1
+            s["total_ms"] = round(s["total_ms"] + elapsed_ms, 1)
+            self._dirty = True
+            due = time.monotonic() - self._saved_at >= self.save_interval_s
+        if due:
+            self.save()
+
+    def record_result(self, key: str, best: str | None, won: str, elapsed_ms: float) -> None:
+        """
+        Resultado de uma busca que tinha `best` como vencedora conhecida (ou None) e
+        terminou com `won`. Outra alternativa venceu -> falha para `best`; a mesma -> só acerto.
+        """
+        if best is not None and best != won:
+            self.record(key, best, False, elapsed_ms)
+        self.record(key, won, True, elapsed_ms)
+
+    def save(self) -> None:
+        """Grava o cache (escrita atômica); sem path ou sem mudanças não faz nada."""
+        with self._lock:
+            if not self.path or not self._dirty:
+                return
+            data = json.dumps(self._stats, indent=1, sort_keys=True)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # cache é só otimização
+
+    def summary(self) -> dict:
+        """chave -> vencedora e, por alternativa, hits, misses e latência média em ms."""
+        out = {}
+        with self._lock:
+            stats = {k: {a: dict(s) for a, s in v.items()} for k, v in self._load().items()}
+        for key, alts in sorted(stats.items()):
+            out[key] = {
+                "winner": self.winner(key),
+                "alternatives": {
+                    alt: {
+                        "hits": s["hits"],
+                        "misses": s["misses"],
+                        "mean_ms": round(s["total_ms"] / (s["hits"] + s["misses"]), 1) if s["hits"] + s["misses"] else 0.0,
+                    }
+                    for alt, s in alts.items()
+                },
+            }
+        return out
+
+    def resolve(self, root, key: str, selector: str, timeout_ms: int) -> Locator:
+        """
+        Locator visível de `selector` a partir de `root` (Page ou Locator).
+        Vencedora conhecida primeiro (fast_ms); senão a lista inteira, registrando quem casou.
+        """
+        alternatives = split_selector(selector)
+        t0 = time.perf_counter()
+        best = self.winner(key, alternatives) if len(alternatives) > 1 else None
+        if best is not None:
+            loc = root.locator(best).first
+            try:
+                loc.wait_for(state="visible", timeout=min(self.fast_ms, timeout_ms))
+                self.record(key, best, True, (time.perf_counter() - t0) * 1000)
+                return loc
+            except PWTimeout:
+                pass  # falha ou página lenta: o fallback decide
+        remaining = max(1, timeout_ms - int((time.perf_counter() - t0) * 1000))
+        root.locator(selector).first.wait_for(state="visible", timeout=remaining)
+        for alt in ([best] if best else []) + alternatives:
+            loc = root.locator(alt).first
+            if len(alternatives) == 1 or loc.is_visible():
+                self.record_result(key, best, alt, (time.perf_counter() - t0) * 1000)
+                return loc
+        return root.locator(selector).first  # sumiu entre o wait e a checagem
+
+    async def resolve_async(self, root, key: str, selector: str, timeout_ms: int):
+        """Mesmo contrato de resolve, para os page objects de pages_async."""
+        alternatives = split_selector(selector)
+        t0 = time.perf_counter()
+        best = self.winner(key, alternatives) if len(alternatives) > 1 else None
+        if best is not None:
+            loc = root.locator(best).first
+            try:
+                await loc.wait_for(state="visible", timeout=min(self.fast_ms, timeout_ms))
+                self.record(key, best, True, (time.perf_counter() - t0) * 1000)
+                return loc
+            except PWTimeout:  # mesma classe em playwright.async_api
+                pass
+        remaining = max(1, timeout_ms - int((time.perf_counter() - t0) * 1000))
+        await root.locator(selector).first.wait_for(state="visible", timeout=remaining)
+        for alt in ([best] if best else []) + alternatives:
+            loc = root.locator(alt).first
+            if len(alternatives) == 1 or await loc.is_visible():
+                self.record_result(key, best, alt, (time.perf_counter() - t0) * 1000)
+                return loc
+        return root.locator(selector).first
+
+
+# Resolver padrão do processo (PageConfig.resolver=None usa este)
+SELECTORS = SelectorResolver.from_env()
 
 
 @dataclass(frozen=True)
 class PageConfig:
     base_url: str = "https://www.netflix.com"
     wait_timeout_ms: int = 70_000
+    # Sondagem do AccountPage ("ainda estou logado?"): curta, porque o fallback é só logar de novo
+    session_probe_ms: int = 10_000
+    # Interceptação de requests: aborta o que a automação não usa (imagens, vídeo, fontes, analytics)
+    block_resources: bool = True
+    blocked_resource_types: tuple[str, ...] = ("image", "media", "font")
+    blocked_url_patterns: tuple[str, ...] = (
+        r"ichnaea",                 # beacons de log da Netflix
+        r"nflxvideo\.net",          # previews de vídeo
+        r"google-analytics\.com",
+        r"googletagmanager\.com",
+        r"doubleclick\.net",
+        r"/log/",
+    )
+    # Sempre passam, mesmo que o tipo/URL esteja bloqueado (ex.: captcha do login)
+    allowed_url_patterns: tuple[str, ...] = (r"recaptcha", r"hcaptcha", r"captcha")
+    # Intervalo de polling das esperas com várias condições (BasePage.wait_any)
+    poll_ms: int = 100
+    profiler: Optional[WaitProfiler] = field(default=None, compare=False)
+    resolver: Optional[SelectorResolver] = field(default=None, compare=False)
+
+    @property
+    def waits(self) -> WaitProfiler:
+        return self.profiler or WAITS
+
+    @property
+    def selectors(self) -> SelectorResolver:
+        return self.resolver or SELECTORS
+
+
+class ResourceBlocker:
+    """
+    Regras de bloqueio de um Page + contadores do que foi economizado.
+    Um por Page do Playwright (mesmo que vários page objects usem o mesmo Page);
+    cada page object ajusta a allowlist extra (ROUTE_ALLOW) ao abrir.
+    Bytes carregados vêm do content-length das respostas que passaram: compare
+    com uma execução com block_resources=False para ver a banda economizada.
+    """
+
+    _by_page: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+    def __init__(self, cfg: PageConfig):
+        self.blocked_types = frozenset(cfg.blocked_resource_types)
+        self.blocked_urls = [re.compile(p) for p in cfg.blocked_url_patterns]
+        self.allowed_urls = [re.compile(p) for p in cfg.allowed_url_patterns]
+        self.page_allow: list[re.Pattern] = []
+        self.blocked = Counter()   # resource_type -> requests abortados
+        self.allowed = Counter()   # resource_type -> requests que passaram
+        self.loaded_bytes = 0
+
+    @classmethod
+    def for_page(cls, page, cfg: PageConfig) -> tuple["ResourceBlocker", bool]:
+        """Retorna (blocker, novo?). Se novo, quem chamou precisa registrar o route no Page."""
+        blocker = cls._by_page.get(page)
+        if blocker is not None:
+            return blocker, False
+        blocker = cls._by_page[page] = cls(cfg)
+        page.on("response", blocker.on_response)
+        return blocker, True
+
+    @classmethod
+    def stats_for(cls, page) -> dict | None:
+        blocker = cls._by_page.get(page)
+        return blocker.summary() if blocker else None
+
+    def set_page_allow(self, patterns: tuple[str, ...]) -> None:
+        self.page_allow = [re.compile(p) for p in patterns]
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        if any(p.search(url) for p in self.allowed_urls) or any(p.search(url) for p in self.page_allow):
+            return False
+        return resource_type in self.blocked_types or any(p.search(url) for p in self.blocked_urls)
+
+    def handle(self, route) -> None:
+        req = route.request
+        if self.should_block(req.resource_type, req.url):
+            self.blocked[req.resource_type] += 1
+            route.abort()
+        else:
+            self.allowed[req.resource_type] += 1
+            route.continue_()
+
+    async def handle_async(self, route) -> None:
+        req = route.request
+        if self.should_block(req.resource_type, req.url):
+            self.blocked[req.resource_type] += 1
+            await route.abort()
+        else:
+            self.allowed[req.resource_type] += 1
+            await route.continue_()
+
+    def on_response(self, response) -> None:
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.loaded_bytes += int(length)
+
+    def summary(self) -> dict:
+        return {
+            "requests_blocked": sum(self.blocked.values()),
+            "requests_allowed": sum(self.allowed.values()),
+            "blocked_by_type": dict(self.blocked),
+            "bytes_loaded": self.loaded_bytes,
+        }
 
 @dataclass(frozen=True)
 class UiTimeouts:
     ready_ms: int = 5_000
     action_ms: int = 10_000
+    profiler: Optional[WaitProfiler] = field(default=None, compare=False)
+    resolver: Optional[SelectorResolver] = field(default=None, compare=False)
+
+    @property
+    def waits(self) -> WaitProfiler:
+        return self.profiler or WAITS
+
+    @property
+    def selectors(self) -> SelectorResolver:
+        return self.resolver or SELECTORS
 
 class BasePage(ABC):
     path: str  # ex.: "/login"
+    ROUTE_ALLOW: tuple[str, ...] = ()  # padrões de URL que esta página precisa mesmo bloqueados no PageConfig
+
     def __init__(self, page: Page, cfg: PageConfig):
         self.page = page
         self.cfg = cfg
@@ -25,9 +380,19 @@ class BasePage(ABC):
     def url(self) -> str:
         return f"{self.cfg.base_url}{self.path}"
 
+    def install_routes(self) -> None:
+        if not self.cfg.block_resources:
+            return
+        blocker, new = ResourceBlocker.for_page(self.page, self.cfg)
+        if new:
+            self.page.route("**/*", blocker.handle)
+        blocker.set_page_allow(self.ROUTE_ALLOW)
+
     def open(self, wait_until: str = "domcontentloaded") -> None:
-        self.page.goto(self.url, wait_until=wait_until)
-        self.wait_ready()  # Template Method: garante “pronto” após abrir
+        with SPANS.span(f"page.{type(self).__name__}.open"):
+            self.install_routes()
+            self.page.goto(self.url, wait_until=wait_until)
+            self.wait_ready()  # Template Method: garante “pronto” após abrir
 
     @abstractmethod
     def wait_ready(self) -> None:
@@ -37,6 +402,45 @@ class BasePage(ABC):
         """Checagem leve para confirmar que estamos na página esperada."""
         return self.path in (self.page.url or "")
 
+    def visible(self, selector: str) -> Callable[[], bool]:
+        return lambda: self.page.locator(selector).first.is_visible()
+
+    def url_matches(self, pattern: str) -> Callable[[], bool]:
+        rx = re.compile(pattern)
+        return lambda: bool(rx.search(self.page.url or ""))
+
+    def find(self, name: str, timeout_ms: int | None = None) -> Locator:
+        """Locator visível do seletor `name` desta página (ex.: "EMAIL"), via SelectorResolver."""
+        return self.cfg.selectors.resolve(
+            self.page, f"{type(self).__name__}.{name}", getattr(self, name), timeout_ms or self.cfg.wait_timeout_ms
+        )
+
+    def wait_any(self, wait: str, conditions: dict[str, Callable[[], bool]], timeout_ms: int) -> str:
+        """
+        Espera a primeira condição (elemento visível / URL) que ficar verdadeira e
+        retorna o nome dela. Substitui networkidle: termina assim que dá para agir.
+        A condição que mais venceu antes é testada primeiro em cada rodada; as outras
+        continuam sendo testadas desde o início (sem esperar fast_ms por elas).
+        Tempo e condição vencedora vão para o WaitProfiler; estourou -> PWTimeout.
+        """
+        key = f"{type(self).__name__}.{wait}"
+        resolver = self.cfg.selectors
+        t0 = time.perf_counter()
+        deadline = t0 + timeout_ms / 1000
+        best = resolver.winner(key, list(conditions)) if len(conditions) > 1 else None
+        if best is not None:
+            conditions = {best: conditions[best], **conditions}
+        while True:
+            for name, check in conditions.items():
+                if check():
+                    resolver.record_result(key, best, name, (time.perf_counter() - t0) * 1000)
+                    self.cfg.waits.record(type(self).__name__, wait, name, (time.perf_counter() - t0) * 1000, timeout_ms)
+                    return name
+            if time.perf_counter() >= deadline:
+                self.cfg.waits.record(type(self).__name__, wait, "timeout", (time.perf_counter() - t0) * 1000, timeout_ms)
+                raise PWTimeout(f"{type(self).__name__}.{wait}: nenhuma condição em {timeout_ms} ms ({', '.join(conditions)})")
+            self.page.wait_for_timeout(self.cfg.poll_ms)
+
 
 class BaseComponent(ABC):
     def __init__(self, root: Locator, timeouts: UiTimeouts = UiTimeouts()):
@@ -47,20 +451,25 @@ class BaseComponent(ABC):
     def wait_ready(self) -> None:
         ...
 
+    def find(self, name: str, timeout_ms: int | None = None) -> Locator:
+        """Locator visível do seletor `name` dentro do componente, via SelectorResolver."""
+        return self.timeouts.selectors.resolve(
+            self.root, f"{type(self).__name__}.{name}", getattr(self, name), timeout_ms or self.timeouts.ready_ms
+        )
+
 class AddProfileModal(BaseComponent):
     INPUT_USERNAME = 'input[data-uia="account-profiles-page+add-profile+name-input"]'
     SAVE_BTN       = 'button[data-uia="account-profiles-page+add-profile+primary-button"]'
 
     def wait_ready(self) -> None:
         # espera o contêiner e o input do modal ficarem prontos
-        self.root.wait_for(state="visible", timeout=self.timeouts.ready_ms)
-        self.root.locator(self.INPUT_USERNAME).wait_for(
-            state="visible", timeout=self.timeouts.ready_ms
-        )
+        with self.timeouts.waits.track(type(self).__name__, "wait_ready", "name_input", self.timeouts.ready_ms):
+            self.root.wait_for(state="visible", timeout=self.timeouts.ready_ms)
+            self.find("INPUT_USERNAME")
 
     def create(self, username: str) -> None:
-        self.root.locator(self.INPUT_USERNAME).first.fill(username)
-        self.root.locator(self.SAVE_BTN).first.click()
+        self.find("INPUT_USERNAME", self.timeouts.action_ms).fill(username)
+        self.find("SAVE_BTN", self.timeouts.action_ms).click()
 
 
 class LoginPage(BasePage):
@@ -72,66 +481,94 @@ class LoginPage(BasePage):
     SUBMIT= 'button[data-uia="login-submit-button"], button[type="submit"]'
     PROFILE = 'div[data-uia="profile-avatar"]'
     HOME_MENU   = 'a.menu-trigger[data-uia="main-header-menu-trigger"][href="/browse"]'
-    HOME_SEARCH = 'svg.search-icon[data-icon="MagnifyingGlassMedium"'
+    HOME_SEARCH = 'svg.search-icon[data-icon="MagnifyingGlassMedium"]'
+    LOGGED_URL = r"/(browse|profiles?)"
+    ROUTE_ALLOW = (r"cookielaw|onetrust",)  # banner de cookies que pode cobrir o botão de login
 
 
     def wait_ready(self) -> None:
-        self.page.locator(self.EMAIL).first.wait_for(state="visible", timeout=self.cfg.wait_timeout_ms)
+        with self.cfg.waits.track("LoginPage", "wait_ready", "email_input", self.cfg.wait_timeout_ms):
+            self.find("EMAIL")
 
     def login(self, email: str, password: str) -> None:
-        self.page.locator(self.EMAIL).first.fill(email)
-        self.page.locator(self.PWD).first.fill(password)
-        self.page.locator(self.SUBMIT).first.click()
+        self.find("EMAIL").fill(email)
+        self.find("PWD").fill(password)
+        self.find("SUBMIT").click()
 
     def wait_logged(self) -> None:
-        
-        any_selector = f"{self.PROFILE}, {self.HOME_MENU}, {self.HOME_SEARCH}"
-        try:
-            self.page.locator(any_selector).first.wait_for(
-                state="visible", timeout=self.cfg.wait_timeout_ms
-            )
-
-        except:
-           
-            self.page.wait_for_url(
-                re.compile(r"/(browse|profiles?)"),
-                timeout=int(self.cfg.wait_timeout_ms * 0.6),
-            )
-                
+        # Qualquer marcador da home logada ou a URL de browse/profiles, o que vier primeiro
+        with SPANS.span("page.LoginPage.wait_logged"):
+            self.wait_any("wait_logged", {
+                "profile_avatar": self.visible(self.PROFILE),
+                "home_menu": self.visible(self.HOME_MENU),
+                "home_search": self.visible(self.HOME_SEARCH),
+                "logged_url": self.url_matches(self.LOGGED_URL),
+            }, self.cfg.wait_timeout_ms)
 
 
 class AccountPage(BasePage):
     path = "/account/"
-    # seletores específicos aqui (ex.: header da conta)
+    ACCOUNT_MARKER = '[data-uia^="account"], a[href*="/account/profiles"]'
+    landed: str | None = None  # condição do último wait_ready; "timeout" se nenhuma
+
     def wait_ready(self) -> None:
-        # opção: algo leve; se não tiver seletor único, pode ser no-op
-        pass
+        # Pronta quando aparece conteúdo da conta, ou quando fomos mandados para o login
+        # (sessão inválida; is_at() decide depois). Sem esperar networkidle.
+        # Qualquer outra página (consentimento, interstitial, redirect de locale) estoura a
+        # sondagem curta e conta como "não logado": o chamador cai no login.
+        try:
+            self.landed = self.wait_any("wait_ready", {
+                "login_redirect": self.url_matches(r"/login"),
+                "account_content": self.visible(self.ACCOUNT_MARKER),
+            }, self.cfg.session_probe_ms)
+        except PWTimeout:
+            self.landed = "timeout"
+
+    def is_at(self) -> bool:
+        return self.landed != "timeout" and super().is_at()
 
 class ProfilesPage(BasePage):
     path = "/account/profiles"
     ADD_BTN = 'button[data-uia="menu-card+button"][data-cl-view="addProfile"]'
     MODAL_ROOT = 'div[data-uia="account-profiles-page+add-profile+background"]'
+    # nome de cada perfil da lista (o botão de adicionar não tem título)
+    PROFILE_NAME = 'button[data-uia="menu-card+button"]:not([data-cl-view="addProfile"]) [data-uia="menu-card+title"]'
 
     def wait_ready(self) -> None:
+        with SPANS.span("page.ProfilesPage.wait_ready"), \
+                self.cfg.waits.track("ProfilesPage", "wait_ready", "add_button", self.cfg.wait_timeout_ms):
+            self.page.locator(self.ADD_BTN).wait_for(state="visible", timeout=self.cfg.wait_timeout_ms)
 
-        self.page.wait_for_load_state("networkidle")
-        self.page.locator(self.ADD_BTN).wait_for(state="visible", timeout=self.cfg.wait_timeout_ms)
-        
     def click_add(self) -> AddProfileModal:
 
-
-        self.page.locator(self.ADD_BTN).click()
-        root = self.page.locator(self.MODAL_ROOT)
-        modal = AddProfileModal(root)
-        modal.wait_ready()
+        with SPANS.span("page.ProfilesPage.click_add"):
+            self.page.locator(self.ADD_BTN).click()
+            root = self.page.locator(self.MODAL_ROOT)
+            modal = AddProfileModal(root, UiTimeouts(profiler=self.cfg.profiler, resolver=self.cfg.resolver))
+            modal.wait_ready()
         return modal
 
 
     def wait_profile_added(self, timeout_s: float = 10.0) -> bool:
-        import re
+        timeout_ms = int(timeout_s * 1000)
         try:
-            self.page.wait_for_url(re.compile(r"profileAdded=success"), timeout=int(timeout_s * 1000))
+            with SPANS.span("page.ProfilesPage.wait_profile_added"), \
+                    self.cfg.waits.track("ProfilesPage", "wait_profile_added", "success_url", timeout_ms):
+                self.page.wait_for_url(re.compile(r"profileAdded=success"), timeout=timeout_ms)
             return True
         except Exception:
             return False
 
+    def list_profiles(self) -> list[str]:
+        """
+        Nomes dos perfis na ordem da página (o do titular vem primeiro).
+        Não depende do botão de adicionar, que some quando a conta está cheia.
+        """
+        with SPANS.span("page.ProfilesPage.list_profiles"):
+            self.wait_any("list_profiles", {
+                "profile_names": self.visible(self.PROFILE_NAME),
+                "add_button": self.visible(self.ADD_BTN),
+            }, self.cfg.wait_timeout_ms)
+            names = self.page.locator(self.PROFILE_NAME).all_inner_texts()
+        return [n.strip() for n in names if n.strip()]
+
@@ -0,0 +1,203 @@
+from abc import ABC, abstractmethod
+from typing import Awaitable, Callable
+from playwright.async_api import Page, Locator, TimeoutError as PWTimeout
+import re
+import time
+
+import pages
+from pages import PageConfig, ResourceBlocker, UiTimeouts
+from spans import SPANS
+
+
+# Versão asyncio dos page objects de pages.py.
+# Os seletores e paths são os mesmos (referenciados das classes sync) para não divergirem.
+
+class BasePage(ABC):
+    path: str  # ex.: "/login"
+    ROUTE_ALLOW: tuple[str, ...] = ()
+
+    def __init__(self, page: Page, cfg: PageConfig):
+        self.page = page
+        self.cfg = cfg
+
+    @property
+    def url(self) -> str:
+        return f"{self.cfg.base_url}{self.path}"
+
+    async def install_routes(self) -> None:
+        if not self.cfg.block_resources:
+            return
+        blocker, new = ResourceBlocker.for_page(self.page, self.cfg)
+        if new:
+            await self.page.route("**/*", blocker.handle_async)
+        blocker.set_page_allow(self.ROUTE_ALLOW)
+
+    async def open(self, wait_until: str = "domcontentloaded") -> None:
+        with SPANS.span(f"page.{type(self).__name__}.open"):
+            await self.install_routes()
+            await self.page.goto(self.url, wait_until=wait_until)
+            await self.wait_ready()  # Template Method: garante “pronto” após abrir
+
+    @abstractmethod
+    async def wait_ready(self) -> None:
+        """Cada página define o que significa estar pronta (locators visíveis, etc.)."""
+
+    def is_at(self) -> bool:
+        """Checagem leve para confirmar que estamos na página esperada."""
+        return self.path in (self.page.url or "")
+
+    def visible(self, selector: str) -> Callable[[], Awaitable[bool]]:
+        return lambda: self.page.locator(selector).first.is_visible()
+
+    def url_matches(self, pattern: str) -> Callable[[], Awaitable[bool]]:
+        rx = re.compile(pattern)
+
+        async def check() -> bool:
+            return bool(rx.search(self.page.url or ""))
+        return check
+
+    async def find(self, name: str, timeout_ms: int | None = None) -> Locator:
+        """Mesmo contrato de pages.BasePage.find."""
+        return await self.cfg.selectors.resolve_async(
+            self.page, f"{type(self).__name__}.{name}", getattr(self, name), timeout_ms or self.cfg.wait_timeout_ms
+        )
+
+    async def wait_any(self, wait: str, conditions: dict[str, Callable[[], Awaitable[bool]]], timeout_ms: int) -> str:
+        """Mesmo contrato de pages.BasePage.wait_any."""
+        key = f"{type(self).__name__}.{wait}"
+        resolver = self.cfg.selectors
+        t0 = time.perf_counter()
+        deadline = t0 + timeout_ms / 1000
+        best = resolver.winner(key, list(conditions)) if len(conditions) > 1 else None
+        if best is not None:
+            conditions = {best: conditions[best], **conditions}
+        while True:
+            for name, check in conditions.items():
+                if await check():
+                    resolver.record_result(key, best, name, (time.perf_counter() - t0) * 1000)
+                    self.cfg.waits.record(type(self).__name__, wait, name, (time.perf_counter() - t0) * 1000, timeout_ms)
+                    return name
+            if time.perf_counter() >= deadline:
+                self.cfg.waits.record(type(self).__name__, wait, "timeout", (time.perf_counter() - t0) * 1000, timeout_ms)
+                raise PWTimeout(f"{type(self).__name__}.{wait}: nenhuma condição em {timeout_ms} ms ({', '.join(conditions)})")
+            await self.page.wait_for_timeout(self.cfg.poll_ms)
+
+
+class BaseComponent(ABC):
+    def __init__(self, root: Locator, timeouts: UiTimeouts = UiTimeouts()):
+        self.root = root
+        self.timeouts = timeouts
+
+    @abstractmethod
+    async def wait_ready(self) -> None:
+        ...
+
+    async def find(self, name: str, timeout_ms: int | None = None) -> Locator:
+        """Mesmo contrato de pages.BaseComponent.find."""
+        return await self.timeouts.selectors.resolve_async(
+            self.root, f"{type(self).__name__}.{name}", getattr(self, name), timeout_ms or self.timeouts.ready_ms
+        )
+
+class AddProfileModal(BaseComponent):
+    INPUT_USERNAME = pages.AddProfileModal.INPUT_USERNAME
+    SAVE_BTN       = pages.AddProfileModal.SAVE_BTN
+
+    async def wait_ready(self) -> None:
+        # espera o contêiner e o input do modal ficarem prontos
+        with self.timeouts.waits.track(type(self).__name__, "wait_ready", "name_input", self.timeouts.ready_ms):
+            await self.root.wait_for(state="visible", timeout=self.timeouts.ready_ms)
+            await self.find("INPUT_USERNAME")
+
+    async def create(self, username: str) -> None:
+        await (await self.find("INPUT_USERNAME", self.timeouts.action_ms)).fill(username)
+        await (await self.find("SAVE_BTN", self.timeouts.action_ms)).click()
+
+
+class LoginPage(BasePage):
+
+    ''' Seletores CSS'''
+    path = pages.LoginPage.path
+    EMAIL = pages.LoginPage.EMAIL
+    PWD   = pages.LoginPage.PWD
+    SUBMIT= pages.LoginPage.SUBMIT
+    PROFILE = pages.LoginPage.PROFILE
+    HOME_MENU   = pages.LoginPage.HOME_MENU
+    HOME_SEARCH = pages.LoginPage.HOME_SEARCH
+    LOGGED_URL = pages.LoginPage.LOGGED_URL
+    ROUTE_ALLOW = pages.LoginPage.ROUTE_ALLOW
+
+    async def wait_ready(self) -> None:
+        with self.cfg.waits.track("LoginPage", "wait_ready", "email_input", self.cfg.wait_timeout_ms):
+            await self.find("EMAIL")
+
+    async def login(self, email: str, password: str) -> None:
+        await (await self.find("EMAIL")).fill(email)
+        await (await self.find("PWD")).fill(password)
+        await (await self.find("SUBMIT")).click()
+
+    async def wait_logged(self) -> None:
+        with SPANS.span("page.LoginPage.wait_logged"):
+            await self.wait_any("wait_logged", {
+                "profile_avatar": self.visible(self.PROFILE),
+                "home_menu": self.visible(self.HOME_MENU),
+                "home_search": self.visible(self.HOME_SEARCH),
+                "logged_url": self.url_matches(self.LOGGED_URL),
+            }, self.cfg.wait_timeout_ms)
+
+
+class AccountPage(BasePage):
+    path = pages.AccountPage.path
+    ACCOUNT_MARKER = pages.AccountPage.ACCOUNT_MARKER
+    landed: str | None = None
+
+    async def wait_ready(self) -> None:
+        try:
+            self.landed = await self.wait_any("wait_ready", {
+                "login_redirect": self.url_matches(r"/login"),
+                "account_content": self.visible(self.ACCOUNT_MARKER),
+            }, self.cfg.session_probe_ms)
+        except PWTimeout:
+            self.landed = "timeout"
+
+    def is_at(self) -> bool:
+        return self.landed != "timeout" and super().is_at()
+
+class ProfilesPage(BasePage):
+    path = pages.ProfilesPage.path
+    ADD_BTN = pages.ProfilesPage.ADD_BTN
+    MODAL_ROOT = pages.ProfilesPage.MODAL_ROOT
+    PROFILE_NAME = pages.ProfilesPage.PROFILE_NAME
+
+    async def wait_ready(self) -> None:
+        with SPANS.span("page.ProfilesPage.wait_ready"), \
+                self.cfg.waits.track("ProfilesPage", "wait_ready", "add_button", self.cfg.wait_timeout_ms):
+            await self.page.locator(self.ADD_BTN).wait_for(state="visible", timeout=self.cfg.wait_timeout_ms)
+
+    async def click_add(self) -> AddProfileModal:
+
+        with SPANS.span("page.ProfilesPage.click_add"):
+            await self.page.locator(self.ADD_BTN).click()
+            root = self.page.locator(self.MODAL_ROOT)
+            modal = AddProfileModal(root, UiTimeouts(profiler=self.cfg.profiler, resolver=self.cfg.resolver))
+            await modal.wait_ready()
+        return modal
+
+    async def wait_profile_added(self, timeout_s: float = 10.0) -> bool:
+        timeout_ms = int(timeout_s * 1000)
+        try:
+            with SPANS.span("page.ProfilesPage.wait_profile_added"), \
+                    self.cfg.waits.track("ProfilesPage", "wait_profile_added", "success_url", timeout_ms):
+                await self.page.wait_for_url(re.compile(r"profileAdded=success"), timeout=timeout_ms)
+            return True
+        except Exception:
+            return False
+
+    async def list_profiles(self) -> list[str]:
+        """Mesmo contrato de pages.ProfilesPage.list_profiles."""
+        with SPANS.span("page.ProfilesPage.list_profiles"):
+            await self.wait_any("list_profiles", {
+                "profile_names": self.visible(self.PROFILE_NAME),
+                "add_button": self.visible(self.ADD_BTN),
+            }, self.cfg.wait_timeout_ms)
+            names = await self.page.locator(self.PROFILE_NAME).all_inner_texts()
+        return [n.strip() for n in names if n.strip()]
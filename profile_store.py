@@ -0,0 +1,191 @@
+# profile_store.py
+# Perfis persistentes do Chromium por conta (launch_persistent_context), para não
+# começar cada execução com cache HTTP, service workers e IndexedDB vazios.
+#
+#   python netflix_login_sc.py --username ana --profile-dir ~/.cache/sub_manager/profiles
+#   python profile_store.py --dir ~/.cache/sub_manager/profiles          # warm x cold
+#
+# Um diretório por accounts.id. O lease do claim_available garante que só um processo
+# usa a conta (e portanto o diretório) por vez. O storage_state no Postgres continua
+# sendo a fonte de verdade: perfil ausente/evictado é recriado a partir dele.
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+# Marcador cujo mtime diz quando o perfil foi usado pela última vez (ordem do LRU)
+LAST_USED = ".last_used"
+TIMINGS = "timings.jsonl"
+
+
+class ProfileStore:
+    """
+    Diretórios de perfil por conta com limite de quantidade e de bytes em disco.
+    Ao passar de um dos limites, os perfis usados há mais tempo são apagados.
+    """
+
+    def __init__(self, root: str | os.PathLike, max_profiles: int = 20, max_bytes: int = 2 << 30,
+                 disk_cache_bytes: int = 64 << 20):
+        self.root = Path(root).expanduser()
+        self.max_profiles = max_profiles
+        self.max_bytes = max_bytes
+        self.disk_cache_bytes = disk_cache_bytes  # teto do cache HTTP de cada perfil (--disk-cache-size)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, account_id: int) -> Path:
+        return self.root / str(int(account_id))
+
+    def is_warm(self, account_id: int) -> bool:
+        return (self.path_for(account_id) / LAST_USED).exists()
+
+    def open(self, browser_type, account_id: int, storage_state: dict | None = None,
+             headless: bool = True) -> tuple[object, bool]:
+        """
+        Abre o contexto persistente da conta. Retorna (contexto, warm?).
+        Perfil frio é semeado com o storage_state do banco (cookies + localStorage),
+        o mesmo que o new_context(storage_state=...) faria.
+        """
+        path = self.path_for(account_id)
+        warm = self.is_warm(account_id)
+        if not warm and path.exists():
+            shutil.rmtree(path, ignore_errors=True)  # sobra de uma execução que não terminou
+
+        ctx = browser_type.launch_persistent_context(
+            str(path),
+            headless=headless,
+            args=[f"--disk-cache-size={self.disk_cache_bytes}"],
+        )
+        if not warm and storage_state:
+            seed(ctx, storage_state)
+        return ctx, warm
+
+    def close(self, ctx, account_id: int) -> None:
+        """Fecha o contexto, marca o perfil como usado e aplica os limites."""
+        try:
+            ctx.close()
+        finally:
+            (self.path_for(account_id) / LAST_USED).touch()
+            self.evict(keep=account_id)
+
+    def profiles(self) -> list[tuple[float, int, Path]]:
+        """(último uso, bytes, diretório) de cada perfil, do menos para o mais recente."""
+        out = []
+        for path in self.root.iterdir():
+            if not path.is_dir() or not path.name.isdigit():
+                continue
+            marker = path / LAST_USED
+            last_used = marker.stat().st_mtime if marker.exists() else 0.0
+            out.append((last_used, dir_size(path), path))
+        out.sort()
+        return out
+
+    def evict(self, keep: int | None = None) -> list[Path]:
+        """Apaga os perfis menos usados até caber em max_profiles e max_bytes."""
+        profiles = self.profiles()
+        keep_path = self.path_for(keep) if keep is not None else None
+        total = sum(size for _, size, _ in profiles)
+        count = len(profiles)
+        removed = []
+        for _, size, path in profiles:
+            if count <= self.max_profiles and total <= self.max_bytes:
+                break
+            if path == keep_path:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+            total -= size
+            count -= 1
+        return removed
+
+    def record(self, account_id: int, warm: bool, ready_ms: float) -> None:
+        """Acrescenta uma medição de "contexto aberto -> ProfilesPage pronto"."""
+        with open(self.root / TIMINGS, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "account_id": int(account_id),
+                "mode": "warm" if warm else "cold",
+                "ready_ms": round(ready_ms, 1),
+                "at": round(time.time(), 3),
+            }) + "\n")
+
+    def summary(self) -> dict:
+        """warm/cold -> n, mediana, p95 e máximo de ready_ms."""
+        groups: dict[str, list[float]] = {}
+        path = self.root / TIMINGS
+        if path.exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        r = json.loads(line)
+                    except ValueError:
+                        continue
+                    groups.setdefault(r["mode"], []).append(r["ready_ms"])
+        out = {}
+        for mode, values in sorted(groups.items()):
+            values.sort()
+            out[mode] = {
+                "n": len(values),
+                "median_ms": values[len(values) // 2],
+                "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max_ms": values[-1],
+            }
+        return out
+
+
+def seed(ctx, storage_state: dict) -> None:
+    """Aplica um storage_state do Playwright num contexto já aberto."""
+    cookies = storage_state.get("cookies") or []
+    if cookies:
+        ctx.add_cookies(cookies)
+    origins = {
+        o["origin"]: {kv["name"]: kv["value"] for kv in o.get("localStorage", [])}
+        for o in storage_state.get("origins") or []
+        if o.get("localStorage")
+    }
+    if origins:
+        # localStorage só pode ser escrito de dentro da origem: o script roda em cada
+        # documento e preenche o que faltar. Chaves já existentes não são sobrescritas.
+        ctx.add_init_script(
+            "(() => { const s = %s[location.origin]; if (!s) return;"
+            " for (const [k, v] of Object.entries(s)) if (localStorage.getItem(k) === null) localStorage.setItem(k, v); })()"
+            % json.dumps(origins)
+        )
+
+
+def dir_size(path: Path) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Resumo dos perfis persistentes (tamanho e tempos warm x cold).")
+    ap.add_argument("--dir", required=True)
+    ap.add_argument("--evict", action="store_true", help="aplica os limites agora")
+    ap.add_argument("--max-profiles", type=int, default=20)
+    ap.add_argument("--max-mb", type=int, default=2048)
+    args = ap.parse_args()
+
+    store = ProfileStore(args.dir, max_profiles=args.max_profiles, max_bytes=args.max_mb << 20)
+    if args.evict:
+        for path in store.evict():
+            print("removido:", path, file=sys.stderr)
+
+    profiles = store.profiles()
+    print(json.dumps({
+        "profiles": len(profiles),
+        "total_mb": round(sum(size for _, size, _ in profiles) / (1 << 20), 1),
+        "ready_ms": store.summary(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# provision_server.py
+# Modo servidor do netflix_login_sc: mantém browsers e contextos por conta "quentes"
+# entre pedidos, evitando o launch do Chromium e o setup do engine a cada username.
+#
+#   python provision_server.py --stdin  < pedidos.jsonl        # {"username": "..."} por linha
+#   python provision_server.py --http 127.0.0.1:8765           # POST /provision {"username": "..."}
+#                                                               # GET /stats: pool, storage_state, waits, breaker
+#
+# Cada browser vive numa thread própria (a API sync do Playwright não pode trocar de thread);
+# os pedidos entram numa fila comum e a resposta sai como JSON.
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pages
+import Postgres
+from breaker import CircuitBreaker
+from netflix_login_sc import AccountSession, record_attempt
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    browsers: int = 1
+    max_contexts: int = 4          # contextos quentes por browser (um por conta)
+    idle_seconds: float = 600.0    # contexto parado há mais que isso é fechado
+    recheck_seconds: float = 300.0 # dentro desse intervalo não revalida a sessão no AccountPage
+    breaker_cooldown_s: float = 120.0  # breaker aberto recusa pedidos por esse tempo
+    headless: bool = True
+
+
+@dataclass
+class _WarmContext:
+    session: AccountSession
+    last_used: float
+    checked_at: float = 0.0
+
+
+class BrowserWorker(threading.Thread):
+    """Uma thread = um Playwright + um browser + até max_contexts contextos por conta (LRU)."""
+
+    def __init__(self, idx: int, jobs: queue.Queue, repo: Postgres.AccountsRepo, pool: PoolConfig, cfg: pages.PageConfig,
+                 breaker: CircuitBreaker):
+        super().__init__(name=f"browser-{idx}", daemon=True)
+        self.jobs = jobs
+        self.repo = repo
+        self.pool = pool
+        self.cfg = cfg
+        self.breaker = breaker
+        self.worker_id = f"{Postgres.default_worker_id()}:{self.name}"
+        self.contexts: OrderedDict[str, _WarmContext] = OrderedDict()
+
+    def run(self) -> None:
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as p:
+            self.browser = p.chromium.launch(headless=self.pool.headless)
+            while True:
+                try:
+                    job = self.jobs.get(timeout=1.0)
+                except queue.Empty:
+                    self._evict_idle()
+                    continue
+                if job is None:
+                    break
+                username, fut = job
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                try:
+                    fut.set_result(self._provision(username))
+                except Exception as e:
+                    fut.set_result({"username": username, "ok": False, "error": f"{type(e).__name__}: {e}"})
+            for email in list(self.contexts):
+                self._close(email)
+            self.browser.close()
+
+    def _provision(self, username: str) -> dict:
+        if not self.breaker.allow():
+            return {"username": username, "ok": False, "error": self.breaker.reason}
+        account = self.repo.claim_available(worker_id=self.worker_id)
+        if account is None:
+            return {"username": username, "ok": False, "error": "Nenhuma conta está disponível para uso"}
+
+        email = account["email"]
+        outcome = None
+        try:
+            reused = email in self.contexts
+            warm = self._context_for(email, account["storage_state"])
+            now = time.monotonic()
+            if now - warm.checked_at > self.pool.recheck_seconds:
+                if reused:
+                    # contexto quente: a pré-checagem olha os cookies dele, não os do banco
+                    # (a sessão pode ter sido renovada ou perdida desde o último save)
+                    account = {**account, "storage_state": warm.session.ctx.storage_state(),
+                               "cookie_valid_until": None}
+                warm.session.ensure_session(self.repo, email, account)
+                warm.checked_at = time.monotonic()
+            result = warm.session.add_profile(self.repo, email, username)
+            warm.last_used = time.monotonic()
+            outcome = (True, None) if result else (False, "perfil não foi adicionado")
+        except Exception as e:
+            # contexto num estado desconhecido: descarta para o próximo pedido começar limpo
+            outcome = (False, f"{type(e).__name__}: {e}")
+            self._close(email)
+            raise
+        finally:
+            # toda conta reservada recebe um resultado (o breaker ignora os que chegam já aberto)
+            if outcome is not None:
+                self.breaker.record(outcome[0])
+                record_attempt(self.repo, account, *outcome)
+            self.repo.release_claim(account["id"], worker_id=self.worker_id)
+
+        if not result:
+            return {"username": username, "account": email, "ok": False, "error": "perfil não foi adicionado"}
+        return {
+            "username": username,
+            "account": email,
+            "ok": True,
+            "pin": result["plain_secret"],
+            "n_creds": result["n_creds"],
+            "free_slots": result["free_slots"],
+        }
+
+    def _context_for(self, email: str, storage_state: dict | None) -> _WarmContext:
+        warm = self.contexts.get(email)
+        if warm is not None:
+            self.contexts.move_to_end(email)
+            return warm
+
+        while len(self.contexts) >= self.pool.max_contexts:
+            self._close(next(iter(self.contexts)))
+
+        ctx = (self.browser.new_context(storage_state=storage_state)
+               if storage_state else self.browser.new_context())
+        warm = _WarmContext(AccountSession(ctx, self.cfg), last_used=time.monotonic())
+        self.contexts[email] = warm
+        return warm
+
+    def _evict_idle(self) -> None:
+        limit = time.monotonic() - self.pool.idle_seconds
+        for email, warm in list(self.contexts.items()):
+            if warm.last_used < limit:
+                self._close(email)
+
+    def _close(self, email: str) -> None:
+        warm = self.contexts.pop(email, None)
+        if warm is None:
+            return
+        try:
+            warm.session.ctx.close()
+        except Exception as e:
+            print(f"Aviso: falha ao fechar contexto de {email}:", e, file=sys.stderr)
+
+
+class ProvisionServer:
+    """Fila de pedidos + pool de BrowserWorkers."""
+
+    def __init__(self, repo: Postgres.AccountsRepo, pool: PoolConfig, cfg: pages.PageConfig = pages.PageConfig()):
+        self.jobs: queue.Queue = queue.Queue()
+        self.repo = repo
+        self.breaker = CircuitBreaker.from_env(cooldown_s=pool.breaker_cooldown_s)
+        self.workers = [BrowserWorker(i, self.jobs, repo, pool, cfg, self.breaker) for i in range(pool.browsers)]
+
+    def start(self) -> None:
+        for w in self.workers:
+            w.start()
+
+    def submit(self, username: str) -> Future:
+        fut: Future = Future()
+        self.jobs.put((username, fut))
+        return fut
+
+    def stats(self) -> dict:
+        """Resumos para GET /stats e para o fim do processo."""
+        return {
+            "queued": self.jobs.qsize(),
+            "pool": Postgres.POOL.summary(),
+            "storage_state": self.repo.codec.summary(),
+            "waits": pages.WAITS.summary(),
+            "breaker": self.breaker.summary(),
+        }
+
+    def stop(self) -> None:
+        for _ in self.workers:
+            self.jobs.put(None)
+        for w in self.workers:
+            w.join()
+
+
+def serve_stdin(server: ProvisionServer) -> None:
+    """Lê {"username": ...} por linha e escreve um resultado JSONL por pedido, na ordem em que terminam."""
+    out_lock = threading.Lock()
+
+    def emit(fut: Future) -> None:
+        with out_lock:
+            sys.stdout.write(json.dumps(fut.result(), ensure_ascii=False) + "\n")
+            sys.stdout.flush()
+
+    pending = []
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            username = json.loads(line)["username"]
+        except (ValueError, KeyError, TypeError):
+            with out_lock:
+                sys.stdout.write(json.dumps({"ok": False, "error": "linha inválida"}) + "\n")
+            continue
+        fut = server.submit(username)
+        fut.add_done_callback(emit)
+        pending.append(fut)
+        pending = [f for f in pending if not f.done()]
+    for fut in pending:
+        fut.result()
+
+
+def serve_http(server: ProvisionServer, host: str, port: int) -> None:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/stats":
+                self.send_error(404)
+                return
+            payload = json.dumps(server.stats()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_POST(self):
+            if self.path != "/provision":
+                self.send_error(404)
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                username = body["username"]
+            except (ValueError, KeyError, TypeError):
+                self.send_error(400, "esperado JSON {\"username\": ...}")
+                return
+            result = server.submit(username).result()
+            payload = json.dumps(result, ensure_ascii=False).encode("utf-8")
+            self.send_response(200 if result.get("ok") else 409)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, fmt, *args):
+            # não loga corpo/PIN; só a linha de acesso padrão no stderr
+            sys.stderr.write("%s - %s\n" % (self.address_string(), fmt % args))
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    print(f"Servindo em http://{host}:{port}/provision", file=sys.stderr)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Servidor de provisionamento com pool de browsers quentes.")
+    mode = ap.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--stdin", action="store_true", help="lê pedidos JSONL do stdin")
+    mode.add_argument("--http", metavar="HOST:PORT", help="escuta POST /provision (use 127.0.0.1)")
+    ap.add_argument("--browsers", type=int, default=PoolConfig.browsers)
+    ap.add_argument("--max-contexts", type=int, default=PoolConfig.max_contexts)
+    ap.add_argument("--idle-seconds", type=float, default=PoolConfig.idle_seconds)
+    ap.add_argument("--recheck-seconds", type=float, default=PoolConfig.recheck_seconds)
+    ap.add_argument("--breaker-cooldown", type=float, default=PoolConfig.breaker_cooldown_s,
+                    help="segundos recusando pedidos depois que a taxa de falhas dispara o breaker")
+    ap.add_argument("--headed", action="store_true")
+    args = ap.parse_args()
+
+    pool = PoolConfig(
+        browsers=args.browsers,
+        max_contexts=args.max_contexts,
+        idle_seconds=args.idle_seconds,
+        recheck_seconds=args.recheck_seconds,
+        breaker_cooldown_s=args.breaker_cooldown,
+        headless=not args.headed,
+    )
+    repo = Postgres.make_accounts_repo()
+    repo.keys.get()  # resolve a chave agora: os workers nunca param num prompt
+
+    server = ProvisionServer(repo, pool)
+    server.start()
+    try:
+        if args.stdin:
+            serve_stdin(server)
+        else:
+            host, _, port = args.http.rpartition(":")
+            serve_http(server, host or "127.0.0.1", int(port))
+    finally:
+        server.stop()
+        stats = server.stats()
+        print("Waits:", json.dumps(stats["waits"]), file=sys.stderr)
+        print("Storage state:", json.dumps(stats["storage_state"]), file=sys.stderr)
+        print("Pool:", json.dumps(stats["pool"]), file=sys.stderr)
+        pages.SELECTORS.save()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+# reconcile_profiles.py
+# Confere os perfis que o banco conhece (user_creds / account_creds) com os que existem
+# de fato em cada conta e corrige o banco. Sem isso o drift se acumula e o claim_available
+# entrega contas que na verdade já estão cheias.
+#
+#   python reconcile_profiles.py                        # dry-run: só relata as diferenças
+#   python reconcile_profiles.py --apply --concurrency 8
+#
+# Percorre as contas em páginas (AccountsRepo.profile_snapshot, keyset por id); cada página
+# é lida no site com até --concurrency contextos em paralelo, cada um com o storage_state
+# salvo da conta (sem login: conta com sessão caída só é relatada). As correções da página
+# vão para o banco numa transação (AccountsRepo.apply_profile_corrections), que ignora as
+# contas alteradas desde a leitura.
+# Um resultado JSONL por conta no stdout (sem segredos); o resumo vai para o stderr.
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import Postgres
+import sessions
+from netflix_login_async import AsyncAccountSession
+from pages import SELECTORS, PageConfig
+
+
+@dataclass(frozen=True)
+class ReconcileConfig:
+    concurrency: int = 8
+    batch: int = 200          # contas por página do banco e por transação de correção
+    owner_profiles: int = 1   # primeiros perfis da página que são do titular (não entram no banco)
+    apply: bool = False       # False = dry-run
+
+
+class Reconciler:
+
+    def __init__(self, browser, netflix_db: Postgres.AsyncAccountsRepo, cfg: ReconcileConfig = ReconcileConfig(),
+                 page_cfg: PageConfig = PageConfig()):
+        self.browser = browser
+        self.db = netflix_db
+        self.cfg = cfg
+        self.page_cfg = page_cfg
+        self.sem = asyncio.Semaphore(cfg.concurrency)
+        self.stats = {"accounts": 0, "in_sync": 0, "drift": 0, "no_session": 0, "error": 0,
+                      "applied": 0, "stale": 0}
+
+    async def check(self, account: dict) -> dict:
+        """Lê os perfis de uma conta no site e compara com o banco."""
+        result = {"id": account["id"], "account": account["email"], "db": account["profiles"]}
+        t0 = time.perf_counter()
+        if sessions.precheck(account["storage_state"], account["cookie_valid_until"]) == sessions.DEAD:
+            result["action"] = "no_session"
+            return result
+        async with self.sem:
+            try:
+                session = await AsyncAccountSession.create(self.browser, account["storage_state"], self.page_cfg)
+                try:
+                    live = await session.list_profiles()
+                finally:
+                    await session.ctx.close()
+            except Exception as e:
+                result.update(action="error", error=f"{type(e).__name__}: {e}")
+                return result
+            finally:
+                result["elapsed_ms"] = round((time.perf_counter() - t0) * 1000)
+
+        if live is None:
+            result["action"] = "no_session"
+            return result
+        live = list(dict.fromkeys(live[self.cfg.owner_profiles:]))
+        known = set(account["profiles"])
+        result.update(
+            live=live,
+            missing=[n for n in account["profiles"] if n not in live],  # no banco, não no site
+            extra=[n for n in live if n not in known],                   # no site, não no banco
+        )
+        result["action"] = "drift" if result["missing"] or result["extra"] else "in_sync"
+        return result
+
+    async def run_page(self, accounts: list[dict]) -> None:
+        plan = []
+        for fut in asyncio.as_completed([self.check(a) for a in accounts]):
+            result = await fut
+            self.stats["accounts"] += 1
+            self.stats[result["action"]] += 1
+            if result["action"] == "drift":
+                plan.append({"id": result["id"], "expected": result["db"], "live": result["live"]})
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+        if plan and self.cfg.apply:
+            applied = await self.db.apply_profile_corrections(plan, batch_size=self.cfg.batch)
+            self.stats["applied"] += applied["applied"]
+            self.stats["stale"] += applied["stale"]
+
+    async def run(self) -> dict:
+        t0 = time.perf_counter()
+        after_id = 0
+        while True:
+            accounts = await self.db.profile_snapshot(after_id, self.cfg.batch)
+            if not accounts:
+                break
+            await self.run_page(accounts)
+            after_id = accounts[-1]["id"]
+        elapsed = time.perf_counter() - t0
+        return {
+            **self.stats,
+            "dry_run": not self.cfg.apply,
+            "seconds": round(elapsed, 1),
+            "accounts_per_min": round(self.stats["accounts"] / elapsed * 60, 1) if elapsed > 0 else 0.0,
+        }
+
+
+async def run(cfg: ReconcileConfig, page_cfg: PageConfig, headless: bool) -> dict:
+    from playwright.async_api import async_playwright
+
+    netflix_db = Postgres.AsyncAccountsRepo()
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        try:
+            return await Reconciler(browser, netflix_db, cfg, page_cfg).run()
+        finally:
+            await browser.close()
+            SELECTORS.save()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Reconcilia os perfis do banco com os perfis reais de cada conta.")
+    ap.add_argument("--apply", action="store_true", help="grava as correções (padrão: dry-run)")
+    ap.add_argument("--concurrency", type=int, default=ReconcileConfig.concurrency)
+    ap.add_argument("--batch", type=int, default=ReconcileConfig.batch)
+    ap.add_argument("--owner-profiles", type=int, default=ReconcileConfig.owner_profiles,
+                    help="quantos perfis do início da lista são do titular")
+    ap.add_argument("--base-url", default=os.environ.get("NETFLIX_BASE_URL"))
+    ap.add_argument("--no-block", action="store_true", help="não bloqueia imagens/mídia/analytics")
+    ap.add_argument("--headed", action="store_true")
+    args = ap.parse_args()
+
+    cfg = ReconcileConfig(
+        concurrency=args.concurrency,
+        batch=args.batch,
+        owner_profiles=args.owner_profiles,
+        apply=args.apply,
+    )
+    page_cfg = PageConfig(block_resources=not args.no_block)
+    if args.base_url:
+        page_cfg = PageConfig(base_url=args.base_url.rstrip("/"), block_resources=not args.no_block)
+    try:
+        stats = asyncio.run(run(cfg, page_cfg, not args.headed))
+    except KeyboardInterrupt:
+        return
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# rotate_key.py
+# Troca a chave simétrica do pgcrypto: recriptografa encrypted_password e todos os
+# user_creds[].secret dentro do Postgres, em lotes por id (AccountsRepo.rotate_key).
+#
+#   PG_NEW_KEY_FD=3 python rotate_key.py --rotation-id 2026-10 3< nova_chave.txt
+#   python rotate_key.py --rotation-id 2026-10 --new-key-file ~/.secrets/pg_key.new
+#
+# Chave antiga: a mesma resolução de sempre (PG_KEY, PG_KEY_FD, ~/.secrets/pg_key.txt, prompt).
+# Chave nova: PG_NEW_KEY, PG_NEW_KEY_FD, --new-key-file ou prompt.
+# Se cair no meio, rode de novo com o mesmo --rotation-id: continua do último lote confirmado.
+# Pause o provisionamento enquanto roda e só troque a chave dos workers depois do fim.
+
+import argparse
+import json
+import sys
+
+import Postgres
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Recriptografa todas as contas com uma nova chave (retomável).")
+    ap.add_argument("--rotation-id", required=True, help="nome do checkpoint em public.key_rotations")
+    ap.add_argument("--new-key-file", help="ficheiro com a chave nova (0600)")
+    ap.add_argument("--batch", type=int, default=500, help="contas por transação")
+    args = ap.parse_args()
+
+    repo = Postgres.make_accounts_repo()
+    old_key = repo.keys.get()
+    new_key = Postgres.KeyProvider(
+        key_path=args.new_key_file or Postgres.DEFAULT_KEY_PATH.with_suffix(".new"),
+        env_var="PG_NEW_KEY",
+    ).get()
+    if not new_key or new_key == old_key:
+        sys.exit("A chave nova precisa ser diferente da atual.")
+
+    def progress(stats: dict) -> None:
+        print(f"{stats['rows']} contas | last_id {stats['last_id']} | {stats['rows_per_s']} contas/s",
+              file=sys.stderr)
+
+    stats = repo.rotate_key(args.rotation_id, old_key, new_key, batch_size=args.batch, progress=progress)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
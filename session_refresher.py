@@ -0,0 +1,168 @@
+# session_refresher.py
+# Revalida as sessões das contas antes de expirarem, fora do caminho do usuário.
+# Assim o netflix_login_sc quase sempre encontra a sessão "fresh" na pré-checagem
+# e não paga LoginPage.login + wait_logged enquanto alguém espera o PIN.
+#
+#   python session_refresher.py --once                   # uma passada e sai (cron)
+#   python session_refresher.py --concurrency 4          # laço contínuo
+#
+# Pega as contas pela fila do AccountsRepo.claim_for_refresh (cookies vencendo primeiro),
+# com o mesmo lease do claim_available: nunca mexe numa conta que está sendo provisionada.
+# Um resultado JSONL por conta no stdout (sem segredos).
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+import Postgres
+import sessions
+from netflix_login_async import AsyncAccountSession
+from pages import SELECTORS, PageConfig
+
+
+@dataclass(frozen=True)
+class RefreshConfig:
+    concurrency: int = 4
+    batch: int = 16                     # contas reservadas por passada
+    horizon_seconds: float = 24 * 3600  # revalida o que expira dentro disso (> sessions.FRESH_MARGIN)
+    max_age_seconds: float = 6 * 3600   # e o que não é checado há mais que isso
+    max_failures: int = 3               # falhas seguidas até 'unhealthy'
+    retry_seconds: float = 900          # backoff base entre tentativas
+    recheck_seconds: float = 3600       # depois de revalidada, a conta fica fora da fila por isso
+    idle_seconds: float = 60            # espera quando não há nada para revalidar
+
+
+class SessionRefresher:
+
+    def __init__(self, browser, netflix_db: Postgres.AsyncAccountsRepo, cfg: RefreshConfig = RefreshConfig(),
+                 page_cfg: PageConfig = PageConfig()):
+        self.browser = browser
+        self.db = netflix_db
+        self.cfg = cfg
+        self.page_cfg = page_cfg
+        self.sem = asyncio.Semaphore(cfg.concurrency)
+        self.worker_id = f"{Postgres.default_worker_id()}:refresher"
+
+    async def refresh(self, account: dict) -> dict:
+        """
+        Revalida uma conta: abre o AccountPage com a sessão salva. Loga de novo se ela caiu
+        ou se, mesmo depois da visita, os cookies de auth ainda vencem dentro do horizonte
+        (o site não renovou; esperar só deixaria a sessão expirar).
+        """
+        email = account["email"]
+        t0 = time.perf_counter()
+        async with self.sem:
+            action = "checked"
+            try:
+                session = await AsyncAccountSession.create(self.browser, account["storage_state"], self.page_cfg)
+                try:
+                    alive = False
+                    if sessions.precheck(account["storage_state"], account["cookie_valid_until"]) != sessions.DEAD:
+                        await session.account_page.open()
+                        alive = session.account_page.is_at()
+                    if alive:
+                        # o site costuma renovar os cookies na visita; o codec não regrava se nada mudou
+                        live_state = await session.ctx.storage_state()
+                        expiry = sessions.auth_cookie_expiry(live_state)
+                        horizon = datetime.now(timezone.utc) + timedelta(seconds=self.cfg.horizon_seconds)
+                        if expiry is not None and expiry < horizon:
+                            alive = False
+                            await session.ctx.clear_cookies()  # logado, o /login redirecionaria para a home
+                        else:
+                            await self.db.save_storage_state(email, live_state)
+                    if not alive:
+                        action = "relogged"
+                        await session.login(self.db, email)
+                finally:
+                    await session.ctx.close()
+                ok, error = True, None
+            except Exception as e:
+                ok, error = False, f"{type(e).__name__}: {e}"
+            finally:
+                await self.db.release_claim(account["id"], worker_id=self.worker_id)
+
+        state = await self.db.record_refresh(
+            account["id"], ok, max_failures=self.cfg.max_failures, retry_seconds=self.cfg.retry_seconds,
+            recheck_seconds=self.cfg.recheck_seconds,
+        )
+        result = {"account": email, "ok": ok, "action": action if ok else "failed",
+                  "elapsed_ms": round((time.perf_counter() - t0) * 1000)}
+        if error:
+            result["error"] = error
+        if state:
+            result.update(state)
+        return result
+
+    async def run_once(self) -> int:
+        """Uma passada: reserva um lote e revalida com no máximo `concurrency` contextos. Retorna o tamanho do lote."""
+        accounts = await self.db.claim_for_refresh(
+            self.cfg.batch,
+            horizon_seconds=self.cfg.horizon_seconds,
+            max_age_seconds=self.cfg.max_age_seconds,
+            worker_id=self.worker_id,
+        )
+        for fut in asyncio.as_completed([self.refresh(a) for a in accounts]):
+            print(json.dumps(await fut, ensure_ascii=False, default=str), flush=True)
+        return len(accounts)
+
+    async def run_forever(self) -> None:
+        while True:
+            if await self.run_once() == 0:
+                await asyncio.sleep(self.cfg.idle_seconds)
+
+
+async def run(cfg: RefreshConfig, once: bool, headless: bool) -> None:
+    from playwright.async_api import async_playwright
+
+    netflix_db = Postgres.AsyncAccountsRepo()
+    await asyncio.to_thread(netflix_db.keys.get)  # relogin precisa da chave; resolve antes do loop
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        try:
+            refresher = SessionRefresher(browser, netflix_db, cfg)
+            if once:
+                n = await refresher.run_once()
+                print(f"{n} contas revalidadas", file=sys.stderr)
+            else:
+                await refresher.run_forever()
+        finally:
+            await browser.close()
+            print("Storage state:", json.dumps(netflix_db.codec.summary()), file=sys.stderr)
+            print("Pool:", json.dumps(Postgres.ASYNC_POOL.summary()), file=sys.stderr)
+            SELECTORS.save()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Revalida sessões das contas antes de expirarem.")
+    ap.add_argument("--once", action="store_true", help="uma passada e sai")
+    ap.add_argument("--concurrency", type=int, default=RefreshConfig.concurrency)
+    ap.add_argument("--batch", type=int, default=RefreshConfig.batch)
+    ap.add_argument("--horizon-hours", type=float, default=RefreshConfig.horizon_seconds / 3600)
+    ap.add_argument("--max-age-hours", type=float, default=RefreshConfig.max_age_seconds / 3600)
+    ap.add_argument("--max-failures", type=int, default=RefreshConfig.max_failures)
+    ap.add_argument("--recheck-minutes", type=float, default=RefreshConfig.recheck_seconds / 60,
+                    help="intervalo mínimo entre duas revalidações da mesma conta")
+    ap.add_argument("--headed", action="store_true")
+    args = ap.parse_args()
+
+    cfg = RefreshConfig(
+        concurrency=args.concurrency,
+        batch=args.batch,
+        horizon_seconds=args.horizon_hours * 3600,
+        max_age_seconds=args.max_age_hours * 3600,
+        max_failures=args.max_failures,
+        recheck_seconds=args.recheck_minutes * 60,
+    )
+    try:
+        asyncio.run(run(cfg, args.once, not args.headed))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Pré-checagem barata da sessão salva (storage_state) antes de abrir o browser na conta.
+
+Em vez de carregar /account/ e esperar a página para descobrir se a sessão vale,
+olha a validade dos cookies de autenticação e a coluna accounts.cookie_valid_until:
+  - "dead":    sem cookies de auth ou já expirados -> vai direto para o login;
+  - "fresh":   expiram bem depois de agora         -> pula a ida ao AccountPage;
+  - "unknown": perto de expirar / cookie de sessão -> checagem completa como antes.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+# Cookies que carregam a sessão logada da Netflix
+AUTH_COOKIES = ("NetflixId", "SecureNetflixId")
+
+# "fresh" só se os cookies ainda valerem pelo menos isto
+FRESH_MARGIN = timedelta(hours=12)
+
+DEAD = "dead"
+FRESH = "fresh"
+UNKNOWN = "unknown"
+
+
+def auth_cookie_expiry(state: dict | None) -> datetime | None:
+    """
+    Menor expiração (UTC) entre os cookies de auth do storage_state do Playwright.
+    None se faltar algum cookie de auth ou se algum for cookie de sessão (expires = -1).
+    """
+    if not state:
+        return None
+    expiries = {}
+    for c in state.get("cookies", []):
+        if c.get("name") in AUTH_COOKIES:
+            expires = c.get("expires", -1)
+            if expires is None or expires < 0:
+                return None
+            expiries[c["name"]] = min(expires, expiries.get(c["name"], expires))
+    if len(expiries) < len(AUTH_COOKIES):
+        return None
+    return datetime.fromtimestamp(min(expiries.values()), tz=timezone.utc)
+
+
+def precheck(
+    state: dict | None,
+    cookie_valid_until: datetime | None = None,
+    now: datetime | None = None,
+    margin: timedelta = FRESH_MARGIN,
+) -> str:
+    """Classifica a sessão salva em DEAD / FRESH / UNKNOWN sem tocar na rede."""
+    now = now or datetime.now(timezone.utc)
+    if not state or not any(c.get("name") in AUTH_COOKIES for c in state.get("cookies", [])):
+        return DEAD
+
+    expiry = auth_cookie_expiry(state) or cookie_valid_until
+    if expiry is None:
+        return UNKNOWN
+    if expiry.tzinfo is None:
+        expiry = expiry.replace(tzinfo=timezone.utc)
+    if expiry <= now:
+        return DEAD
+    if expiry - now >= margin:
+        return FRESH
+    return UNKNOWN
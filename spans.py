@@ -0,0 +1,158 @@
+"""
+Spans por fase do provisionamento (banco, chave, browser, páginas).
+
+Cada span é só um perf_counter no início e no fim + um dict num deque limitado,
+então fica ligado em produção. Os registros saem em JSONL por execução (run) e
+o relatório agrega p50/p95/p99 por fase:
+
+    python spans.py spans.jsonl [mais.jsonl ...]
+
+Nunca registra segredos: atributos só aceitam escalares e nomes fora de SECRET_HINTS,
+e erros guardam apenas o tipo da exceção (a mensagem pode conter dados da conta).
+"""
+
+import functools
+import json
+import math
+import sys
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Atributos com estes pedaços no nome são descartados
+SECRET_HINTS = ("pass", "pwd", "pin", "secret", "key", "token", "cookie", "state", "email")
+
+_run_id: ContextVar[str | None] = ContextVar("spans_run_id", default=None)
+
+
+def _safe_attrs(attrs: dict) -> dict:
+    return {
+        k: v for k, v in attrs.items()
+        if isinstance(v, (str, int, float, bool)) and not any(h in k.lower() for h in SECRET_HINTS)
+    }
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank; values já ordenado."""
+    return values[min(len(values), max(1, math.ceil(q * len(values)))) - 1]
+
+
+class Tracer:
+
+    def __init__(self, max_records: int = 50_000, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.records: deque[dict] = deque(maxlen=max_records)  # limitado: processos longos
+
+    @contextmanager
+    def run(self, run_id: str | None = None):
+        """Agrupa os spans de uma execução (um provisionamento) sob o mesmo run_id."""
+        run_id = run_id or uuid.uuid4().hex[:12]
+        token = _run_id.set(run_id)
+        try:
+            yield run_id
+        finally:
+            _run_id.reset(token)
+
+    @contextmanager
+    def span(self, phase: str, **attrs):
+        if not self.enabled:
+            yield
+            return
+        t0 = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            rec = {
+                "run": _run_id.get(),
+                "phase": phase,
+                "ms": round((time.perf_counter() - t0) * 1000, 2),
+                "ok": error is None,
+            }
+            if error:
+                rec["error"] = error
+            if attrs:
+                rec.update(_safe_attrs(attrs))
+            with self._lock:
+                self.records.append(rec)
+
+    def traced(self, phase: str):
+        """Decorator: a chamada inteira vira um span."""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(phase):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def run_records(self, run_id: str | None = None) -> list[dict]:
+        with self._lock:
+            return [r for r in self.records if run_id is None or r["run"] == run_id]
+
+    def dump_jsonl(self, path: str, run_id: str | None = None) -> None:
+        records = self.run_records(run_id)
+        with open(path, "a", encoding="utf-8") as f:
+            for r in records:
+                f.write(json.dumps(r) + "\n")
+
+    def summary(self, run_id: str | None = None) -> dict:
+        return report(self.run_records(run_id))
+
+
+def report(records) -> dict:
+    """fase -> n, erros, p50/p95/p99 e máximo em ms."""
+    groups = defaultdict(list)
+    errors = defaultdict(int)
+    for r in records:
+        groups[r["phase"]].append(r["ms"])
+        if not r.get("ok", True):
+            errors[r["phase"]] += 1
+    out = {}
+    for phase, values in sorted(groups.items()):
+        values.sort()
+        out[phase] = {
+            "n": len(values),
+            "errors": errors[phase],
+            "p50_ms": percentile(values, 0.50),
+            "p95_ms": percentile(values, 0.95),
+            "p99_ms": percentile(values, 0.99),
+            "max_ms": values[-1],
+        }
+    return out
+
+
+# Tracer padrão do processo
+SPANS = Tracer()
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("uso: python spans.py spans.jsonl [mais.jsonl ...]", file=sys.stderr)
+        sys.exit(2)
+
+    def records():
+        for path in sys.argv[1:]:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+    rows = report(records())
+    print(f"{'fase':<40} {'n':>6} {'err':>4} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for phase, r in rows.items():
+        print(f"{phase:<40} {r['n']:>6} {r['errors']:>4} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Codec do storage_state do Playwright para o Postgres.
+
+O storage_state completo traz dezenas de cookies de terceiros e localStorage grande
+que a automação não usa. Antes de gravar:
+  - poda cookies e origins para a allowlist (por padrão só netflix.com);
+  - serializa de forma canônica e calcula o sha256 -> se o hash for o mesmo já gravado,
+    o UPDATE nem acontece;
+  - comprime com zlib (coluna accounts.storage_state_z, migrations/004).
+
+Allowlist por ambiente (listas separadas por vírgula):
+  STATE_COOKIE_DOMAINS  domínios de cookie aceitos (sufixo)          padrão: netflix.com
+  STATE_ORIGINS         hosts das origins com localStorage aceitas    padrão: netflix.com
+  STATE_LS_KEYS         regex das chaves de localStorage mantidas     padrão: todas
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from urllib.parse import urlsplit
+
+# Primeiro byte do blob: formato, para poder trocar o algoritmo sem migrar o que já está gravado
+FORMAT_ZLIB_JSON = b"\x01"
+
+
+def _env_list(name: str, default: tuple[str, ...]) -> tuple[str, ...]:
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return tuple(v.strip().lower() for v in value.split(",") if v.strip())
+
+
+def _host_allowed(host: str, allowed: tuple[str, ...]) -> bool:
+    host = host.lstrip(".").lower()
+    return any(host == d or host.endswith("." + d) for d in allowed)
+
+
+class StateCodec:
+
+    def __init__(
+        self,
+        cookie_domains: tuple[str, ...] = ("netflix.com",),
+        origins: tuple[str, ...] = ("netflix.com",),
+        local_storage_keys: str | None = None,
+        level: int = 6,
+    ):
+        self.cookie_domains = cookie_domains
+        self.origins = origins
+        self.local_storage_keys = re.compile(local_storage_keys) if local_storage_keys else None
+        self.level = level
+        self._lock = threading.Lock()
+        self.stats = {
+            "saves": 0,         # chamadas a save_storage_state
+            "writes": 0,        # UPDATEs que realmente gravaram
+            "skipped": 0,       # UPDATEs evitados (hash igual ao gravado)
+            "raw_bytes": 0,     # JSON do storage_state como veio do Playwright
+            "pruned_bytes": 0,  # JSON depois da poda
+            "stored_bytes": 0,  # blob comprimido
+        }
+
+    @classmethod
+    def from_env(cls) -> "StateCodec":
+        return cls(
+            cookie_domains=_env_list("STATE_COOKIE_DOMAINS", ("netflix.com",)),
+            origins=_env_list("STATE_ORIGINS", ("netflix.com",)),
+            local_storage_keys=os.environ.get("STATE_LS_KEYS") or None,
+        )
+
+    def prune(self, state: dict) -> dict:
+        """Só os cookies/origins da allowlist, em ordem estável (para o hash não depender da ordem)."""
+        cookies = [
+            c for c in state.get("cookies") or []
+            if _host_allowed(c.get("domain", ""), self.cookie_domains)
+        ]
+        cookies.sort(key=lambda c: (c.get("domain", ""), c.get("path", ""), c.get("name", "")))
+
+        origins = []
+        for o in state.get("origins") or []:
+            if not _host_allowed(urlsplit(o.get("origin", "")).hostname or "", self.origins):
+                continue
+            items = [
+                kv for kv in o.get("localStorage") or []
+                if self.local_storage_keys is None or self.local_storage_keys.search(kv.get("name", ""))
+            ]
+            if items:
+                items.sort(key=lambda kv: kv.get("name", ""))
+                origins.append({"origin": o["origin"], "localStorage": items})
+        origins.sort(key=lambda o: o["origin"])
+        return {"cookies": cookies, "origins": origins}
+
+    def encode(self, state: dict) -> tuple[dict, bytes, bytes]:
+        """Retorna (state podado, blob comprimido, sha256 do JSON canônico)."""
+        pruned = self.prune(state)
+        raw = json.dumps(pruned, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        blob = FORMAT_ZLIB_JSON + zlib.compress(raw, self.level)
+        with self._lock:
+            self.stats["saves"] += 1
+            self.stats["raw_bytes"] += len(json.dumps(state, separators=(",", ":")).encode("utf-8"))
+            self.stats["pruned_bytes"] += len(raw)
+            self.stats["stored_bytes"] += len(blob)
+        return pruned, blob, hashlib.sha256(raw).digest()
+
+    @staticmethod
+    def decode(blob: bytes | memoryview | None) -> dict | None:
+        if blob is None:
+            return None
+        blob = bytes(blob)
+        if blob[:1] != FORMAT_ZLIB_JSON:
+            raise ValueError(f"storage_state_z em formato desconhecido: {blob[:1]!r}")
+        return json.loads(zlib.decompress(blob[1:]))
+
+    def count_write(self, written: bool) -> None:
+        with self._lock:
+            self.stats["writes" if written else "skipped"] += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            out = dict(self.stats)
+        if out["raw_bytes"]:
+            out["stored_ratio"] = round(out["stored_bytes"] / out["raw_bytes"], 3)
+        return out